@@ -0,0 +1,2 @@
+# Headless micro/macro benchmarks. Run from the repo root, e.g.:
+#   python -m benchmarks.bench_codec
@@ -0,0 +1,141 @@
+# benchmarks/bench_agent_e2e.py
+# The whole agent, headless: a FakeBmPeer (bm_daemon.io.fake_bm) plays the
+# BM node on a pty, and `python -m bm_daemon.agent` runs against it with
+# camera.backend: fake. Measures start-up (spawn -> subscribed), then
+# trigger -> OK status latency for image captures, and, with --send, the
+# time until the file's last Spotter chunk (END) reached the node. No
+# camera or UART needed.
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import yaml
+
+from bm_daemon.io.fake_bm import FakeBmPeer
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def write_config(tmp: Path, port: str, *, send: bool, fps: float, runtime: str) -> Path:
+    cfg = yaml.safe_load((ROOT / "config.yaml").read_text())
+    cfg["uart_device"] = port
+    cfg.setdefault("agent", {})["runtime"] = runtime
+    cfg.setdefault("clock", {})["enabled"] = False
+    cfg["paths"] = dict(cfg.get("paths") or {}, data_root=str(tmp))
+    cfg["logging"] = dict(cfg.get("logging") or {}, dir=str(tmp / "logs"), console=False)
+    cam = cfg.setdefault("camera", {})
+    cam["backend"] = "fake"
+    cam["fake"] = dict(cam.get("fake") or {}, fps=fps)
+    image = cam.setdefault("defaults", {}).setdefault("image", {})
+    image.update(send_via_spotter=send, encode_format="jpeg")
+    spotter = cfg.setdefault("transport", {}).setdefault("spotter", {})
+    spotter.update(delay_s=0.0, profile="fixed")
+    path = tmp / "config.yaml"
+    path.write_text(yaml.safe_dump(cfg, sort_keys=False))
+    return path
+
+
+def run(n: int, res: str, send: bool, fps: float, runtime: str, gap_s: float = 0.25,
+        timeout_s: float = 60.0) -> dict:
+    peer = FakeBmPeer().start()
+    statuses = []
+    chunks = []
+    ok = threading.Condition()
+
+    ends = []
+
+    def on_pub(topic, payload):
+        if topic == "spotter/transmit-data":
+            chunks.append(len(payload))
+            if payload[1:6] == b"<END ":
+                with ok:
+                    ends.append(time.monotonic())
+                    ok.notify_all()
+        elif topic.endswith("/status"):
+            with ok:
+                statuses.append((time.monotonic(), payload[1:].decode("utf-8", "replace")))
+                ok.notify_all()
+
+    peer.add_listener(on_pub)
+    with tempfile.TemporaryDirectory() as td:
+        tmp = Path(td)
+        cfg_path = write_config(tmp, peer.port, send=send, fps=fps, runtime=runtime)
+        env = dict(os.environ, BM_AGENT_CONFIG=str(cfg_path), PYTHONPATH=str(ROOT))
+        t_spawn = time.monotonic()
+        agent = subprocess.Popen([sys.executable, "-m", "bm_daemon.agent"], cwd=str(ROOT), env=env,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        out = {"runtime": runtime, "res": res, "n": n}
+        try:
+            if not peer.wait_subscribed("camera/capture/image", timeout_s):
+                raise RuntimeError("agent never subscribed: " + agent.stderr.read1(4096).decode())
+            out["startup_s"] = time.monotonic() - t_spawn
+            latencies, last_chunk = [], []
+            for i in range(n):
+                if i:
+                    time.sleep(gap_s)   # outside the camera topic's dedup window
+                with ok:
+                    seen, seen_end = len(statuses), len(ends)
+                t0 = time.monotonic()
+                peer.publish("camera/capture/image", f"res={res},q={20 + i % 50}".encode())
+                with ok:
+                    done = ok.wait_for(lambda: any(s.startswith(("OK", "ERR", "BUSY"))
+                                                   for _, s in statuses[seen:]), timeout_s)
+                if not done:
+                    raise RuntimeError(f"no status for trigger {i}")
+                t1, line = next((t, s) for t, s in statuses[seen:] if s.startswith(("OK", "ERR", "BUSY")))
+                if not line.startswith("OK"):
+                    raise RuntimeError(f"trigger {i}: {line}")
+                latencies.append(t1 - t0)
+                if send:
+                    # time-to-last-chunk: the END line of this file reaching the node
+                    with ok:
+                        if not ok.wait_for(lambda: len(ends) > seen_end, timeout_s):
+                            raise RuntimeError(f"trigger {i}: transfer never finished")
+                        last_chunk.append(ends[seen_end] - t0)
+            out["latency_s"] = latencies
+            out["last_chunk_s"] = last_chunk
+            out["chunks"] = len(chunks)
+            out["chunk_bytes"] = sum(chunks)
+            out["peer"] = dict(peer.stats)
+        finally:
+            agent.send_signal(2)
+            try:
+                agent.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                agent.kill()
+            peer.stop()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("-n", type=int, default=10, help="image triggers")
+    ap.add_argument("--res", default="VGA")
+    ap.add_argument("--fps", type=float, default=10.0, help="fake camera frame rate")
+    ap.add_argument("--send", action="store_true", help="transmit each image over the (fake) Spotter")
+    ap.add_argument("--runtime", default="sync", choices=("sync", "asyncio"))
+    ap.add_argument("--gap", type=float, default=0.25, help="seconds between a status and the next trigger")
+    args = ap.parse_args()
+    r = run(args.n, args.res, args.send, args.fps, args.runtime, args.gap)
+    lat = sorted(r["latency_s"])
+    print(f"agent runtime={r['runtime']} start-up {r['startup_s']:.2f}s; {r['n']} x image res={r['res']}")
+    print(f"  trigger->OK  p50={statistics.median(lat) * 1000:.0f}ms "
+          f"p95={lat[max(0, int(len(lat) * 0.95) - 1)] * 1000:.0f}ms max={lat[-1] * 1000:.0f}ms "
+          f"(first={r['latency_s'][0] * 1000:.0f}ms)")
+    if args.send:
+        print(f"  trigger->last chunk p50={statistics.median(r['last_chunk_s']) * 1000:.0f}ms; "
+              f"spotter chunks={r['chunks']} bytes={r['chunk_bytes']}")
+    p = r["peer"]
+    print(f"  bus: frames in={p['rx_frames']} out={p['pubs_out']} crc_errors={p['crc_errors']} "
+          f"decode_errors={p['decode_errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_budget.py
+# Size-targeted encoding (bm_camera.encode.budget) on a synthetic corpus:
+# encodes per search (cold, and seeded by a SizeModel warmed on earlier
+# scenes), size accuracy (bytes / budget), how often the budget was met,
+# and a check that the chosen quality is the highest that fits.
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from bm_camera.encode.budget import SizeModel, encode_to_budget, Q_MAX
+from bm_camera.encode.file_encoder import select_backend
+
+
+def corpus(width: int, height: int, n: int, seed: int = 0):
+    """Scenes from flat to busy: sky/sea gradients, noise levels, hard edges."""
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+    for i in range(n):
+        tint = rng.uniform(60, 200, size=3).astype(np.float32)
+        base = tint * (0.6 + 0.4 * y) + 30 * x
+        noise = rng.normal(0, 2 + 14 * (i % 5) / 4, size=(height, width, 3)).astype(np.float32)
+        img = base + noise
+        if i % 3 == 0:   # horizon / hard edge
+            img[int(height * rng.uniform(0.3, 0.7)):, :, :] *= 0.6
+        if i % 4 == 1:   # fine texture (waves)
+            img += 12 * np.sin(x * rng.uniform(80, 300) + y * rng.uniform(40, 200))
+        yield Image.fromarray(np.clip(img, 0, 255).astype(np.uint8))
+
+
+def run(width: int, height: int, n: int, fractions, fmt: str = "jpeg") -> dict:
+    backend = select_backend(fmt)
+    encode = backend.image
+    model = SizeModel()   # in memory; warmed as the corpus goes by
+    rows = {"cold": [], "seeded": []}
+    optimal = 0
+    checked = 0
+    t0 = time.perf_counter()
+    for img in corpus(width, height, n):
+        full = len(encode(img, Q_MAX))
+        for frac in fractions:
+            target = int(full * frac)
+            for mode in ("cold", "seeded"):
+                r = encode_to_budget(img, target, encode,
+                                     model=model if mode == "seeded" else None, model_key=fmt)
+                rows[mode].append((r.iterations, len(r.data) / target, r.fits, r.scale))
+            if r.fits and r.scale == 1.0 and r.quality < Q_MAX:
+                checked += 1
+                optimal += len(encode(img, r.quality + 1)) > target
+    elapsed = time.perf_counter() - t0
+    out = {"backend": backend.name, "searches": len(rows["cold"]), "optimal": optimal,
+           "checked": checked, "elapsed_s": elapsed}
+    for mode, rs in rows.items():
+        its = [r[0] for r in rs]
+        acc = [r[1] for r in rs if r[2]]
+        out[mode] = {"iter_mean": statistics.mean(its), "iter_max": max(its),
+                     "fit_pct": 100.0 * sum(r[2] for r in rs) / len(rs),
+                     "acc_mean": statistics.mean(acc), "acc_min": min(acc),
+                     "downscaled": sum(r[3] < 1.0 for r in rs)}
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--size", default="640x480")
+    ap.add_argument("-n", type=int, default=20, help="images in the corpus")
+    ap.add_argument("--fmt", default="jpeg")
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    # budgets as a fraction of the q=95 size; the smallest force a downscale
+    fractions = (0.6, 0.3, 0.15, 0.08, 0.02)
+    r = run(w, h, args.n, fractions, args.fmt)
+    print(f"{args.size} backend={r['backend']} searches={r['searches']} ({r['elapsed_s']:.1f}s)")
+    print(f"{'mode':>7} {'iter avg':>8} {'iter max':>8} {'fit %':>6} {'bytes/budget':>13} {'min':>5} {'scaled':>6}")
+    for mode in ("cold", "seeded"):
+        m = r[mode]
+        print(f"{mode:>7} {m['iter_mean']:>8.2f} {m['iter_max']:>8d} {m['fit_pct']:>6.1f} "
+              f"{m['acc_mean']:>13.3f} {m['acc_min']:>5.2f} {m['downscaled']:>6d}")
+    print(f"highest fitting quality chosen: {r['optimal']}/{r['checked']}")
+
+
+if __name__ == "__main__":
+    main()
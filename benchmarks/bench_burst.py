@@ -0,0 +1,93 @@
+# benchmarks/bench_burst.py
+# Burst wall clock: the serial loop (capture -> encode -> TX per frame) vs.
+# BurstPipeline (capture i+1 || encode i in the process pool || TX i-1).
+# Frames are synthetic; capture and TX are simulated sleeps, the encode is
+# real (memory pipeline, same job the handler submits). Also checks that
+# the pipelined statuses arrive in the same order as the serial ones.
+#
+# The speedup is bounded by the stage times: with one core the encodes
+# still run one at a time, and only capture/TX overlap is gained.
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from bm_camera.encode.burst import BurstPipeline
+from bm_camera.encode.pool import encode_array_job, get_pool, pool_size, shutdown_pool, warm_pool
+from benchmarks.bench_capture_pipeline import synthetic_frame
+
+
+def _stages(frames, out_dir: Path, fmt: str, quality: int, capture_s: float, tx_s: float, log: list):
+    def capture(i):
+        time.sleep(capture_s)
+        return encode_array_job, (frames[i % len(frames)], str(out_dir / f"img_{i:03d}.jpg"),
+                                  fmt, quality, "-c", None), None
+
+    def finish(i, meta, result):
+        time.sleep(tx_s)
+        log.append((i, os.path.basename(result[0])))
+
+    def fail(i, meta, e):
+        log.append((i, f"ERR {e!r}"))
+
+    return capture, finish, fail
+
+
+def run(width: int, height: int, burst: int, fmt: str, quality: int,
+        capture_s: float, tx_s: float, workers: int) -> dict:
+    frames = [synthetic_frame(width, height, seed=s) for s in range(3)]
+    out = {}
+    with tempfile.TemporaryDirectory() as td:
+        # serial: the loop the handler runs with camera.burst.pipelined=false
+        log_serial = []
+        capture, finish, fail = _stages(frames, Path(td), fmt, quality, capture_s, tx_s, log_serial)
+        encode_array_job(frames[0], str(Path(td) / "warm.jpg"), fmt, quality, "-c")
+        t0 = time.perf_counter()
+        for i in range(burst):
+            fn, args, meta = capture(i)
+            finish(i, meta, fn(*args))
+        out["serial_s"] = time.perf_counter() - t0
+
+        n = pool_size(workers)
+        warm_pool(n)   # the daemon keeps the pool; don't time process start-up
+        log_pipe = []
+        capture, finish, fail = _stages(frames, Path(td), fmt, quality, capture_s, tx_s, log_pipe)
+        t0 = time.perf_counter()
+        BurstPipeline(get_pool(n), max_inflight=2 * n).run(burst, capture, finish, fail)
+        out["pipelined_s"] = time.perf_counter() - t0
+        shutdown_pool()
+
+        # per-frame encode time, for reading the result against the stage times
+        t0 = time.perf_counter()
+        encode_array_job(frames[0], str(Path(td) / "one.jpg"), fmt, quality, "-c")
+        out["encode_s"] = time.perf_counter() - t0
+    out["workers"] = n
+    out["ordered"] = log_serial == log_pipe
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--size", default="1920x1080")
+    ap.add_argument("--burst", type=int, default=10)
+    ap.add_argument("--fmt", default="jpeg")
+    ap.add_argument("-q", "--quality", type=int, default=25)
+    ap.add_argument("--capture-ms", type=float, default=120.0, help="simulated capture time per frame")
+    ap.add_argument("--tx-ms", type=float, default=50.0, help="simulated transmit/queue time per frame")
+    ap.add_argument("--workers", type=int, default=0, help="0 = one per core")
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    r = run(w, h, args.burst, args.fmt, args.quality,
+            args.capture_ms / 1000.0, args.tx_ms / 1000.0, args.workers)
+    print(f"{args.size} burst={args.burst} fmt={args.fmt} q={args.quality} cores={os.cpu_count()} "
+          f"workers={r['workers']} encode/frame={r['encode_s'] * 1000:.0f}ms "
+          f"capture={args.capture_ms:.0f}ms tx={args.tx_ms:.0f}ms")
+    print(f"  serial     {r['serial_s']:7.2f}s")
+    print(f"  pipelined  {r['pipelined_s']:7.2f}s  ({r['serial_s'] / r['pipelined_s']:.2f}x)")
+    print(f"  status order identical: {r['ordered']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# benchmarks/bench_capture_pipeline.py
+# Encode throughput and bytes written to storage: the "file" pipeline
+# (capture_file JPEG -> re-open -> re-encode) vs. the "memory" pipeline
+# (frame array -> encoder). Uses a synthetic frame, so no camera is needed;
+# the capture itself is identical in both paths and is not timed.
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from bm_camera.encode.file_encoder import get_encoder, get_array_encoder
+
+# Picamera2's capture_file() JPEG quality
+CAPTURE_FILE_QUALITY = 90
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """Smooth gradients plus mild noise: compresses roughly like a seascape."""
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    base = np.stack([120 + 80 * y + 0 * x, 140 + 60 * x * y, 180 - 60 * y + 0 * x], axis=-1)
+    noise = rng.normal(0, 6, size=(height, width, 3)).astype(np.float32)
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+
+def _written(paths) -> int:
+    return sum(p.stat().st_size for p in paths if p.exists())
+
+
+def run(width: int, height: int, fmt: str, quality: int, repeat: int = 3) -> dict:
+    frame = synthetic_frame(width, height)
+    out = {"size": f"{width}x{height}", "fmt": fmt, "q": quality}
+    with tempfile.TemporaryDirectory() as d:
+        d = Path(d)
+        best_file, best_mem = float("inf"), float("inf")
+        for i in range(repeat):
+            src = d / f"file_{i}.jpg"
+            t0 = time.perf_counter()
+            Image.fromarray(frame).save(src, format="JPEG", quality=CAPTURE_FILE_QUALITY)
+            enc = get_encoder(fmt)(src, quality=quality, suffix="-c")
+            best_file = min(best_file, time.perf_counter() - t0)
+            out["file_sd_bytes"] = _written([src, enc])
+
+            nominal = d / f"mem_{i}.jpg"
+            t0 = time.perf_counter()
+            enc = get_array_encoder(fmt)(frame, nominal, quality=quality, suffix="-c")
+            best_mem = min(best_mem, time.perf_counter() - t0)
+            out["memory_sd_bytes"] = _written([nominal, enc])
+        out["file_s"] = best_file
+        out["memory_s"] = best_mem
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--size", default="1920x1080", help="WxH, e.g. 4056x3040 for 12MP")
+    ap.add_argument("--fmt", default="jpeg")
+    ap.add_argument("-q", "--quality", type=int, default=25)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    r = run(w, h, args.fmt, args.quality, args.repeat)
+    print(f"{r['size']} fmt={r['fmt']} q={r['q']}")
+    print(f"  file  : {r['file_s']*1000:8.1f} ms  sd_write={r['file_sd_bytes']:>10d} B")
+    print(f"  memory: {r['memory_s']*1000:8.1f} ms  sd_write={r['memory_sd_bytes']:>10d} B")
+
+
+if __name__ == "__main__":
+    main()
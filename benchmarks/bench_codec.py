@@ -0,0 +1,95 @@
+# benchmarks/bench_codec.py
+# Compare bm_daemon.io.codec against the per-byte CRC/COBS loops that used to
+# live in BristlemouthSerial, for frame sizes 16 B .. 2 KB.
+
+import argparse
+import os
+import timeit
+
+from bm_daemon.io import codec
+
+SIZES = (16, 64, 256, 512, 1024, 2048)
+
+
+# ---- legacy reference implementations (verbatim from BristlemouthSerial) ----
+def legacy_cobs_encode(in_bytes: bytes):
+    final_zero = True
+    out_bytes = bytearray()
+    idx = 0
+    search_start_idx = 0
+    for in_char in in_bytes:
+        if in_char == 0:
+            final_zero = True
+            out_bytes.append(idx - search_start_idx + 1)
+            out_bytes += in_bytes[search_start_idx:idx]
+            search_start_idx = idx + 1
+        else:
+            if idx - search_start_idx == 0xFD:
+                final_zero = False
+                out_bytes.append(0xFF)
+                out_bytes += in_bytes[search_start_idx : idx + 1]
+                search_start_idx = idx + 1
+        idx += 1
+    if idx != search_start_idx or final_zero:
+        out_bytes.append(idx - search_start_idx + 1)
+        out_bytes += in_bytes[search_start_idx:idx]
+    return bytes(out_bytes)
+
+
+def legacy_crc(seed: int, src: bytes):
+    e, f = 0, 0
+    for i in src:
+        e = (seed ^ i) & 0xFF
+        f = e ^ ((e << 4) & 0xFF)
+        seed = (seed >> 8) ^ (((f << 8) & 0xFFFF) ^ ((f << 3) & 0xFFFF)) ^ (f >> 4)
+    return seed
+
+
+def _frame(n: int) -> bytes:
+    # Random payload with ~1/32 zero bytes, roughly what PUB text frames look like
+    raw = bytearray(os.urandom(n))
+    for i in range(0, n, 32):
+        raw[i] = 0
+    return bytes(raw)
+
+
+def _per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def run(sizes=SIZES, number=200) -> list:
+    rows = []
+    for n in sizes:
+        frame = _frame(n)
+        enc = codec.cobs_encode(frame)
+        assert enc == legacy_cobs_encode(frame)
+        assert codec.crc16(0, frame) == legacy_crc(0, frame)
+        assert codec.cobs_decode(enc) == frame
+        rows.append({
+            "size": n,
+            "crc_legacy_us": _per_call_us(lambda: legacy_crc(0, frame), number),
+            "crc_table_us": _per_call_us(lambda: codec.crc16_py(0, frame), number),
+            "crc_best_us": _per_call_us(lambda: codec.crc16(0, frame), number),
+            "cobs_legacy_us": _per_call_us(lambda: legacy_cobs_encode(frame), number),
+            "cobs_slice_us": _per_call_us(lambda: codec.cobs_encode_py(frame), number),
+            "cobs_best_us": _per_call_us(lambda: codec.cobs_encode(frame), number),
+            "decode_slice_us": _per_call_us(lambda: codec.cobs_decode_py(enc), number),
+        })
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--number", type=int, default=200, help="calls per timing sample")
+    args = ap.parse_args()
+
+    print(f"accel: {codec.ACCEL}")
+    cols = ("size", "crc_legacy_us", "crc_table_us", "crc_best_us",
+            "cobs_legacy_us", "cobs_slice_us", "cobs_best_us", "decode_slice_us")
+    print(" ".join(f"{c:>15}" for c in cols))
+    for row in run(number=args.number):
+        print(" ".join(f"{row[c]:>15.2f}" if c != "size" else f"{row[c]:>15d}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# benchmarks/bench_command.py
+# Command parsing per frame: the old path (dedup tokenizes the payload for
+# the video window, then the handler decodes and tokenizes it again and
+# converts each field itself) vs. agent.command (one cached parse attached
+# to the frame, shared by dedup and the handler). --fuzz feeds random and
+# mutated payloads through the parser and checks that it never raises and
+# that every typed value respects its field.
+
+import argparse
+import random
+import time
+
+from bm_daemon.agent.command import (
+    Command, Field, Schema, attach_command, parse, parse_command, payload_to_str,
+    register_schema, split_tokens, command_stats,
+)
+from bm_daemon.io.frame import BmFrame
+
+TOPIC = "camera/capture/video"
+SCHEMA = Schema({
+    "res":   Field("str"),
+    "dur":   Field("secs", lo=0),
+    "fps":   Field("int", lo=1, hi=120),
+    "br":    Field("count", lo=1),
+    "hflip": Field("bool"),
+    "vflip": Field("bool"),
+}, positional="res")
+PAYLOADS = [b"\x00res=1080p,dur=10s,fps=30,br=3M", b"\x00720p", b"\x00go",
+            b"\x00dur=500ms,hflip=yes", b"\x00res=480p,fps=15,br=800k,vflip=1"]
+
+
+def _legacy(data):
+    # dedup._dynamic_window
+    s = payload_to_str(data)
+    dur_tok = None
+    if s and s not in ("1", "go", "trigger"):
+        for tok in s.split(","):
+            if "=" in tok:
+                k, v = tok.split("=", 1)
+                if k.strip().lower() == "dur":
+                    dur_tok = v.strip()
+    # capture_video_cmd.handle: _payload_to_str + _parse_tokens + unit parsers
+    p = split_tokens(payload_to_str(data), "res")
+    v = p.get("dur", "3.0s").lower()
+    dur = float(v[:-2]) / 1000.0 if v.endswith("ms") else float(v.rstrip("s"))
+    br = p.get("br", "3000000").lower()
+    br = int(float(br[:-1]) * (1_000_000 if br.endswith("m") else 1_000)) if br[-1] in "mk" else int(br)
+    return dur_tok, p.get("res"), dur, int(p.get("fps", 30)), br, \
+        str(p.get("hflip", "false")).lower() in ("1", "true", "yes")
+
+
+def _new(data):
+    frame = BmFrame(1, 1, 1, TOPIC, memoryview(data))
+    cmd = attach_command(frame)                       # agent, once per frame
+    _tokens = cmd.tokens                              # dedup window
+    cmd = parse_command(TOPIC, frame.payload)         # plugin loader (cache hit)
+    return cmd.get("res"), cmd.get("dur", 3.0), cmd.get("fps", 30), \
+        cmd.get("br", 3_000_000), cmd.get("hflip", False)
+
+
+def throughput(n: int) -> dict:
+    register_schema(TOPIC, SCHEMA)
+    out = {}
+    for name, fn in (("legacy", _legacy), ("command", _new)):
+        t0 = time.perf_counter()
+        for i in range(n):
+            fn(PAYLOADS[i % len(PAYLOADS)])
+        out[name] = (time.perf_counter() - t0) / n * 1e6
+    out["uncached"] = _time_uncached(n)
+    return out
+
+
+def _time_uncached(n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        parse(TOPIC, PAYLOADS[i % len(PAYLOADS)], SCHEMA)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+EDGES = [b"", b"\x00", b"\x1f", b"'", b"''", b'"go"', b",,,", b"=", b"==", b"dur=", b"=5s",
+         b"dur=nan", b"dur=inf", b"dur=-1s", b"dur=1e400", b"fps=0", b"fps=121", b"br=k", b"br=-3M",
+         b"hflip=maybe", b"RES=1080P,DUR=2S", b"res=a=b", b"\xff\xfe", "dur=\u0663s".encode()]
+
+
+def _mutate(rng: random.Random, base: bytes) -> bytes:
+    b = bytearray(base)
+    for _ in range(rng.randint(1, 6)):
+        op = rng.random()
+        pos = rng.randrange(len(b) + 1)
+        if op < 0.4 and b:
+            b[min(pos, len(b) - 1)] = rng.randrange(256)
+        elif op < 0.7:
+            b[pos:pos] = rng.choice([b",", b"=", b"ms", b"k", b"M", b"'", b"\x00", b"-1", b"1e9", b"nan"])
+        elif b:
+            del b[min(pos, len(b) - 1)]
+    return bytes(b)
+
+
+def _check(cmd: Command) -> None:
+    for key, val in cmd.values.items():
+        field = SCHEMA.fields[key]
+        if field.lo is not None:
+            assert val >= field.lo, (key, val)
+        if field.hi is not None:
+            assert val <= field.hi, (key, val)
+        if field.kind == "bool":
+            assert isinstance(val, bool), (key, val)
+    assert set(cmd.values) | set(cmd.unknown) <= set(cmd.tokens)
+
+
+def fuzz(n: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    stats = {"cases": 0, "errors": 0, "clean": 0}
+    for i in range(len(EDGES) + n):
+        if i < len(EDGES):
+            data = EDGES[i]
+        elif rng.random() < 0.3:
+            data = bytes(rng.randrange(256) for _ in range(rng.randrange(64)))
+        else:
+            data = _mutate(rng, rng.choice(PAYLOADS))
+        cmd = parse(TOPIC, data, SCHEMA)   # must not raise
+        _check(cmd)
+        stats["cases"] += 1
+        stats["errors" if cmd.errors else "clean"] += 1
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("-n", type=int, default=200_000)
+    ap.add_argument("--fuzz", type=int, default=0, metavar="N", help="run N fuzz cases instead")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    if args.fuzz:
+        s = fuzz(args.fuzz, args.seed)
+        print(f"fuzz: {s['cases']} cases, {s['clean']} parsed clean, "
+              f"{s['errors']} rejected with field errors, 0 exceptions")
+        return
+    r = throughput(args.n)
+    cs = command_stats()
+    print(f"{'path':>10} {'us/frame':>9}")
+    for name in ("legacy", "command", "uncached"):
+        print(f"{name:>10} {r[name]:>9.2f}")
+    print(f"cache hits={cs['hits']} misses={cs['misses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_config.py
+# Cost of a config lookup: re-parsing config.yaml on every call (the old
+# load_config) vs. the cached snapshot, plus the accessors an image trigger
+# hits (defaults, status topic, TX settings, buffer dir).
+
+import argparse
+import time
+
+import yaml
+
+from bm_daemon.common import config
+from bm_daemon.common.paths import buffer_dir
+from bm_daemon.transport.spotter import get_spotter_tx_settings
+
+
+def _per_call(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n
+
+
+def _parse_every_time():
+    with open(config._locate(), "r") as f:
+        return yaml.safe_load(f) or {}
+
+
+def _trigger():
+    # what one camera/capture/image with send=1 reads
+    config.get_camera_defaults("image")
+    config.get_status_topic()
+    config.get_status_topic()
+    get_spotter_tx_settings()
+    buffer_dir()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("-n", type=int, default=200)
+    args = ap.parse_args()
+    parse = _per_call(_parse_every_time, args.n)
+    cached = _per_call(config.load_config, args.n * 50)
+    trigger = _per_call(_trigger, args.n * 10)
+    print(f"yaml parse      : {parse*1e6:10.1f} us/call")
+    print(f"cached snapshot : {cached*1e6:10.2f} us/call")
+    print(f"image trigger   : {trigger*1e6:10.1f} us (5 accessor calls, cached)")
+    print(f"stats           : {config.config_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_dedup.py
+# Per-frame cost of duplicate suppression under a stream of mostly-unique
+# payloads (the worst case for the old dict + full-scan prune): the legacy
+# agent.run._is_dup algorithm vs. agent.dedup.Dedup (heap expiry).
+
+import argparse
+import hashlib
+import time
+
+from bm_daemon.agent.dedup import Dedup, payload_tokens, parse_secs
+
+_SOFT_MAX = 4096
+
+
+class _Legacy:
+    """agent.run._is_dup before the Dedup engine (logging removed)."""
+
+    def __init__(self, clock):
+        self.recent = {}
+        self.clock = clock
+
+    def _window(self, topic, data, base):
+        if topic == "camera/capture/video":
+            dur = payload_tokens(data).get("dur")
+            return max(base, (parse_secs(dur) if dur else 3.0) + 5.0)
+        return base
+
+    def is_dup(self, node_id, topic, data) -> bool:
+        now = self.clock()
+        win = self._window(topic, data, 0.10)
+        key = ("payload", node_id, topic, hashlib.blake2b(data, digest_size=8).digest())
+        prev = self.recent.get(key)
+        hit = prev is not None and (now - prev[0]) < prev[1]
+        self.recent[key] = (now, win)
+        if hit:
+            return True
+        if len(self.recent) > _SOFT_MAX:
+            for k, (seen, ttl) in list(self.recent.items()):
+                if now - seen >= ttl:
+                    self.recent.pop(k, None)
+        return False
+
+
+def run(frames: int, rate_hz: float, unique: int) -> dict:
+    t = [0.0]
+    clock = lambda: t[0]
+    payloads = [b"\x00v=%d" % i for i in range(unique)]
+    out = {}
+    for name, eng in (("legacy", _Legacy(clock)),
+                      ("heap", Dedup(topic_rules={}, default_rule={"window_s": 10.0}, clock=clock))):
+        if name == "legacy":
+            # same 10 s window for a fair comparison
+            eng._window = lambda topic, data, base: 10.0
+        t[0] = 0.0
+        t0 = time.perf_counter()
+        for i in range(frames):
+            t[0] += 1.0 / rate_hz
+            eng.is_dup(1, "sensor/data", payloads[i % unique])
+        out[name] = (time.perf_counter() - t0) / frames * 1e6
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--frames", type=int, default=100_000)
+    args = ap.parse_args()
+    import logging
+    logging.getLogger("AGENT").setLevel(logging.ERROR)
+    print(f"{'rate Hz':>8} {'unique':>7} {'legacy us':>10} {'heap us':>8}")
+    for rate, unique in ((50, 1000), (500, 10_000), (2000, 50_000)):
+        r = run(args.frames, rate, unique)
+        print(f"{rate:>8} {unique:>7} {r['legacy']:>10.2f} {r['heap']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
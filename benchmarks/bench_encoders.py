@@ -0,0 +1,86 @@
+# benchmarks/bench_encoders.py
+# Time per megapixel and output size for every encoder backend available on
+# this machine (bm_camera.encode.file_encoder registry), on a synthetic frame.
+# Hardware backends encode from the live camera and are only measured with
+# --camera on a Pi. --save writes the results where auto selection reads
+# them (camera.encode.bench_results), so "auto" picks the measured fastest.
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from bm_camera.encode.file_encoder import backends, save_bench_results
+from benchmarks.bench_capture_pipeline import synthetic_frame
+
+
+def _bench_array(b, frame, quality, repeat, d: Path):
+    best, size = float("inf"), 0
+    for i in range(repeat):
+        dst = d / f"{b.name}_{i}{b.ext}"
+        t0 = time.perf_counter()
+        b.array(frame, dst, quality)
+        best = min(best, time.perf_counter() - t0)
+        size = dst.stat().st_size
+    return best, size
+
+
+def _bench_camera(b, wh, quality, repeat, d: Path):
+    from bm_daemon.common.config import get_camera_session_settings
+    from bm_camera.capture.camera_session import CameraSession
+    s = get_camera_session_settings()
+    session = CameraSession(idle_timeout_s=0, settle_s=s["settle_s"])
+    best, size = float("inf"), 0
+    try:
+        for i in range(repeat):
+            dst = d / f"{b.name}_{i}{b.ext}"
+            with session.still(wh) as picam2:
+                t0 = time.perf_counter()
+                b.camera(picam2, dst, quality)
+                best = min(best, time.perf_counter() - t0)
+            size = dst.stat().st_size
+    finally:
+        session.close()
+    return best, size
+
+
+def run(width: int, height: int, quality: int, repeat: int, camera: bool) -> dict:
+    frame = synthetic_frame(width, height)
+    mp = width * height / 1e6
+    out = {}
+    with tempfile.TemporaryDirectory() as d:
+        for b in backends():
+            if not b.fits((width, height)):
+                continue
+            if b.array is not None:
+                t, size = _bench_array(b, frame, quality, repeat, Path(d))
+            elif camera and b.camera is not None:
+                t, size = _bench_camera(b, (width, height), quality, repeat, Path(d))
+            else:
+                continue
+            out[b.name] = {"fmt": b.fmt, "hw": b.hw, "ms": t * 1000, "ms_per_mp": t * 1000 / mp,
+                           "bytes": size, "size": f"{width}x{height}", "q": quality}
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--size", default="1920x1080", help="WxH, e.g. 4056x3040 for 12MP")
+    ap.add_argument("-q", "--quality", type=int, default=25)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--camera", action="store_true", help="also time hardware backends (needs the camera)")
+    ap.add_argument("--save", action="store_true", help="store results for automatic backend selection")
+    args = ap.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    r = run(w, h, args.quality, args.repeat, args.camera)
+    print(f"{args.size} q={args.quality}")
+    print(f"{'backend':>12} {'fmt':>5} {'hw':>3} {'ms':>8} {'ms/MP':>7} {'bytes':>9}")
+    for name, v in sorted(r.items(), key=lambda kv: kv[1]["ms_per_mp"]):
+        print(f"{name:>12} {v['fmt']:>5} {'y' if v['hw'] else 'n':>3} {v['ms']:>8.1f} "
+              f"{v['ms_per_mp']:>7.1f} {v['bytes']:>9d}")
+    if args.save:
+        print(f"saved -> {save_bench_results(r)}")
+
+
+if __name__ == "__main__":
+    main()
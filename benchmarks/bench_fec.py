@@ -0,0 +1,133 @@
+# benchmarks/bench_fec.py
+# Forward error correction on the binary Spotter framing
+# (transport.spotter.fec): cost of building the repair chunks for a file,
+# and how often the file survives a lossy link, per overhead ratio:
+#   random : each chunk lost independently with probability p
+#   bursty : same average loss, in bursts (Gilbert model, mean --burst chunks)
+# A block of k data chunks survives when at most m of its k + m chunks are
+# lost (the code is MDS), so trials only draw loss patterns. One pattern per
+# setting is also decoded for real through spotter_rx.Reassembler. --depth
+# is the number of blocks whose chunks are interleaved (1 = none).
+# Without FEC a single lost chunk means sending the whole file again, so the
+# expected chunks until delivery are n / P(complete).
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bm_daemon.transport.spotter import BIN_HEADER_LEN, FLAG_REPAIR, build_binary_chunks
+from bm_daemon.transport.spotter_rx import Reassembler
+
+
+def _losses(n: int, p: float, burst: float, rng) -> np.ndarray:
+    """Boolean loss mask for n chunks; burst <= 1 means independent losses."""
+    if burst <= 1.0:
+        return rng.random(n) < p
+    to_bad, to_good = p / (burst * (1.0 - p)), 1.0 / burst
+    u = rng.random(n)
+    lost = np.empty(n, dtype=bool)
+    bad = rng.random() < p
+    for i in range(n):
+        lost[i] = bad
+        bad = (u[i] >= to_good) if bad else (u[i] < to_bad)
+    return lost
+
+
+def _layout(chunks, block: int):
+    """Per chunk in send order: its block, and each block's repair count."""
+    blocks, repairs = [], {}
+    for c in chunks:
+        index = int.from_bytes(c[4:6], "little")
+        if c[1] & FLAG_REPAIR:
+            blocks.append(index)
+            repairs[index] = repairs.get(index, 0) + 1
+        else:
+            blocks.append(index // block if block else 0)
+    return np.array(blocks), repairs
+
+
+def build(path: Path, mtu: int, ratio: float, block: int, depth: int) -> dict:
+    fec = {"ratio": ratio, "block": block, "depth": depth} if ratio else None
+    t0 = time.perf_counter()
+    _name, chunks, _len = build_binary_chunks(path, mtu=mtu, fec=fec)
+    return {"chunks": chunks, "build_ms": (time.perf_counter() - t0) * 1000.0}
+
+
+def survive(chunks, block: int, p: float, burst: float, trials: int, rng) -> float:
+    """Share of trials in which every block keeps enough chunks."""
+    blocks, repairs = _layout(chunks, block)
+    nblocks = int(blocks.max()) + 1
+    allowed = np.array([repairs.get(b, 0) for b in range(nblocks)])
+    ok = 0
+    for _ in range(trials):
+        lost = np.bincount(blocks[_losses(len(chunks), p, burst, rng)], minlength=nblocks)
+        ok += bool((lost <= allowed).all())
+    return ok / trials
+
+
+def decode_once(chunks, data: bytes, block: int, p: float, burst: float, rng):
+    """Feed one surviving loss pattern through the reassembler; (ms, recovered chunks) or None."""
+    blocks, repairs = _layout(chunks, block)
+    nblocks = int(blocks.max()) + 1
+    allowed = np.array([repairs.get(b, 0) for b in range(nblocks)])
+    for _ in range(50):
+        lost = _losses(len(chunks), p, burst, rng)
+        if (np.bincount(blocks[lost], minlength=nblocks) <= allowed).all():
+            break
+    else:
+        return None
+    rx = Reassembler()
+    t0 = time.perf_counter()
+    out = [r for r in (rx.feed(c) for c, gone in zip(chunks, lost) if not gone) if r]
+    ms = (time.perf_counter() - t0) * 1000.0
+    assert len(out) == 1 and out[0][1] == data, "reassembled file differs"
+    return ms, rx.stats["recovered"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--size", type=int, default=1_000_000, help="file bytes")
+    ap.add_argument("--mtu", type=int, default=300)
+    ap.add_argument("--block", type=int, default=64, help="data chunks per code block")
+    ap.add_argument("--depth", type=int, default=8, help="blocks interleaved against bursts")
+    ap.add_argument("--ratios", default="0,0.1,0.25,0.5", help="repair chunks per data chunk")
+    ap.add_argument("--loss", default="0.001,0.01,0.05,0.1", help="chunk loss rates")
+    ap.add_argument("--burst", type=float, default=4.0, help="mean burst length (bursty runs)")
+    ap.add_argument("--trials", type=int, default=200)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(7)
+    data = os.urandom(args.size)
+    losses = [float(x) for x in args.loss.split(",")]
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "frame-c.jpg"
+        path.write_bytes(data)
+        built = [(float(r), build(path, args.mtu, float(r), args.block, args.depth))
+                 for r in args.ratios.split(",")]
+
+    n0 = -(-args.size // (args.mtu - BIN_HEADER_LEN))   # chunks without FEC
+    print(f"{args.size} bytes, mtu={args.mtu}, block={args.block}, depth={args.depth}; "
+          f"P(complete) over {args.trials} trials, expected chunks until delivered (resend all on failure)")
+    for r, b in built:
+        chunks = b["chunks"]
+        print(f"ratio {r:<4} {len(chunks):>6} chunks (+{100.0 * (len(chunks) - n0) / n0:.0f}%), "
+              f"build {b['build_ms']:.0f} ms")
+        for burst in (1.0, args.burst):
+            cells = []
+            for p in losses:
+                s = survive(chunks, args.block, p, burst, args.trials, rng)
+                cost = f"{len(chunks) / s:>8.0f}" if s else f"{'inf':>8}"
+                cells.append(f"p={p:<5} {s:>6.1%} {cost}")
+            print(f"  {'random' if burst <= 1.0 else f'burst {burst:g}':<8} " + " | ".join(cells))
+        if r:
+            d = decode_once(chunks, data, args.block, losses[-2], 1.0, rng)
+            if d:
+                print(f"  decode at p={losses[-2]}: {d[0]:.0f} ms, {d[1]} chunks rebuilt")
+
+
+if __name__ == "__main__":
+    main()
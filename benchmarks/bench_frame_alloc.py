@@ -0,0 +1,83 @@
+# benchmarks/bench_frame_alloc.py
+# Memory traffic and time per PUB frame from decoded packet to handler:
+# the old path (packet[4:] slice, struct.unpack on a slice, "b'...'" topic
+# string, payload slices, _norm_topic) vs. BmFrame (unpack_from, one
+# interned topic, memoryview payload). Transient bytes are the tracemalloc
+# peak above baseline while one frame is handled, averaged over many frames.
+
+import argparse
+import struct
+import tempfile
+import time
+import tracemalloc
+
+from bm_daemon.agent.bus import _norm_topic, subscribe_frames
+from bm_daemon.io.bm_serial import BristlemouthSerial
+
+TOPIC = "camera/capture/image"
+
+
+def _packet(payload_len: int) -> bytes:
+    t = TOPIC.encode()
+    body = struct.pack("<QBBH", 0xC0FFEE, 1, 1, len(t)) + t + b"\x00" + b"x" * (payload_len - 1)
+    return b"\x02\x00\x00\x00" + body   # 4-byte serial header precedes the PUB body
+
+
+def _legacy(packet: bytes, sink):
+    # _process_publish_message + subscribe_many wrapper + run.cb before BmFrame
+    payload = packet[4:]
+    node_id, type_, version, topic_len = struct.unpack("<QBBH", payload[:12])
+    topic = str(payload[12:12 + topic_len])
+    data_len = len(payload[12 + topic_len:])
+    data = payload[12 + topic_len:]
+    if _norm_topic(topic) != TOPIC:
+        return
+    sink(node_id, _norm_topic(topic), data)
+
+
+def _measure(fn, packet, n):
+    tracemalloc.start()
+    peaks = 0
+    for _ in range(n):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn(packet)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    for _ in range(n * 10):
+        fn(packet)
+    return peaks / n, (time.perf_counter() - t0) / (n * 10) * 1e6
+
+
+def run(payload_len: int, n: int = 2000) -> dict:
+    packet = _packet(payload_len)
+    got = []
+
+    def sink(node_id, topic, data):
+        got.append(len(data))
+        got.clear()
+
+    with tempfile.NamedTemporaryFile() as tmp:
+        bm = BristlemouthSerial(uart=open(tmp.name, "wb"))
+        subscribe_frames(bm, [TOPIC], lambda f: sink(f.node_id, f.topic, f.payload))
+        new = _measure(lambda p: bm._process_publish_message(p, 4), packet, n)
+        old = _measure(lambda p: _legacy(p, sink), packet, n)
+        bm.uart.close()
+    return {"payload": payload_len, "old_bytes": old[0], "old_us": old[1],
+            "new_bytes": new[0], "new_us": new[1]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("-n", type=int, default=2000)
+    args = ap.parse_args()
+    print(f"{'payload':>8} {'old B/frame':>12} {'new B/frame':>12} {'old us':>8} {'new us':>8}")
+    for size in (16, 256, 1024, 4096):
+        r = run(size, args.n)
+        print(f"{size:>8d} {r['old_bytes']:>12.0f} {r['new_bytes']:>12.0f} "
+              f"{r['old_us']:>8.2f} {r['new_us']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
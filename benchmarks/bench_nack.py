@@ -0,0 +1,83 @@
+# benchmarks/bench_nack.py
+# Airtime to deliver one file over a lossy link, binary framing:
+#   resend-all : any chunk lost -> the whole file goes out again (today
+#                without feedback)
+#   nack       : after each pass the receiver NACKs (topics.tx_nack) the
+#                missing indices and only those are re-sent from the spool
+#   fec+nack   : repair chunks (transport.spotter.fec) first, NACK what the
+#                held repair chunks can't cover
+# Real chunks, spotter_rx.Reassembler and its nack() payloads; losses are
+# independent per chunk. Reports chunks sent and rounds (passes) until the
+# file is complete, mean over --trials.
+
+import argparse
+import os
+import random
+import tempfile
+from pathlib import Path
+
+from bm_daemon.transport.spotter import FLAG_REPAIR, build_binary_chunks, parse_indices
+from bm_daemon.transport.spotter_rx import Reassembler
+
+MAX_ROUNDS = 50
+
+
+def _index(frame: bytes) -> int:
+    return int.from_bytes(frame[4:6], "little")
+
+
+def resend_all(chunks, p: float, rng) -> tuple:
+    for rounds in range(1, MAX_ROUNDS + 1):
+        if all(rng.random() >= p for _ in chunks):
+            return rounds * len(chunks), rounds
+    return MAX_ROUNDS * len(chunks), MAX_ROUNDS
+
+
+def nack_rounds(chunks, p: float, rng) -> tuple:
+    rx = Reassembler()
+    file_id = int.from_bytes(chunks[0][2:4], "little")
+    data = {_index(c): c for c in chunks if not c[1] & FLAG_REPAIR}
+    todo, sent = list(chunks), 0
+    for rounds in range(1, MAX_ROUNDS + 1):
+        sent += len(todo)
+        for c in todo:
+            if rng.random() >= p and rx.feed(c):
+                return sent, rounds
+        payload = rx.nack(file_id)
+        missing = dict(t.split("=", 1) for t in payload.split(","))["missing"]
+        todo = [data[i] for i in parse_indices(missing)]
+    return sent, MAX_ROUNDS
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--size", type=int, default=100_000, help="file bytes")
+    ap.add_argument("--mtu", type=int, default=300)
+    ap.add_argument("--ratio", type=float, default=0.1, help="FEC repair chunks per data chunk")
+    ap.add_argument("--loss", default="0.01,0.05,0.1,0.2")
+    ap.add_argument("--trials", type=int, default=20)
+    args = ap.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "frame-c.jpg"
+        path.write_bytes(os.urandom(args.size))
+        plain = build_binary_chunks(path, mtu=args.mtu)[1]
+        fec = build_binary_chunks(path, mtu=args.mtu, fec={"ratio": args.ratio, "block": 64, "depth": 8})[1]
+
+    print(f"{args.size} bytes: {len(plain)} chunks plain, {len(fec)} with FEC ratio {args.ratio}; "
+          f"mean chunks sent (rounds) until complete over {args.trials} trials")
+    for p in (float(x) for x in args.loss.split(",")):
+        row = []
+        for name, fn, chunks in (("resend-all", resend_all, plain), ("nack", nack_rounds, plain),
+                                 ("fec+nack", nack_rounds, fec)):
+            runs = [fn(chunks, p, rng) for _ in range(args.trials)]
+            sent = sum(r[0] for r in runs) / len(runs)
+            rounds = sum(r[1] for r in runs) / len(runs)
+            capped = " (capped)" if any(r[1] == MAX_ROUNDS for r in runs) else ""
+            row.append(f"{name} {sent:>8.0f} ({rounds:.1f}){capped}")
+        print(f"  loss {p:<5} " + " | ".join(row))
+
+
+if __name__ == "__main__":
+    main()
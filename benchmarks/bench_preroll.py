@@ -0,0 +1,115 @@
+# benchmarks/bench_preroll.py
+# Pre-trigger ring vs. recording on trigger, on the fake camera. An "event"
+# happens, the trigger reaches the handler `--delay` seconds later (bus,
+# dedup, queueing), then:
+#   on-trigger : record_video() -> camera bring-up (--startup simulates the
+#                sensor), first frame written some time after the event
+#   pre-roll   : PreRollRecorder.save() -> the clip starts up to `seconds`
+#                *before* the event, first byte written immediately
+# Also reports the ring's RAM per second of pre-roll for a few
+# camera.preroll.kbytes_per_s budgets (measured vs. configured).
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _setup_env(tmp: Path, fps: float, startup_s: float) -> None:
+    cfg = yaml.safe_load((ROOT / "config.yaml").read_text())
+    cfg["paths"] = dict(cfg.get("paths") or {}, data_root=str(tmp))
+    cfg["logging"] = dict(cfg.get("logging") or {}, dir=str(tmp / "logs"), console=False)
+    cam = cfg.setdefault("camera", {})
+    cam["backend"] = "fake"
+    cam["fake"] = dict(cam.get("fake") or {}, fps=fps, startup_s=startup_s)
+    cam["session"] = dict(cam.get("session") or {}, enabled=True, idle_timeout_s=0)
+    path = tmp / "config.yaml"
+    path.write_text(yaml.safe_dump(cfg, sort_keys=False))
+    os.environ["BM_AGENT_CONFIG"] = str(path)
+    os.environ["BM_CAMERA_BACKEND"] = "fake"
+
+
+def _first_write(outdir: Path, t_event: float, stop: threading.Event, out: dict):
+    """Poll for the first non-empty clip file; records seconds after the event."""
+    while not stop.is_set():
+        for p in outdir.glob("VID_*"):
+            if p.stat().st_size > 0:
+                out["first_byte_s"] = time.monotonic() - t_event
+                return
+        time.sleep(0.002)
+
+
+def on_trigger(tmp: Path, res: str, fps: int, post_s: float, delay_s: float) -> dict:
+    from bm_camera.capture.camera_session import get_session
+    from bm_camera.capture.video_capture import record_video
+
+    get_session().close()   # cold, as for a camera powered down between events
+    outdir = tmp / "on_trigger"
+    outdir.mkdir()
+    t_event = time.monotonic()
+    time.sleep(delay_s)
+    seen, stop = {}, threading.Event()
+    th = threading.Thread(target=_first_write, args=(outdir, t_event, stop, seen), daemon=True)
+    th.start()
+    path = record_video(duration_s=post_s, resolution_key=res, fps=fps, directory_path=str(outdir))
+    stop.set()
+    th.join()
+    return {"first_byte_s": seen.get("first_byte_s"), "bytes": os.path.getsize(path)}
+
+
+def preroll(tmp: Path, res: str, fps: int, seconds: float, kbytes_per_s: float, post_s: float,
+            delay_s: float) -> dict:
+    from bm_camera.capture.video_capture import PreRollRecorder
+
+    rec = PreRollRecorder(res, fps, seconds, kbytes_per_s)
+    if not rec.start():
+        raise RuntimeError("pre-roll did not arm")
+    try:
+        time.sleep(seconds + 1.0)   # fill the ring
+        outdir = tmp / f"preroll_{int(kbytes_per_s)}"
+        t_event = time.monotonic()
+        time.sleep(delay_s)
+        t_trig = time.monotonic()
+        clip = rec.save(post_s=post_s, directory_path=str(outdir))
+        ring = clip["ring"]
+        return {"covers_from_s": -(clip["pre_s"] - (t_trig - t_event)), "pre_s": clip["pre_s"],
+                "bytes": clip["bytes"], "ring_bytes": ring["bytes"], "ring_s": ring["seconds"],
+                "kbytes_per_s": ring["kbytes_per_s"], "cap_mb": ring["max_bytes"] / 1e6,
+                "capped_gops": ring["capped_gops"]}
+    finally:
+        rec.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--res", default="VGA")
+    ap.add_argument("--fps", type=int, default=10)
+    ap.add_argument("--seconds", type=float, default=3.0, help="pre-roll held in the ring")
+    ap.add_argument("--post", type=float, default=1.0, help="seconds recorded after the trigger")
+    ap.add_argument("--delay", type=float, default=0.3, help="event -> trigger at the handler")
+    ap.add_argument("--startup", type=float, default=0.8, help="simulated sensor bring-up (s)")
+    ap.add_argument("--budgets", default="60,125,375", help="kbytes_per_s values to compare")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        tmp = Path(td)
+        _setup_env(tmp, args.fps, args.startup)
+        r = on_trigger(tmp, args.res, args.fps, args.post, args.delay)
+        print(f"on-trigger: first frame on disk {r['first_byte_s']:.2f}s AFTER the event "
+              f"(delay {args.delay}s + bring-up); {r['bytes']} bytes")
+        for kb in (float(x) for x in args.budgets.split(",")):
+            p = preroll(tmp, args.res, args.fps, args.seconds, kb, args.post, args.delay)
+            print(f"pre-roll {kb:>5.0f} kB/s: clip starts {-p['covers_from_s']:.2f}s BEFORE the event "
+                  f"(pre={p['pre_s']:.2f}s); ring {p['ring_s']:.2f}s {p['ring_bytes'] / 1e3:.0f} kB "
+                  f"= {p['kbytes_per_s']:.0f} kB/s measured (cap {p['cap_mb']:.2f} MB, "
+                  f"capped GOPs {p['capped_gops']}); clip {p['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_progressive.py
+# Progressive delivery vs. one full file: for a fake-camera frame encoded
+# like the image handler does, how many Spotter chunks until shore has a
+# first complete picture, and what it holds if the link drops after a
+# given share of the plain transfer's chunks. Also the cost of building
+# the preview layers (camera.progressive). No camera or UART needed.
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _setup_env(tmp: Path) -> None:
+    cfg = yaml.safe_load((ROOT / "config.yaml").read_text())
+    cfg["paths"] = dict(cfg.get("paths") or {}, data_root=str(tmp))
+    cfg["logging"] = dict(cfg.get("logging") or {}, dir=str(tmp / "logs"), console=False)
+    path = tmp / "config.yaml"
+    path.write_text(yaml.safe_dump(cfg, sort_keys=False))
+    os.environ["BM_AGENT_CONFIG"] = str(path)
+    os.environ["BM_CAMERA_BACKEND"] = "fake"
+
+
+def run(res: str, fmt: str, quality: int, framing: str) -> dict:
+    from bm_camera.capture.fake_camera import FrameSource
+    from bm_camera.encode.file_encoder import get_array_encoder
+    from bm_camera.encode.layers import build_layers
+    from bm_daemon.common.config import get_progressive_settings, resolve_resolution
+    from bm_daemon.transport.spotter import chunk_count, get_spotter_tx_settings
+
+    tx_cfg = dict(get_spotter_tx_settings(), framing=framing)
+    prog = get_progressive_settings()
+    frame = FrameSource("scene", seed=3).frame(resolve_resolution(res), 0)
+    with tempfile.TemporaryDirectory() as td:
+        full = get_array_encoder(fmt)(frame, Path(td) / "img.jpg", quality=quality, suffix="-c")
+        t0 = time.perf_counter()
+        layers = build_layers(full, prog["layers"], progressive=prog["progressive_jpeg"])
+        build_s = time.perf_counter() - t0
+        parts = [(p.name, p.stat().st_size) for p in layers] + [(full.name, full.stat().st_size)]
+    # START/END lines aside, chunks are what the pacing budget is spent on
+    chunks = [chunk_count(size, tx_cfg) for _name, size in parts]
+    return {"parts": parts, "chunks": chunks, "build_ms": build_s * 1000.0}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--res", default="1080p")
+    ap.add_argument("--fmt", default="jpeg")
+    ap.add_argument("-q", type=int, default=25)
+    ap.add_argument("--framing", default="base64", choices=("base64", "binary"))
+    args = ap.parse_args()
+    with tempfile.TemporaryDirectory() as td:
+        _setup_env(Path(td))
+        r = run(args.res, args.fmt, args.q, args.framing)
+    plain = r["chunks"][-1]
+    total = sum(r["chunks"])
+    print(f"{args.res} {args.fmt} q={args.q} framing={args.framing}; layers built in {r['build_ms']:.0f}ms")
+    for (name, size), n in zip(r["parts"], r["chunks"]):
+        print(f"  {name:<16} {size:>8} bytes {n:>5} chunks")
+    print(f"first picture: plain after {plain} chunks, progressive after {r['chunks'][0]} "
+          f"(total {total} chunks, +{100.0 * (total - plain) / plain:.0f}%)")
+    for share in (0.05, 0.25, 0.5, 0.9):
+        cut = int(plain * share)
+        done, sent = [], 0
+        for (name, _size), n in zip(r["parts"], r["chunks"]):
+            if sent + n > cut:
+                break
+            sent += n
+            done.append(name)
+        print(f"  link drops after {cut:>4} chunks ({share:.0%} of plain): plain has nothing, "
+              f"progressive has {done[-1] if done else 'nothing'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/bench_serial_pump.py
+# Wakeups/sec on an idle bus and trigger->handler latency for the serial pump,
+# legacy polling loop vs. select/epoll on the UART fd. Runs over a pty pair,
+# so no hardware is needed (pyserial is).
+
+import argparse
+import os
+import statistics
+import struct
+import threading
+import time
+
+import serial
+
+from bm_daemon.io.bm_serial import BristlemouthSerial
+
+
+class _CountingUart:
+    """Proxy a serial port, counting in_waiting polls; optionally hide fileno()."""
+
+    def __init__(self, uart, hide_fd: bool):
+        self._uart = uart
+        self._hide_fd = hide_fd
+        self.polls = 0
+
+    @property
+    def in_waiting(self):
+        self.polls += 1
+        return self._uart.in_waiting
+
+    def fileno(self):
+        if self._hide_fd:
+            raise AttributeError("fileno hidden for legacy polling")
+        return self._uart.fileno()
+
+    def __getattr__(self, name):
+        return getattr(self._uart, name)
+
+
+def _pub_frame(bm: BristlemouthSerial, topic: str, payload: bytes) -> bytes:
+    t = topic.encode()
+    packet = bytearray(bm.get_pub_header() + len(t).to_bytes(2, "little") + t + b"\x00" + payload)
+    return bm.finalize_packet(packet)
+
+
+def run(mode: str, *, idle_s=2.0, triggers=20, max_latency_s=0.5) -> dict:
+    master, slave = os.openpty()
+    port = serial.Serial(os.ttyname(slave), baudrate=115200, timeout=0.5)
+    uart = _CountingUart(port, hide_fd=(mode == "poll"))
+    bm = BristlemouthSerial(uart=uart)
+
+    latencies = []
+    got = threading.Event()
+
+    def _cb(node_id, type_, version, topic_len, topic, data_len, data):
+        (t0,) = struct.unpack_from("<d", data, 1)
+        latencies.append(time.perf_counter() - t0)
+        got.set()
+
+    bm.sub_cbs.append(_cb)
+    stop = threading.Event()
+    passes = [0]
+
+    def _pump():
+        while not stop.is_set():
+            if mode == "poll":
+                # what bus.loop + _read_until_idle used to do
+                bm.bristlemouth_process(0.1)
+                time.sleep(0.05)
+            else:
+                bm.bristlemouth_process(max_latency_s)
+            passes[0] += 1
+
+    th = threading.Thread(target=_pump, daemon=True)
+    th.start()
+
+    # 1) idle wakeups
+    polls0, wake0 = uart.polls, bm.rx_stats["wakeups"]
+    passes0 = passes[0]
+    time.sleep(idle_s)
+    if mode == "poll":
+        idle_wakeups = uart.polls - polls0
+    else:
+        idle_wakeups = (passes[0] - passes0) + (bm.rx_stats["wakeups"] - wake0)
+
+    # 2) trigger -> handler latency
+    for _ in range(triggers):
+        got.clear()
+        os.write(master, _pub_frame(bm, "camera/capture/image", struct.pack("<d", time.perf_counter())))
+        got.wait(2.0)
+        time.sleep(0.02)
+
+    stop.set()
+    th.join(2.0)
+    port.close()
+    os.close(master)
+    os.close(slave)
+
+    ms = sorted(x * 1000 for x in latencies)
+    return {
+        "mode": mode,
+        "idle_wakeups_per_s": idle_wakeups / idle_s,
+        "latency_ms_median": statistics.median(ms) if ms else None,
+        "latency_ms_p95": ms[int(len(ms) * 0.95) - 1] if ms else None,
+        "delivered": len(ms),
+        "sent": triggers,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--idle", type=float, default=2.0, help="seconds of idle bus to sample")
+    ap.add_argument("--triggers", type=int, default=20)
+    ap.add_argument("--max-latency", type=float, default=0.5, help="bus.max_latency_s for select mode")
+    args = ap.parse_args()
+    for mode in ("poll", "select"):
+        r = run(mode, idle_s=args.idle, triggers=args.triggers, max_latency_s=args.max_latency)
+        print(f"{r['mode']:>7}: wakeups/s={r['idle_wakeups_per_s']:7.1f}  "
+              f"latency median={r['latency_ms_median']:.2f}ms p95={r['latency_ms_p95']:.2f}ms  "
+              f"delivered={r['delivered']}/{r['sent']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_spotter_pacing.py
+# Time-to-deliver for a file over a simulated Spotter link, per pacing
+# profile. The link drains a bounded modem queue at a fixed byte rate; a send
+# that would overflow the queue raises OSError (what a rejected spotter_tx
+# looks like to send_chunks_to_spotter). ACKs, when the profile uses them,
+# come back `ack_latency_s` after a chunk leaves the queue. Everything runs
+# on a virtual clock, so a multi-hour transfer simulates in milliseconds.
+
+import argparse
+import heapq
+import os
+import tempfile
+from pathlib import Path
+
+from bm_daemon.transport import pacing
+from bm_daemon.transport.spotter import (
+    build_chunks, get_spotter_tx_settings, send_chunks_to_spotter,
+)
+
+SIZES = (10_000, 50_000, 200_000)
+
+# name: (bytes/s, modem queue bytes, ACK latency s)
+LINKS = {
+    "cellular": (2000.0, 8000, 1.0),
+    "iridium": (50.0, 2000, 10.0),
+}
+
+
+class SimLink:
+    """Virtual clock + bounded FIFO drained at `rate` bytes/s."""
+
+    def __init__(self, rate: float, queue_bytes: int, ack_latency_s: float):
+        self.rate = rate
+        self.queue_bytes = queue_bytes
+        self.ack_latency_s = ack_latency_s
+        self.now = 0.0
+        self._busy_until = 0.0       # when the queue will be empty
+        self._pending = []           # (done_t, nbytes) still in the queue
+        self._acks = []              # heap of ack arrival times
+        self.delivered_at = 0.0
+        self.rejects = 0
+
+    # clock/sleep handed to the pacer
+    def clock(self) -> float:
+        return self.now
+
+    def sleep(self, dt: float):
+        self._advance(self.now + max(0.0, dt))
+
+    def _advance(self, t: float):
+        while self._acks and self._acks[0] <= t:
+            self.now = heapq.heappop(self._acks)
+            pacing.notify_ack(1)
+        self.now = t
+        self._pending = [(d, n) for d, n in self._pending if d > t]
+
+    # stands in for BristlemouthSerial
+    def spotter_tx(self, data: bytes):
+        self._advance(self.now)
+        queued = sum(n for _d, n in self._pending)
+        if queued + len(data) > self.queue_bytes:
+            self.rejects += 1
+            raise OSError("modem queue full")
+        start = max(self.now, self._busy_until)
+        self._busy_until = start + len(data) / self.rate
+        self._pending.append((self._busy_until, len(data)))
+        self.delivered_at = self._busy_until
+        heapq.heappush(self._acks, self._busy_until + self.ack_latency_s)
+
+
+def run(size: int, link: str, tx_cfg: dict) -> dict:
+    sim = SimLink(*LINKS[link])
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "frame-c.heic"
+        path.write_bytes(os.urandom(size))
+        basename, chunks, _ = build_chunks(path, tx_cfg)
+    pacer = pacing.make_pacer(tx_cfg, clock=sim.clock, sleep=sim.sleep)
+    try:
+        send_chunks_to_spotter(sim, file_label=basename, chunks=chunks,
+                               delay_s=tx_cfg["delay_s"], pacer=pacer)
+        ok = True
+    except OSError:
+        ok = False
+    return {"ttd_s": sim.delivered_at, "ok": ok, "rejects": sim.rejects, "chunks": len(chunks)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--framing", choices=("base64", "binary"), default=None,
+                    help="override transport.spotter.framing")
+    args = ap.parse_args()
+
+    import logging
+    logging.getLogger("TX").setLevel(logging.ERROR)
+
+    base = get_spotter_tx_settings()
+    if args.framing:
+        base["framing"] = args.framing
+    from bm_daemon.common.config import load_config
+    spot = ((load_config().get("transport") or {}).get("spotter") or {})
+    profiles = {"fixed": None}
+    profiles.update({k: dict(v or {}, name=k) for k, v in (spot.get("profiles") or {}).items()})
+
+    print(f"framing={base['framing']}  (ttd = time until the last byte leaves the modem)")
+    print(f"{'link':>9} {'profile':>9} {'file':>8} {'chunks':>6} {'ttd':>10} {'rejects':>7} ok")
+    for link in LINKS:
+        for name, prof in profiles.items():
+            for size in SIZES:
+                r = run(size, link, dict(base, pacing=prof))
+                print(f"{link:>9} {name:>9} {size:>8d} {r['chunks']:>6d} "
+                      f"{r['ttd_s']:>9.0f}s {r['rejects']:>7d} {'y' if r['ok'] else 'n'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_topic_router.py
+# Per-frame dispatch cost with many subscriptions: the old subscribe_many
+# (one filtering wrapper per topic, each re-normalizing the topic string) vs.
+# the TopicRouter (topic decoded once, one memoized lookup). Topics model
+# per-node command namespaces: "node/<id>/camera/<cmd>", plus a few wildcards.
+
+import argparse
+import random
+import struct
+import tempfile
+import time
+
+from bm_daemon.agent.bus import _norm_topic, subscribe_many
+from bm_daemon.io.bm_serial import BristlemouthSerial
+
+COMMANDS = ("capture/image", "capture/video", "status", "config", "tx/nack")
+
+
+def _topics(n: int):
+    out = []
+    node = 0
+    while len(out) < n:
+        out.extend(f"node/{node:04x}/camera/{c}" for c in COMMANDS)
+        node += 1
+    return out[:n]
+
+
+def _payload(topic: str, data: bytes = b"\x00go") -> bytes:
+    t = topic.encode()
+    return struct.pack("<QBBH", 0xC0FFEE, 1, 1, len(t)) + t + data
+
+
+def _legacy_subscribe_many(bm, topics, cb):
+    # subscribe_many before the router: every wrapper sees every frame
+    for sub in topics:
+        def _wrapped(node_id, type_, version, topic_len, topic, data_len, data, _sub=sub):
+            if _norm_topic(topic) != _sub:
+                return
+            cb(node_id, type_, version, topic_len, topic, data_len, data)
+        bm.bristlemouth_sub(sub, _wrapped)
+
+
+def _bm(tmp):
+    return BristlemouthSerial(uart=open(tmp.name, "wb"))
+
+
+def run(n: int, frames: int = 20_000, wildcards: bool = True) -> dict:
+    topics = _topics(n)
+    frames_in = [_payload(random.choice(topics)) for _ in range(1000)]
+    hits = [0]
+
+    def cb(*_a):
+        hits[0] += 1
+
+    out = {"topics": n}
+    with tempfile.NamedTemporaryFile() as tmp:
+        for mode in ("legacy", "router"):
+            bm = _bm(tmp)
+            if mode == "legacy":
+                _legacy_subscribe_many(bm, topics, cb)
+            else:
+                subs = list(topics)
+                if wildcards:
+                    subs += ["node/*/camera/status", "node/0000/**"]
+                subscribe_many(bm, subs, cb)
+            hits[0] = 0
+            t0 = time.perf_counter()
+            for i in range(frames):
+                bm._process_publish_message(frames_in[i % len(frames_in)])
+            dt = time.perf_counter() - t0
+            out[f"{mode}_us"] = dt / frames * 1e6
+            out[f"{mode}_calls"] = hits[0]
+            bm.uart.close()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--frames", type=int, default=20_000)
+    args = ap.parse_args()
+    random.seed(1)
+    print(f"{'topics':>6} {'legacy us/frame':>16} {'router us/frame':>16} {'speedup':>8}")
+    for n in (10, 100, 250, 500):
+        r = run(n, args.frames)
+        print(f"{n:>6d} {r['legacy_us']:>16.2f} {r['router_us']:>16.2f} "
+              f"{r['legacy_us'] / r['router_us']:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_transport_framing.py
+# Bytes on the wire and chunk counts for a file sent over spotter_tx:
+# base64 text framing ("<I{n}>...\n", chunk_size chars) vs. binary framing
+# (10-byte header + raw bytes, mtu bytes per chunk). START/END lines included.
+# Binary chunks are also round-tripped through the reference reassembler.
+
+import argparse
+import os
+import random
+import tempfile
+from pathlib import Path
+
+from bm_daemon.transport.spotter import build_base64_chunks, build_binary_chunks
+from bm_daemon.transport.spotter_rx import Reassembler
+
+SIZES = (10_000, 50_000, 200_000, 1_000_000)
+
+
+def _start_end(name: str, n: int, binary: bool) -> int:
+    framing = ", framing: bin" if binary else ""
+    return len(f"<START IMG> filename: {name}, chunks: {n}{framing}\n") + len("<END IMG>\n")
+
+
+def run(size: int, *, chunk_size: int = 300, mtu: int = 300) -> dict:
+    with tempfile.TemporaryDirectory() as d:
+        path = Path(d) / "frame-c.heic"
+        data = os.urandom(size)  # encoded images are ~incompressible
+        path.write_bytes(data)
+
+        name, b64_chunks, _ = build_base64_chunks(path, chunk_size=chunk_size)
+        b64_wire = sum(len(f"<I{i}>{c}\n") for i, c in enumerate(b64_chunks))
+        b64_wire += _start_end(name, len(b64_chunks), False)
+
+        name, bin_chunks, _ = build_binary_chunks(path, mtu=mtu)
+        bin_wire = sum(len(c) for c in bin_chunks) + _start_end(name, len(bin_chunks), True)
+
+        rx = Reassembler()
+        shuffled = list(bin_chunks)
+        random.shuffle(shuffled)
+        done = [r for r in map(rx.feed, shuffled) if r]
+        assert len(done) == 1 and done[0][1] == data
+
+    return {
+        "file_bytes": size,
+        "b64_chunks": len(b64_chunks), "b64_wire": b64_wire,
+        "bin_chunks": len(bin_chunks), "bin_wire": bin_wire,
+        "wire_saving": 1 - bin_wire / b64_wire,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--chunk-size", type=int, default=300, help="base64 chars per chunk")
+    ap.add_argument("--mtu", type=int, default=300, help="binary bytes per chunk")
+    args = ap.parse_args()
+    print(f"{'file':>9} {'b64 chunks':>10} {'b64 wire':>10} {'bin chunks':>10} {'bin wire':>10} {'saving':>7}")
+    for size in SIZES:
+        r = run(size, chunk_size=args.chunk_size, mtu=args.mtu)
+        print(f"{r['file_bytes']:>9d} {r['b64_chunks']:>10d} {r['b64_wire']:>10d} "
+              f"{r['bin_chunks']:>10d} {r['bin_wire']:>10d} {r['wire_saving']:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+# benchmarks/suite.py
+# Headless benchmark suite for the trigger -> capture -> encode -> transmit
+# path, written as JSON so runs can be compared over time:
+#
+#   python -m benchmarks.suite                      # all, -> benchmarks/results/<UTC>_<commit>.json
+#   python -m benchmarks.suite --quick --only parse,encode
+#   python -m benchmarks.suite --compare old.json new.json
+#
+# Runs against the fake camera (bm_camera.capture.fake_camera) and a fake
+# BM node on a pty (bm_daemon.io.fake_bm), with a private copy of
+# config.yaml (data under a temp dir). --camera real uses Picamera2 for
+# the capture benchmark on a Pi. Each benchmark is one function returning a
+# dict of numbers; times are in ms unless a key says otherwise.
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import yaml
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+BENCHES = {}
+
+
+def bench(name: str):
+    def deco(fn):
+        BENCHES[name] = fn
+        return fn
+    return deco
+
+
+def _pct(values, q: float) -> float:
+    vals = sorted(values)
+    return vals[min(len(vals) - 1, int(round(q * (len(vals) - 1))))]
+
+
+def _summary(values_s) -> dict:
+    ms = [v * 1000.0 for v in values_s]
+    return {"n": len(ms), "p50_ms": _pct(ms, 0.5), "p95_ms": _pct(ms, 0.95),
+            "mean_ms": statistics.mean(ms), "max_ms": max(ms)}
+
+
+def _setup_env(tmp: Path, camera: str, fps: float) -> Path:
+    """Private config (data/logs in tmp, fake camera) exported via BM_AGENT_CONFIG."""
+    cfg = yaml.safe_load((ROOT / "config.yaml").read_text())
+    cfg["paths"] = dict(cfg.get("paths") or {}, data_root=str(tmp))
+    cfg["logging"] = dict(cfg.get("logging") or {}, dir=str(tmp / "logs"), console=False)
+    cam = cfg.setdefault("camera", {})
+    cam["backend"] = "fake" if camera == "fake" else "picamera2"
+    cam["fake"] = dict(cam.get("fake") or {}, fps=fps)
+    path = tmp / "config.yaml"
+    path.write_text(yaml.safe_dump(cfg, sort_keys=False))
+    os.environ["BM_AGENT_CONFIG"] = str(path)
+    os.environ["BM_CAMERA_BACKEND"] = cam["backend"]
+    return path
+
+
+# ---- bus ----
+
+def _pub(topic: str, payload: bytes) -> bytes:
+    """One wire frame (COBS + delimiter) carrying a text-type PUB."""
+    from bm_daemon.io.fake_bm import pub_packet
+    return pub_packet(topic, b"\x00" + payload)
+
+
+@bench("parse")
+def bench_parse(quick: bool) -> dict:
+    """Frames/s through the RX framer: in memory (_feed_rx) and over a pty (bristlemouth_process)."""
+    from bm_daemon.io.bm_serial import BristlemouthSerial
+    from bm_daemon.io.fake_bm import FakeBmPeer
+    from bm_daemon.agent.router import TopicRouter
+
+    n = 5_000 if quick else 50_000
+    frame = _pub("sensor/data", b"x" * 48)
+    seen = [0]
+
+    def count(_frame):
+        seen[0] += 1
+
+    router = TopicRouter()
+    router.add("sensor/data", count)
+    out = {"frame_bytes": len(frame)}
+
+    bm = BristlemouthSerial(uart=object())
+    bm.router = router
+    blob = frame * 200
+    t0 = time.perf_counter()
+    for _ in range(n // 200):
+        bm._feed_rx(blob)
+    dt = time.perf_counter() - t0
+    out["feed_frames_per_s"] = seen[0] / dt
+
+    peer = FakeBmPeer().start()
+    bm = BristlemouthSerial(port=peer.port, baudrate=115200, timeout=0.5)
+    bm.router = router
+    try:
+        seen[0] = 0
+        writer = threading.Thread(target=lambda: [peer.write(blob) for _ in range(n // 200)], daemon=True)
+        t0 = time.perf_counter()
+        writer.start()
+        while seen[0] < (n // 200) * 200 and time.perf_counter() - t0 < 60:
+            bm.bristlemouth_process(0.2)
+        dt = time.perf_counter() - t0
+        writer.join()
+        out["pty_frames_per_s"] = seen[0] / dt
+        out["pty_crc_errors"] = bm.rx_stats["crc_errors"]
+    finally:
+        bm.close()
+        peer.stop()
+    return out
+
+
+@bench("dispatch")
+def bench_dispatch(quick: bool) -> dict:
+    """Peer write -> routed callback over the pty, with the bus pump running (select wakeup included)."""
+    from bm_daemon.io.bm_serial import BristlemouthSerial
+    from bm_daemon.io.fake_bm import FakeBmPeer
+    from bm_daemon.agent.router import TopicRouter
+    from bm_daemon.agent.command import attach_command
+
+    n = 100 if quick else 500
+    arrived = {}
+    done = threading.Event()
+
+    def on_frame(frame):
+        arrived[bytes(frame.payload)] = time.perf_counter()
+        attach_command(frame)
+        if len(arrived) >= n:
+            done.set()
+
+    router = TopicRouter()
+    for t in ("camera/capture/image", "camera/capture/video", "camera/*", "spotter/utc-time"):
+        router.add(t, on_frame)
+    peer = FakeBmPeer().start()
+    bm = BristlemouthSerial(port=peer.port, baudrate=115200, timeout=0.5)
+    bm.router = router
+    stop = threading.Event()
+    pump = threading.Thread(target=lambda: [bm.bristlemouth_process(0.5) for _ in iter(stop.is_set, True)],
+                            daemon=True)
+    pump.start()
+    sent = {}
+    try:
+        for i in range(n):
+            payload = b"res=VGA,q=%d" % i
+            sent[b"\x00" + payload] = time.perf_counter()
+            peer.write(_pub("camera/capture/image", payload))
+            time.sleep(0.002)
+        done.wait(10)
+    finally:
+        stop.set()
+        pump.join(2)
+        bm.close()
+        peer.stop()
+    lat = [arrived[p] - t for p, t in sent.items() if p in arrived]
+    out = _summary(lat)
+    out["lost"] = n - len(lat)
+    return out
+
+
+@bench("dedup")
+def bench_dedup(quick: bool) -> dict:
+    """is_dup() per frame with the repo's dedup rules, on a mixed trigger/sensor stream."""
+    from bm_daemon.common.config import load_config
+    from bm_daemon.agent.dedup import Dedup
+
+    n = 20_000 if quick else 200_000
+    now = [0.0]
+    dd = Dedup.from_config(load_config())
+    dd._clock = lambda: now[0]   # simulated time: 100 frames/s
+    stream = []
+    for i in range(1000):
+        if i % 10 == 0:
+            stream.append(("camera/capture/video", b"\x00dur=%d,res=720p" % (1 + i % 5)))
+        elif i % 3 == 0:
+            stream.append(("camera/capture/image", b"\x00res=1080p"))
+        else:
+            stream.append(("sensor/data", b"\x00v=%d" % i))
+    hits = 0
+    t0 = time.perf_counter()
+    for i in range(n):
+        now[0] += 0.01
+        topic, data = stream[i % len(stream)]
+        hits += dd.is_dup(1, topic, data)
+    dt = time.perf_counter() - t0
+    return {"per_frame_us": dt / n * 1e6, "hit_rate": hits / n, "size": dd.snapshot()["size"]}
+
+
+# ---- camera / encode ----
+
+@bench("capture")
+def bench_capture(quick: bool) -> dict:
+    """CameraSession latency per acquisition kind (cold / reconfig / warm) per resolution."""
+    from bm_camera.capture.camera_session import CameraSession
+    from bm_camera.capture.backend import BACKEND
+    from bm_daemon.common.config import get_camera_session_settings, resolve_resolution
+
+    keys = ("VGA", "1080p") if quick else ("VGA", "720p", "1080p", "12MP")
+    warm_n = 5 if quick else 20
+    settle = get_camera_session_settings()["settle_s"]
+    out = {"backend": BACKEND, "settle_s": settle}
+    for key in keys:
+        size = resolve_resolution(key)
+        s = CameraSession(idle_timeout_s=0, settle_s=settle)
+        try:
+            for _ in range(1 + warm_n):
+                with s.still(size) as cam:
+                    cam.capture_array("main")
+            with s.still(resolve_resolution("VGA" if key != "VGA" else "720p")) as cam:
+                cam.capture_array("main")
+            with s.still(size) as cam:
+                cam.capture_array("main")
+        finally:
+            s.close()
+        snap = s.snapshot()
+        out[key] = {k: snap[k]["avg_s"] * 1000.0 for k in ("cold", "reconfig", "warm") if snap[k]["count"]}
+    return out
+
+
+@bench("encode")
+def bench_encode(quick: bool) -> dict:
+    """Encode time and size per format x camera.resolutions entry (selected backend, synthetic frame)."""
+    from benchmarks.bench_capture_pipeline import synthetic_frame
+    from bm_camera.encode.file_encoder import _HEIF_OK, get_array_encoder, select_backend
+    from bm_daemon.common.config import get_resolutions
+
+    fmts = ["jpeg"] + (["heif"] if _HEIF_OK else [])
+    res = sorted(get_resolutions().items(), key=lambda kv: kv[1][0] * kv[1][1])
+    if quick:
+        res = [kv for kv in res if kv[1][0] * kv[1][1] <= 1920 * 1080]
+    repeat = 2 if quick else 3
+    out = {}
+    with tempfile.TemporaryDirectory() as td:
+        for key, (w, h) in res:
+            frame = synthetic_frame(w, h)
+            for fmt in fmts:
+                enc = get_array_encoder(fmt)
+                times, size = [], 0
+                for i in range(repeat + 1):
+                    t0 = time.perf_counter()
+                    p = enc(frame, Path(td) / f"{key}_{fmt}_{i}.jpg", quality=25, suffix="-c")
+                    if i:   # first run warms the codec
+                        times.append(time.perf_counter() - t0)
+                    size = p.stat().st_size
+                out[f"{fmt}/{key}"] = {"backend": select_backend(fmt, size=(w, h)).name, "ms": min(times) * 1000.0,
+                                       "ms_per_mp": min(times) * 1000.0 / (w * h / 1e6), "bytes": size}
+    return out
+
+
+@bench("change")
+def bench_change(quick: bool) -> dict:
+    """Change-detection cost per resolution (in-memory frame, and JPEG file), and its decisions on the fake scene."""
+    from benchmarks.bench_capture_pipeline import synthetic_frame
+    from bm_camera.capture.fake_camera import FrameSource
+    from bm_camera.encode.change import ChangeDetector, luma_grid, luma_grid_file
+    from bm_daemon.common.config import get_change_settings
+    from PIL import Image
+
+    c = get_change_settings()
+    sizes = [(1920, 1080)] if quick else [(1920, 1080), (4056, 3040)]
+    repeat = 10 if quick else 50
+    out = {}
+    with tempfile.TemporaryDirectory() as td:
+        for w, h in sizes:
+            frame = synthetic_frame(w, h)
+            p = Path(td) / f"{w}x{h}.jpg"
+            Image.fromarray(frame).save(p, quality=85)
+            row = {}
+            for name, fn, n in (("frame", lambda: luma_grid(frame, c["grid"]), repeat),
+                                ("jpeg", lambda: luma_grid_file(p, c["grid"]), max(3, repeat // 10))):
+                fn()
+                t0 = time.perf_counter()
+                for _ in range(n):
+                    fn()
+                row[f"{name}_ms"] = (time.perf_counter() - t0) * 1000.0 / n
+            out[f"{w}x{h}"] = row
+    # a drifting seascape: mostly skips, until the drift adds up
+    src = FrameSource("scene", seed=1)
+    for method in ("diff", "hash"):
+        d = ChangeDetector.from_settings(dict(c, method=method) if method == c["method"]
+                                         else dict(c, method=method, skip_below=None, thumb_below=None))
+        decisions = [d.check(src.frame((1280, 720), i * 5))[0] for i in range(20)]
+        out[f"decisions/{method}"] = {k: decisions.count(k) for k in ("skip", "thumb", "full")}
+    return out
+
+
+# ---- transport ----
+
+@bench("chunking")
+def bench_chunking(quick: bool) -> dict:
+    """build_base64_chunks (and binary framing, with and without FEC repair chunks) cost per file size."""
+    from bm_daemon.transport.spotter import build_base64_chunks, build_binary_chunks
+
+    FEC = {"ratio": 0.25, "block": 64, "depth": 8}
+    sizes = (10_000, 100_000) if quick else (10_000, 100_000, 1_000_000)
+    repeat = 5 if quick else 20
+    out = {}
+    with tempfile.TemporaryDirectory() as td:
+        for size in sizes:
+            p = Path(td) / f"f{size}.bin"
+            p.write_bytes(os.urandom(size))
+            for name, fn in (("base64", lambda: build_base64_chunks(p, chunk_size=300)),
+                             ("binary", lambda: build_binary_chunks(p, mtu=300)),
+                             ("binary+fec", lambda: build_binary_chunks(p, mtu=300, fec=FEC))):
+                best, chunks = None, None
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    res = fn()
+                    dt = time.perf_counter() - t0
+                    best = dt if best is None else min(best, dt)
+                    chunks = res[1]   # (basename, chunks, raw_len)
+                out[f"{name}/{size // 1000}k"] = {"ms": best * 1000.0, "us_per_kb": best * 1e6 / (size / 1000),
+                                                  "chunks": len(chunks)}
+    return out
+
+
+@bench("e2e")
+def bench_e2e(quick: bool) -> dict:
+    """The real agent against the fake node: start-up, trigger->OK and trigger->last chunk."""
+    from benchmarks.bench_agent_e2e import run
+
+    r = run(3 if quick else 10, "VGA", send=True, fps=30.0, runtime="sync")
+    return {"startup_ms": r["startup_s"] * 1000.0,
+            "trigger_to_ok": _summary(r["latency_s"]),
+            "trigger_to_ok_warm": _summary(r["latency_s"][1:] or r["latency_s"]),
+            "trigger_to_last_chunk": _summary(r["last_chunk_s"]),
+            "chunks": r["chunks"], "chunk_bytes": r["chunk_bytes"],
+            "bus_crc_errors": r["peer"]["crc_errors"]}
+
+
+# ---- results ----
+
+def _meta(args) -> dict:
+    def git(*cmd):
+        try:
+            return subprocess.run(["git", *cmd], cwd=ROOT, capture_output=True, text=True,
+                                  timeout=10).stdout.strip()
+        except Exception:
+            return ""
+    return {"time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "-uno")),
+            "python": platform.python_version(), "machine": platform.machine(),
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "camera": args.camera, "fake_fps": args.fps, "quick": args.quick}
+
+
+def _flatten(d: dict, prefix: str = "") -> dict:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def compare(old_path: str, new_path: str) -> None:
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"old: {old['meta'].get('commit')} {old['meta'].get('time')}   "
+          f"new: {new['meta'].get('commit')} {new['meta'].get('time')}")
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    for key in sorted(set(a) & set(b)):
+        va, vb = a[key], b[key]
+        change = f"{(vb - va) / va * 100:+.1f}%" if va else ""
+        print(f"  {key:<48} {va:>12.4g} {vb:>12.4g} {change:>9}")
+    only_old, only_new = len(set(a) - set(b)), len(set(b) - set(a))
+    if only_old or only_new:
+        print(f"  ({only_old} value(s) only in old, {only_new} only in new)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Headless benchmark suite (JSON output)")
+    ap.add_argument("--only", default="", help=f"comma list of: {', '.join(BENCHES)}")
+    ap.add_argument("--quick", action="store_true", help="smaller sizes/counts (CI)")
+    ap.add_argument("--camera", default="fake", choices=("fake", "real"))
+    ap.add_argument("--fps", type=float, default=30.0, help="fake camera frame rate")
+    ap.add_argument("--out", help="JSON path (default benchmarks/results/<time>_<commit>.json)")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    args = ap.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or list(BENCHES)
+    unknown = [n for n in names if n not in BENCHES]
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    # handlers log as in the daemon (dedup drops, captures); keep the report readable
+    logging.getLogger().addHandler(logging.NullHandler())
+    with tempfile.TemporaryDirectory() as td:
+        _setup_env(Path(td), args.camera, args.fps)
+        doc = {"meta": _meta(args), "results": {}, "errors": {}}
+        for name in names:
+            t0 = time.perf_counter()
+            print(f"[{name}] {BENCHES[name].__doc__.strip()}", flush=True)
+            try:
+                doc["results"][name] = BENCHES[name](args.quick)
+            except Exception as e:
+                doc["errors"][name] = repr(e)
+                print(f"  FAILED: {e!r}", flush=True)
+                continue
+            for k, v in _flatten(doc["results"][name]).items():
+                print(f"  {k:<44} {v:.4g}")
+            print(f"  ({time.perf_counter() - t0:.1f}s)", flush=True)
+
+    out = Path(args.out) if args.out else RESULTS_DIR / (
+        doc["meta"]["time"].replace(":", "").replace("-", "") + f"_{doc['meta']['commit'] or 'nogit'}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, indent=2, sort_keys=True))
+    print(f"wrote {out}")
+    if doc["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,3 @@
-from .image_capture import capture_image
+from .image_capture import capture_image, capture_image_array, capture_image_hw
 from .video_capture import capture_video
-__all__ = ["capture_image", "capture_video"]
+__all__ = ["capture_image", "capture_image_array", "capture_image_hw", "capture_video"]
@@ -0,0 +1,23 @@
+# bm_camera/capture/backend.py
+"""
+Camera backend selection: the real Picamera2 classes, or the synthetic
+stand-ins from bm_camera.capture.fake_camera when camera.backend is "fake"
+(or BM_CAMERA_BACKEND=fake in the environment). Capture modules import
+Picamera2 / H264Encoder / Output / FileOutput / FfmpegOutput from here.
+"""
+from bm_daemon.common.config import get_camera_backend_settings
+
+BACKEND = get_camera_backend_settings()["backend"]
+
+if BACKEND == "fake":
+    from bm_camera.capture.fake_camera import (  # noqa: F401
+        FakePicamera2 as Picamera2,
+        FakeH264Encoder as H264Encoder,
+        FakeOutput as Output,
+        FakeFileOutput as FileOutput,
+        FakeFfmpegOutput as FfmpegOutput,
+    )
+else:
+    from picamera2 import Picamera2  # noqa: F401
+    from picamera2.encoders import H264Encoder  # noqa: F401
+    from picamera2.outputs import FfmpegOutput, FileOutput, Output  # noqa: F401
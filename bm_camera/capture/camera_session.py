@@ -0,0 +1,274 @@
+# bm_camera/capture/camera_session.py
+"""
+Long-lived Picamera2 owner for the daemon.
+
+Bringing the sensor up (Picamera2(), configure, start, AE/AWB settle) costs
+far more than a capture. CameraSession keeps one camera configured between
+requests, switches between still and video configurations only when the
+requested mode changes, and closes the camera after `idle_timeout_s` without
+use. Each acquisition is classified as:
+  cold     : camera had to be opened
+  reconfig : open, but a different mode/size was requested (stop/configure/start)
+  restart  : same configuration, but stopped (e.g. after a recording)
+  warm     : configured and streaming; capture immediately
+and its latency is recorded per class.
+
+arm() adds a standing recording (the pre-roll ring of video_capture): the
+camera records into the given output whenever no request holds it. A still
+or a plain recording pauses it and it resumes when that request ends, so
+the pre-roll has a gap around other captures but never blocks them.
+"""
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from bm_camera.capture.backend import Picamera2
+
+from bm_daemon.common.config import get_camera_session_settings
+
+log = logging.getLogger("CAM")
+
+KINDS = ("cold", "reconfig", "restart", "warm")
+
+
+class CameraSession:
+    def __init__(self, idle_timeout_s: float = 30.0, settle_s: float = 0.5):
+        self.idle_timeout_s = float(idle_timeout_s)
+        self.settle_s = float(settle_s)
+        self._lock = threading.RLock()
+        self._cam = None
+        self._mode = None        # hashable description of the active configuration
+        self._started = False
+        self._idle_timer = None
+        self._standing = None    # (mode, make_config, encoder, output) while armed
+        self._recording = False  # the standing recording is running
+        self.stats = {k: {"count": 0, "total_s": 0.0, "last_s": 0.0} for k in KINDS}
+
+    # ---- internals ----
+    def _cancel_idle(self):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+
+    def _arm_idle(self):
+        self._cancel_idle()
+        if self.idle_timeout_s > 0:
+            self._idle_timer = threading.Timer(self.idle_timeout_s, self._on_idle)
+            self._idle_timer.daemon = True
+            self._idle_timer.start()
+
+    def _on_idle(self):
+        # Don't wait on a capture in progress; it re-arms the timer when done
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            # an armed ring keeps the camera up for good
+            if self._cam is not None and not self._recording:
+                log.info("[CAM] idle %.0fs; powering down camera", self.idle_timeout_s)
+                self._close_locked()
+        finally:
+            self._lock.release()
+
+    def _close_locked(self):
+        cam, self._cam = self._cam, None
+        self._mode = None
+        self._started = False
+        recording, self._recording = self._recording, False
+        if cam is None:
+            return
+        if recording:
+            try:
+                cam.stop_recording()
+            except Exception:
+                pass
+        try:
+            cam.stop()
+        except Exception:
+            pass
+        try:
+            cam.close()
+        except Exception:
+            pass
+        time.sleep(0.05)  # small settle
+
+    def _prepare(self, mode, make_config):
+        """Bring the camera to `mode`; returns the acquisition kind."""
+        if self._cam is None:
+            self._cam = Picamera2()
+            kind = "cold"
+        elif self._mode != mode:
+            kind = "reconfig"
+        elif not self._started:
+            kind = "restart"
+        else:
+            return "warm"
+
+        if self._started:
+            self._cam.stop()
+            self._started = False
+        if self._mode != mode:
+            self._cam.configure(make_config(self._cam))
+            self._mode = mode
+        return kind
+
+    @staticmethod
+    def _video_mode(size, hflip: bool, vflip: bool, fps=None):
+        mode = ("video", tuple(size), bool(hflip), bool(vflip), fps)
+
+        def _make(cam):
+            config = cam.create_video_configuration(main={"size": tuple(size), "format": "YUV420"}, controls={})
+            # Optional flips via controls; safe across libcamera builds
+            if hflip:
+                config["controls"] = dict(config.get("controls", {}), HorizontalFlip=True)
+            if vflip:
+                config["controls"] = dict(config.get("controls", {}), VerticalFlip=True)
+            if fps:
+                config["controls"] = dict(config.get("controls", {}), FrameRate=float(fps))
+            return config
+
+        return mode, _make
+
+    def _pause_standing(self):
+        if not self._recording:
+            return
+        self._recording = False
+        self._started = False    # stop_recording() stops the camera
+        try:
+            self._cam.stop_recording()
+        except Exception as e:
+            log.warning("[CAM] pre-roll stop failed (%r); reopening camera", e)
+            self._close_locked()
+
+    def _resume_standing(self):
+        if self._standing is None or self._recording:
+            return
+        mode, make, encoder, output = self._standing
+        t0 = time.monotonic()
+        try:
+            kind = self._prepare(mode, make)
+            self._cam.start_recording(encoder, output)
+        except Exception as e:
+            log.error("[CAM] pre-roll recording failed to start: %r", e)
+            self._close_locked()
+            return
+        self._started = self._recording = True
+        log.info("[CAM] pre-roll recording %s in %.3fs", kind, time.monotonic() - t0)
+
+    def _record(self, kind: str, t0: float):
+        dt = time.monotonic() - t0
+        s = self.stats[kind]
+        s["count"] += 1
+        s["total_s"] += dt
+        s["last_s"] = dt
+        log.info("[CAM] %s %s capture latency=%.3fs", self._mode[0] if self._mode else "?", kind, dt)
+
+    # ---- public API ----
+    @contextmanager
+    def still(self, size, fmt: str = "BGR888"):
+        """
+        Yield a started Picamera2 in still configuration at `size`.
+        Latency from request to end of the with-block is recorded.
+        """
+        mode = ("still", tuple(size), fmt)
+        with self._lock:
+            self._cancel_idle()
+            t0 = time.monotonic()
+            try:
+                self._pause_standing()
+                kind = self._prepare(
+                    mode, lambda cam: cam.create_still_configuration(main={"size": tuple(size), "format": fmt}))
+                if not self._started:
+                    self._cam.start()
+                    self._started = True
+                    time.sleep(self.settle_s)  # AE/AWB settle, only after a (re)start
+                yield self._cam
+                self._record(kind, t0)
+            except Exception:
+                # Unknown camera state: start from scratch next time
+                self._close_locked()
+                raise
+            finally:
+                self._resume_standing()
+                self._arm_idle()
+
+    @contextmanager
+    def video(self, size, *, hflip: bool = False, vflip: bool = False):
+        """
+        Yield a configured (not started) Picamera2 in video configuration; the
+        caller drives start_recording()/stop_recording(). Recording stops the
+        camera, so the next request is at best a 'restart'.
+        """
+        mode, _make = self._video_mode(size, hflip, vflip)
+        with self._lock:
+            self._cancel_idle()
+            t0 = time.monotonic()
+            try:
+                self._pause_standing()
+                kind = self._prepare(mode, _make)
+                self._record(kind, t0)  # bring-up latency; recording time is the caller's
+                yield self._cam
+                self._started = False    # stop_recording() stops the camera
+            except Exception:
+                self._close_locked()
+                raise
+            finally:
+                self._resume_standing()
+                self._arm_idle()
+
+    def arm(self, size, encoder, output, *, hflip: bool = False, vflip: bool = False, fps=None) -> bool:
+        """
+        Record `encoder` -> `output` in video configuration whenever the camera
+        is otherwise idle, until disarm(). Returns True once recording.
+        """
+        mode, make = self._video_mode(size, hflip, vflip, fps)
+        with self._lock:
+            self._cancel_idle()
+            self._pause_standing()
+            self._standing = (mode, make, encoder, output)
+            self._resume_standing()
+            if not self._recording:
+                self._arm_idle()
+            return self._recording
+
+    def disarm(self):
+        with self._lock:
+            self._pause_standing()
+            self._standing = None
+            self._arm_idle()
+
+    @property
+    def recording(self) -> bool:
+        """True while the standing (armed) recording is running."""
+        return self._recording
+
+    def close(self):
+        with self._lock:
+            self._cancel_idle()
+            self._standing = None
+            self._close_locked()
+
+    def snapshot(self) -> dict:
+        out = {}
+        for k, s in self.stats.items():
+            out[k] = dict(s, avg_s=(s["total_s"] / s["count"]) if s["count"] else 0.0)
+        return out
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Process-wide CameraSession, or None when camera.session.enabled is false."""
+    global _session
+    settings = get_camera_session_settings()
+    if not settings["enabled"]:
+        return None
+    with _session_lock:
+        if _session is None:
+            _session = CameraSession(idle_timeout_s=settings["idle_timeout_s"],
+                                     settle_s=settings["settle_s"])
+            atexit.register(_session.close)
+        return _session
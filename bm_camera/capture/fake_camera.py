@@ -0,0 +1,309 @@
+# bm_camera/capture/fake_camera.py
+"""
+Synthetic stand-in for Picamera2, for running the capture path (and the
+whole agent) on a machine with no camera. Selected with
+camera.backend: fake (or BM_CAMERA_BACKEND=fake); see bm_camera.capture.backend.
+
+It implements the part of the Picamera2 API this package uses:
+configure/start/stop/close, capture_array, capture_file, and
+start_recording/stop_recording with an encoder and an output (anything
+with Picamera2's outputframe(frame, keyframe, timestamp)).
+Frames come from camera.fake.source:
+  scene : sky/sea gradient with noise that drifts `motion_px` per frame
+  noise : uniform random pixels (worst case for every encoder)
+  <path>: an image file, a directory or a glob; resized and cycled
+and are paced at camera.fake.fps, so capture timing is realistic.
+
+Recording writes a Motion-JPEG stream (one JPEG per frame) whatever the
+file extension says: the point is realistic sizes and timing, not
+playable H.264.
+"""
+import glob
+import logging
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from bm_daemon.common.config import get_camera_backend_settings
+
+log = logging.getLogger("CAM")
+
+SENSOR_RESOLUTION = (4056, 3040)   # HQ camera (IMX477), the largest configured size
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+
+class FrameSource:
+    """Deterministic frames of any size: frame(size, index) -> HxWx3 uint8 (RGB)."""
+
+    def __init__(self, source: str = "scene", *, seed: int = 0, motion_px: int = 2, noise: float = 4.0):
+        self.source = str(source)
+        self.seed = int(seed)
+        self.motion_px = int(motion_px)
+        self.noise = float(noise)
+        self._cache = {}
+        self._files = []
+        if self.source not in ("scene", "noise"):
+            p = Path(self.source).expanduser()
+            if p.is_dir():
+                names = sorted(str(f) for f in p.iterdir() if f.suffix.lower() in _IMAGE_EXTS)
+            elif p.exists():
+                names = [str(p)]
+            else:
+                names = sorted(glob.glob(str(p)))
+            if not names:
+                raise FileNotFoundError(f"fake camera source {self.source!r} has no images")
+            self._files = names
+
+    def _scene(self, size):
+        base = self._cache.get(("scene", size))
+        if base is None:
+            w, h = size
+            rng = np.random.default_rng(self.seed)
+            y = np.linspace(0, 1, h, dtype=np.float32)[:, None]
+            x = np.linspace(0, 1, w, dtype=np.float32)[None, :]
+            img = np.stack([120 + 80 * y + 0 * x, 140 + 60 * x * y, 180 - 60 * y + 0 * x], axis=-1)
+            img[int(h * 0.45):] *= 0.7   # horizon
+            img += 10 * np.sin(x * 240 + y * 90)[..., None]   # swell
+            img += rng.normal(0, self.noise, size=(h, w, 3)).astype(np.float32)
+            base = self._cache[("scene", size)] = np.clip(img, 0, 255).astype(np.uint8)
+        return base
+
+    def _image(self, path: str, size):
+        img = self._cache.get((path, size))
+        if img is None:
+            with Image.open(path) as im:
+                img = np.asarray(im.convert("RGB").resize(size, Image.BILINEAR))
+            if len(self._cache) > 32:
+                self._cache.clear()
+            self._cache[(path, size)] = img
+        return img
+
+    def frame(self, size, index: int = 0) -> np.ndarray:
+        size = (int(size[0]), int(size[1]))
+        if self.source == "noise":
+            rng = np.random.default_rng((self.seed, index))
+            return rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+        if self._files:
+            return self._image(self._files[index % len(self._files)], size).copy()
+        base = self._scene(size)
+        shift = (index * self.motion_px) % size[0]
+        return np.roll(base, shift, axis=1) if shift else base.copy()
+
+
+def _default_source() -> FrameSource:
+    f = get_camera_backend_settings()["fake"]
+    return FrameSource(f["source"], seed=f["seed"], motion_px=f["motion_px"], noise=f["noise"])
+
+
+class FakeH264Encoder:
+    """Encoder stand-in: each frame becomes a JPEG whose quality tracks the bitrate."""
+
+    def __init__(self, bitrate: int = 3_000_000, repeat: bool = False, iperiod: int = None, **kwargs):
+        self.bitrate = int(bitrate or 3_000_000)
+        # every JPEG stands alone, but frames are flagged as keyframes every
+        # `iperiod` like a GOP, so ring buffers behave as with H.264
+        self.iperiod = max(1, int(iperiod or 1))
+        self.kwargs = kwargs
+
+    def encode(self, frame: np.ndarray, fps: float) -> bytes:
+        import io
+        # keep roughly bitrate/fps bytes per frame: pick quality by pixels per byte
+        per_frame = self.bitrate / 8.0 / max(1.0, fps)
+        quality = int(min(90, max(10, 400 * per_frame / frame[..., 0].size)))
+        buf = io.BytesIO()
+        Image.fromarray(frame).save(buf, format="JPEG", quality=quality)
+        return buf.getvalue()
+
+
+class FakeOutput:
+    """picamera2.outputs.Output stand-in: the encoder calls outputframe() per frame."""
+
+    def __init__(self, pts=None):
+        self.recording = False
+
+    def start(self):
+        self.recording = True
+
+    def stop(self):
+        self.recording = False
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, *args, **kwargs):
+        pass
+
+
+class FakeFileOutput(FakeOutput):
+    def __init__(self, file=None, **kwargs):
+        super().__init__()
+        self.path = file
+        self._f = None
+        self.bytes = 0
+
+    def start(self):
+        self._f = open(self.path, "wb")
+        super().start()
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, *args, **kwargs):
+        self.write(frame)
+
+    def write(self, data: bytes):
+        self._f.write(data)
+        self.bytes += len(data)
+
+    def stop(self):
+        super().stop()
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+# no muxing here: the fake stream is written as-is under the .mp4 name
+FakeFfmpegOutput = FakeFileOutput
+
+
+class FakePicamera2:
+    """The subset of picamera2.Picamera2 used by bm_camera, on synthetic frames."""
+
+    sensor_resolution = SENSOR_RESOLUTION
+
+    def __init__(self, camera_num: int = 0, source: FrameSource = None, fps: float = None):
+        settings = get_camera_backend_settings()["fake"]
+        self.camera_num = camera_num
+        self.source = source or _default_source()
+        self.fps = float(fps or settings["fps"])
+        self.startup_s = settings["startup_s"]
+        self.camera_properties = {"Model": "fake", "PixelArraySize": SENSOR_RESOLUTION}
+        self.controls = {}
+        self.camera_config = None
+        self.started = False
+        self.frames = 0
+        self._t_start = 0.0
+        self._closed = False
+        self._rec = None
+        self._rec_stop = threading.Event()
+        log.info("[CAM] fake camera: source=%s fps=%.1f", self.source.source, self.fps)
+
+    # ---- configuration ----
+    def _configuration(self, use_case: str, main=None, controls=None, **kwargs) -> dict:
+        main = dict(main or {})
+        main.setdefault("size", (1280, 720) if use_case == "video" else SENSOR_RESOLUTION)
+        main.setdefault("format", "YUV420" if use_case == "video" else "BGR888")
+        main["size"] = tuple(main["size"])
+        return {"use_case": use_case, "main": main, "controls": dict(controls or {}), **kwargs}
+
+    def create_still_configuration(self, main=None, **kwargs) -> dict:
+        return self._configuration("still", main, **kwargs)
+
+    def create_preview_configuration(self, main=None, **kwargs) -> dict:
+        return self._configuration("preview", main, **kwargs)
+
+    def create_video_configuration(self, main=None, **kwargs) -> dict:
+        return self._configuration("video", main, **kwargs)
+
+    def configure(self, config: dict):
+        if self._closed:
+            raise RuntimeError("camera closed")
+        if self.started:
+            raise RuntimeError("configure() while started")
+        self.camera_config = config
+        self.set_controls(config.get("controls") or {})
+
+    def set_controls(self, controls: dict):
+        self.controls.update(controls)
+        if controls.get("FrameRate"):
+            self.fps = float(controls["FrameRate"])
+            self._rebase()
+
+    # ---- streaming ----
+    def start(self, *args, **kwargs):
+        if self.camera_config is None:
+            self.configure(self.create_preview_configuration())
+        if not self.started:
+            if self.startup_s > 0:
+                time.sleep(self.startup_s)
+            self.started = True
+            self._rebase()
+
+    def stop(self):
+        self.started = False
+
+    def close(self):
+        if self._rec is not None:
+            self.stop_recording()
+        self.stop()
+        self._closed = True
+
+    def _rebase(self):
+        # frame pacing counts from _t_start; keep the frame index across restarts
+        self._t_start = time.monotonic() - self.frames / self.fps
+
+    def _size(self):
+        return self.camera_config["main"]["size"]
+
+    def _next_frame(self) -> np.ndarray:
+        """Wait for the next frame boundary at self.fps, as a streaming sensor would."""
+        if not self.started:
+            raise RuntimeError("camera not started")
+        due = self._t_start + self.frames / self.fps
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # late caller: the sensor kept streaming; resume from the current frame
+            self.frames = int((time.monotonic() - self._t_start) * self.fps)
+        frame = self.source.frame(self._size(), self.frames)
+        self.frames += 1
+        return frame
+
+    def capture_array(self, name: str = "main") -> np.ndarray:
+        return self._next_frame()
+
+    def capture_metadata(self) -> dict:
+        return {"SensorTimestamp": int(time.monotonic() * 1e9), "FrameDuration": int(1e6 / self.fps),
+                "ExposureTime": 10000, "AnalogueGain": 1.0}
+
+    def capture_file(self, file_output, name: str = "main", format=None, **kwargs):
+        frame = self._next_frame()
+        Image.fromarray(frame).save(file_output, format=format or "JPEG", quality=90)
+        return self.capture_metadata()
+
+    # ---- recording ----
+    def start_recording(self, encoder, output, pts=None, quality=None, **kwargs):
+        if self.camera_config is None:
+            self.configure(self.create_video_configuration())
+        self.start()
+        output.start()
+        self._rec_stop.clear()
+
+        iperiod = getattr(encoder, "iperiod", 1)
+
+        def _run():
+            n = 0
+            try:
+                while not self._rec_stop.is_set():
+                    data = encoder.encode(self._next_frame(), self.fps)
+                    output.outputframe(data, n % iperiod == 0, int(time.monotonic() * 1e6))
+                    n += 1
+            except Exception as e:
+                log.error("[CAM] fake recording failed: %r", e)
+
+        self._rec = threading.Thread(target=_run, name="fake-recorder", daemon=True)
+        self._rec.start()
+        self._rec_output = output
+
+    def stop_recording(self):
+        if self._rec is None:
+            return
+        self._rec_stop.set()
+        self._rec.join()
+        self._rec = None
+        self._rec_output.stop()
+        self.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -260,29 +260,54 @@
 # 			pass
 # 	return 0
 # bm_daemon/capture/image_capture.py
+import collections
 import time, os
 from datetime import datetime, timezone
 from pathlib import Path
-from picamera2 import Picamera2
+from bm_camera.capture.backend import Picamera2
 from bm_daemon.common.config import resolve_resolution
 from bm_daemon.common.paths import image_dir
+from bm_camera.capture.camera_session import get_session
+from bm_camera.encode.file_encoder import get_camera_encoder
 
 def _ts():
 	return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
+# Names handed out recently; in-memory captures never create the raw file,
+# so existence alone can't detect a same-second collision.
+_issued = collections.deque(maxlen=64)
+
+def _unique(path: Path) -> Path:
+	# Warm bursts can land several frames in the same second
+	n = 1
+	out = path
+	while out.exists() or out in _issued:
+		out = path.with_name(f"{path.stem}_{n}{path.suffix}")
+		n += 1
+	_issued.append(out)
+	return out
+
 def capture_image(resolution_key="1080p", directory_path=None) -> str:
 	if directory_path is None:
 		directory_path = image_dir()
 	Path(directory_path).mkdir(parents=True, exist_ok=True)
 
 	size = resolve_resolution(resolution_key)
+	out = _unique(Path(directory_path) / f"{_ts()}_image.jpg")
+
+	# Warm path: reuse the daemon's long-lived camera session
+	session = get_session()
+	if session is not None:
+		with session.still(size) as picam2:
+			picam2.capture_file(str(out))
+		return str(out)
+
 	picam2 = Picamera2()
 	try:
 		config = picam2.create_still_configuration(main={"size": size, "format": "BGR888"})
 		picam2.configure(config)
 		picam2.start()
 		time.sleep(0.5)
-		out = Path(directory_path) / f"{_ts()}_image.jpg"
 		picam2.capture_file(str(out))
 		return str(out)
 	finally:
@@ -291,3 +316,60 @@ def capture_image(resolution_key="1080p", directory_path=None) -> str:
 		try: picam2.close()
 		except Exception: pass
 		time.sleep(0.05)
+
+def capture_image_array(resolution_key="1080p", directory_path=None):
+	"""
+	Capture a frame straight into memory (no JPEG written). Returns
+	(frame, path): `frame` is the HxWx3 RGB-ordered array from BGR888, and
+	`path` is the file name capture_image() would have used, so encoders
+	derive the same output names. Nothing is written to `path` here.
+	"""
+	if directory_path is None:
+		directory_path = image_dir()
+	Path(directory_path).mkdir(parents=True, exist_ok=True)
+
+	size = resolve_resolution(resolution_key)
+	out = _unique(Path(directory_path) / f"{_ts()}_image.jpg")
+
+	session = get_session()
+	if session is not None:
+		with session.still(size) as picam2:
+			return picam2.capture_array("main"), out
+
+	picam2 = Picamera2()
+	try:
+		config = picam2.create_still_configuration(main={"size": size, "format": "BGR888"})
+		picam2.configure(config)
+		picam2.start()
+		time.sleep(0.5)
+		return picam2.capture_array("main"), out
+	finally:
+		try: picam2.stop()
+		except Exception: pass
+		try: picam2.close()
+		except Exception: pass
+		time.sleep(0.05)
+
+def capture_image_hw(resolution_key="1080p", fmt="jpeg", *, quality=75, suffix="-c", directory_path=None):
+	"""
+	Capture and encode in one step on the V4L2 hardware codec, if a hardware
+	backend is selected for `fmt` at this resolution and the warm session is
+	running (the encoder draws frames from the streaming camera). Returns
+	(encoded_path, nominal_path), or None when the caller should use the
+	software array path instead (including after a hardware failure).
+	"""
+	size = resolve_resolution(resolution_key)
+	encode = get_camera_encoder(fmt, size)
+	session = get_session()
+	if encode is None or session is None:
+		return None
+	if directory_path is None:
+		directory_path = image_dir()
+	Path(directory_path).mkdir(parents=True, exist_ok=True)
+	out = _unique(Path(directory_path) / f"{_ts()}_image.jpg")
+
+	with session.still(size) as picam2:
+		try:
+			return encode(picam2, out, quality=quality, suffix=suffix), out
+		except Exception:
+			return None   # backend disabled itself; fall back to software
@@ -1,19 +1,21 @@
 # file video_capture.py
+import collections
+import logging
 import os
+import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 import shutil
-from picamera2 import Picamera2
-from picamera2.encoders import H264Encoder
-from picamera2.outputs import FfmpegOutput, FileOutput
+from bm_camera.capture.backend import Picamera2, H264Encoder, FfmpegOutput, FileOutput, Output
 
 from bm_daemon.common.paths import video_dir
-from bm_daemon.common.config import get_resolutions
+from bm_daemon.common.config import get_resolutions, get_preroll_settings
 from bm_daemon.common.config import resolve_resolution
 from bm_camera.utils.camera_lock import CameraLock
+from bm_camera.capture.camera_session import get_session
 
-
+log = logging.getLogger("VID")
 
 # --- paths ---
 BASE_DIR = Path(__file__).resolve().parent
@@ -50,6 +52,20 @@ def _ts():
 def _has_ffmpeg():
     return shutil.which("ffmpeg") is not None
 
+def _record(picam2, enc, output, duration_s):
+    # Start encoder with PTS when supported (quiet ffmpeg timestamp warnings)
+    try:
+        picam2.start_recording(enc, output, pts="system")
+    except TypeError:
+        picam2.start_recording(enc, output)
+
+    # Allow FPS hint (Picamera2 respects in config; this is a gentle sleep gate)
+    t_end = time.time() + float(duration_s)
+    while time.time() < t_end:
+        time.sleep(0.01)
+
+    picam2.stop_recording()
+
 def record_video(duration_s=3.0,
                  resolution_key="720p",
                  fps=30,
@@ -74,8 +90,17 @@ def record_video(duration_s=3.0,
     ext = ".mp4" if _has_ffmpeg() else ".h264"
     out_path = outdir / f"{base_name}_{ts}{ext}"
 
-    picam2 = Picamera2()
     enc = H264Encoder(bitrate=bitrate)
+    output = FfmpegOutput(str(out_path)) if ext == ".mp4" else FileOutput(str(out_path))
+
+    # Warm path: the daemon's camera session skips re-opening the sensor
+    session = get_session()
+    if session is not None:
+        with session.video(size, hflip=hflip, vflip=vflip) as picam2:
+            _record(picam2, enc, output, duration_s)
+        return str(out_path)
+
+    picam2 = Picamera2()
 
     # Configure video stream
     config = picam2.create_video_configuration(main={"size": size, "format": "YUV420"}, controls={})
@@ -88,24 +113,8 @@ def record_video(duration_s=3.0,
     try:
         picam2.configure(config)
 
-        if ext == ".mp4":
-            output = FfmpegOutput(str(out_path))
-        else:
-            output = FileOutput(str(out_path))
-
         picam2.start()
-        # Start encoder with PTS when supported (quiet ffmpeg timestamp warnings)
-        try:
-            picam2.start_recording(enc, output, pts="system")
-        except TypeError:
-            picam2.start_recording(enc, output)
-
-        # Allow FPS hint (Picamera2 respects in config; this is a gentle sleep gate)
-        t_end = time.time() + float(duration_s)
-        while time.time() < t_end:
-            time.sleep(0.01)
-
-        picam2.stop_recording()
+        _record(picam2, enc, output, duration_s)
         return str(out_path)
 
     finally:
@@ -136,3 +145,233 @@ def capture_video(base_name="VID",
                         base_name=base_name,
                         hflip=hflip,
                         vflip=vflip)
+
+
+# --- pre-trigger ring ---
+class _ClipSink:
+    """A clip being saved: live frames wait here until the ring backlog is on disk."""
+
+    def __init__(self, f):
+        self.f = f
+        self.pending = []
+        self.live = False
+        self.bytes = 0
+
+    def write(self, data):
+        self.bytes += len(data)
+        if self.live:
+            self.f.write(data)
+        else:
+            self.pending.append(data)
+
+
+class RingOutput(Output):
+    """
+    Encoder output holding the last `seconds` of encoded frames in RAM, as
+    whole GOPs so the oldest frame kept is always a keyframe. A GOP is only
+    dropped once the next one alone covers `seconds`, or when the ring
+    exceeds `max_bytes` (the newest GOP is never dropped).
+
+    attach(f) starts a clip: the ring is copied to `f` and every later frame
+    is appended until detach(f). The ring keeps filling meanwhile, so
+    back-to-back clips may overlap.
+    """
+
+    def __init__(self, seconds: float, max_bytes: int):
+        super().__init__()
+        self.seconds = float(seconds)
+        self.max_bytes = int(max_bytes)
+        self._gops = collections.deque()   # [t_first, nbytes, [frames]]
+        self._bytes = 0
+        self._sinks = []
+        self._lock = threading.Lock()
+        self.stats = {"total_frames": 0, "total_bytes": 0, "dropped_gops": 0, "capped_gops": 0}
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, *args, **kwargs):
+        data = bytes(frame)   # the encoder may reuse its buffer
+        now = time.monotonic()
+        with self._lock:
+            if keyframe or not self._gops:
+                self._gops.append([now, 0, []])
+            gop = self._gops[-1]
+            gop[1] += len(data)
+            gop[2].append(data)
+            self._bytes += len(data)
+            self.stats["total_frames"] += 1
+            self.stats["total_bytes"] += len(data)
+            self._trim(now)
+            for sink in self._sinks:
+                sink.write(data)
+
+    def _trim(self, now: float):
+        gops = self._gops
+        while len(gops) > 1:
+            if gops[1][0] <= now - self.seconds:
+                self.stats["dropped_gops"] += 1
+            elif self._bytes > self.max_bytes:
+                self.stats["capped_gops"] += 1
+            else:
+                break
+            self._bytes -= gops.popleft()[1]
+
+    def attach(self, f, pre_s: float = None) -> dict:
+        """
+        Write the ring (its newest `pre_s` seconds, from a keyframe) to `f`
+        and keep appending live frames. Returns {"pre_s", "bytes"} for the
+        pre-roll written.
+        """
+        sink = _ClipSink(f)
+        with self._lock:
+            now = time.monotonic()
+            gops = list(self._gops)
+            start = 0
+            if pre_s is not None:
+                for i, g in enumerate(gops):
+                    if g[0] <= now - pre_s:
+                        start = i
+            backlog = [d for g in gops[start:] for d in g[2]]
+            held = (now - gops[start][0]) if gops else 0.0
+            self._sinks.append(sink)
+        # the file write happens outside the lock; the encoder only queues into the sink
+        n = 0
+        for d in backlog:
+            f.write(d)
+            n += len(d)
+        with self._lock:
+            for d in sink.pending:
+                f.write(d)
+            sink.pending = []
+            sink.live = True
+        return {"pre_s": held, "bytes": n}
+
+    def detach(self, f) -> int:
+        """Stop appending to `f`; returns the live bytes it received."""
+        with self._lock:
+            for sink in self._sinks:
+                if sink.f is f:
+                    self._sinks.remove(sink)
+                    return sink.bytes
+        return 0
+
+    def snapshot(self) -> dict:
+        """RAM held by the ring: seconds covered, bytes, and bytes per second."""
+        with self._lock:
+            held = (time.monotonic() - self._gops[0][0]) if self._gops else 0.0
+            frames = sum(len(g[2]) for g in self._gops)
+            return {"seconds": held, "bytes": self._bytes, "frames": frames, "max_bytes": self.max_bytes,
+                    "kbytes_per_s": (self._bytes / held / 1000.0) if held > 0 else 0.0,
+                    **self.stats}
+
+
+class PreRollRecorder:
+    """
+    Standing recording into a RingOutput through the camera session, so a
+    trigger saves the seconds *before* it plus `post_s` of live video
+    without bringing the camera up. The RAM per second of pre-roll is
+    `kbytes_per_s` (the encoder bitrate is derived from it).
+    """
+
+    def __init__(self, resolution_key="720p", fps=30, seconds=5.0, kbytes_per_s=375.0,
+                 max_bytes=0, keyframe_s=1.0, hflip=False, vflip=False):
+        self.resolution_key = resolution_key
+        self.size = tuple(resolve_resolution(resolution_key))
+        self.fps = int(fps)
+        self.seconds = float(seconds)
+        self.kbytes_per_s = float(kbytes_per_s)
+        self.bitrate = int(self.kbytes_per_s * 8000)
+        self.hflip, self.vflip = bool(hflip), bool(vflip)
+        self.ring = RingOutput(self.seconds, max_bytes or int(1.5 * self.seconds * self.kbytes_per_s * 1000))
+        # repeat=True puts SPS/PPS before every IDR, so a clip may start at any keyframe
+        self.encoder = H264Encoder(bitrate=self.bitrate, repeat=True,
+                                   iperiod=max(1, round(self.fps * float(keyframe_s))))
+        self._session = None
+
+    @classmethod
+    def from_settings(cls, p: dict) -> "PreRollRecorder":
+        return cls(p["res"], p["fps"], p["seconds"], p["kbytes_per_s"], p["max_bytes"],
+                   p["keyframe_s"], p["hflip"], p["vflip"])
+
+    @property
+    def running(self) -> bool:
+        return self._session is not None and self._session.recording
+
+    def start(self) -> bool:
+        session = get_session()
+        if session is None:
+            log.warning("[CAM/VID] pre-roll needs camera.session.enabled; not armed")
+            return False
+        self._session = session
+        ok = session.arm(self.size, self.encoder, self.ring, hflip=self.hflip, vflip=self.vflip, fps=self.fps)
+        log.info("[CAM/VID] pre-roll %s: %s@%d %.1fs, %.0f kB/s (ring cap %.1f MB)",
+                 "armed" if ok else "FAILED", self.resolution_key, self.fps, self.seconds,
+                 self.kbytes_per_s, self.ring.max_bytes / 1e6)
+        return ok
+
+    def stop(self):
+        if self._session is not None:
+            self._session.disarm()
+            self._session = None
+
+    def serves(self, resolution_key=None, fps=None, bitrate=None, hflip=None, vflip=None) -> bool:
+        """True when running and a clip with these settings (None = any) can come from the ring."""
+        if not self.running:
+            return False
+        if resolution_key is not None and tuple(resolve_resolution(resolution_key)) != self.size:
+            return False
+        if fps is not None and int(fps) != self.fps:
+            return False
+        if (hflip is not None and bool(hflip) != self.hflip) or (vflip is not None and bool(vflip) != self.vflip):
+            return False
+        return bitrate is None or int(bitrate) == self.bitrate
+
+    def save(self, post_s=3.0, pre_s=None, directory_path=None, base_name="VID") -> dict:
+        """
+        Write the pre-roll (at most `pre_s`, default the whole ring) followed
+        by `post_s` of live video to a .h264 file. Returns the path, the
+        pre-roll actually covered, bytes and the ring snapshot.
+        """
+        outdir = Path(directory_path or VIDEO_DIRECTORY)
+        outdir.mkdir(parents=True, exist_ok=True)
+        out_path = outdir / f"{base_name}_{_ts()}.h264"
+        t0 = time.monotonic()
+        with open(out_path, "wb") as f:
+            pre = self.ring.attach(f, pre_s)
+            t_end = t0 + float(post_s)
+            while time.monotonic() < t_end and self.running:
+                time.sleep(0.01)
+            live = self.ring.detach(f)
+        return {"path": str(out_path), "pre_s": pre["pre_s"], "post_s": time.monotonic() - t0,
+                "bytes": pre["bytes"] + live, "ring": self.ring.snapshot()}
+
+
+_preroll = None
+_preroll_lock = threading.Lock()
+
+
+def start_preroll(settings: dict = None):
+    """Arm the process-wide pre-roll ring (camera.preroll); returns it, or None if disabled/failed."""
+    global _preroll
+    p = settings or get_preroll_settings()
+    if not p["enabled"]:
+        return None
+    with _preroll_lock:
+        if _preroll is None:
+            rec = PreRollRecorder.from_settings(p)
+            if not rec.start():
+                rec.stop()
+                return None
+            _preroll = rec
+        return _preroll
+
+
+def get_preroll():
+    """The armed PreRollRecorder, or None."""
+    return _preroll
+
+
+def stop_preroll():
+    global _preroll
+    with _preroll_lock:
+        rec, _preroll = _preroll, None
+    if rec is not None:
+        rec.stop()
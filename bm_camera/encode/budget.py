@@ -0,0 +1,204 @@
+# bm_camera/encode/budget.py
+"""
+Size-targeted encoding: the highest quality (and, if needed, the mildest
+downscale) whose output fits a byte budget.
+
+Quality is found by a bounded search over in-memory encodes (secant steps
+on ln(bytes), safeguarded by bisection); the result is the best fitting
+encode seen, never a re-encode. If even `q_min`
+is too big, the image is downscaled (area roughly tracks bytes) and the
+search repeats, down to `min_scale`. A SizeModel learned from past
+captures seeds the first probe per (format, resolution), so a typical
+scene converges in a few encodes instead of a full bisection.
+"""
+import json
+import logging
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+log = logging.getLogger("ENC")
+
+Q_MIN = 5
+Q_MAX = 95
+MAX_ITER = 7          # ceil(log2(Q_MAX - Q_MIN + 1))
+MIN_SCALE = 0.25
+_HISTORY = 16         # observations kept per model key
+_DEFAULT_SLOPE = 0.03 # d ln(bytes) / d quality for JPEG/HEIF mid-range
+_SLOPE_MIN, _SLOPE_MAX = 0.005, 0.5
+
+
+class BudgetResult:
+	__slots__ = ("data", "quality", "scale", "size", "iterations", "fits")
+
+	def __init__(self, data: bytes, quality: int, scale: float, size: Tuple[int, int],
+				 iterations: int, fits: bool):
+		self.data = data
+		self.quality = quality
+		self.scale = scale
+		self.size = size
+		self.iterations = iterations
+		self.fits = fits
+
+	def __repr__(self) -> str:
+		return (f"BudgetResult(bytes={len(self.data)}, q={self.quality}, scale={self.scale:.2f}, "
+				f"size={self.size[0]}x{self.size[1]}, iter={self.iterations}, fits={self.fits})")
+
+
+class SizeModel:
+	"""
+	Per-key (e.g. "jpeg:1920x1080") history of (quality, bytes) from past
+	encodes; predicts the quality expected to hit a target with a
+	least-squares fit of ln(bytes) against quality. Persisted as JSON.
+	"""
+
+	def __init__(self, path: Optional[Path] = None):
+		self.path = Path(path) if path else None
+		self._lock = threading.Lock()
+		self._obs: Dict[str, List[Tuple[int, int]]] = {}
+		if self.path is not None:
+			try:
+				raw = json.loads(self.path.read_text())
+				self._obs = {k: [tuple(p) for p in v] for k, v in raw.items()}
+			except FileNotFoundError:
+				pass
+			except (OSError, ValueError) as e:
+				log.warning("[ENC] ignoring size model %s: %r", self.path, e)
+
+	def fit(self, key: str) -> Optional[Tuple[float, float, float]]:
+		"""(mean quality, mean ln bytes, slope) for `key`, or None with no history."""
+		with self._lock:
+			pts = list(self._obs.get(key, ()))
+		if not pts:
+			return None
+		xs = [q for q, _ in pts]
+		ys = [math.log(max(1, b)) for _, b in pts]
+		mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+		var = sum((x - mx) ** 2 for x in xs)
+		slope = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var if var > 0 else 0.0
+		if slope <= 0:
+			slope = _DEFAULT_SLOPE   # one quality seen (or noise): assume a typical curve
+		return mx, my, slope
+
+	def predict(self, key: str, target_bytes: int) -> Optional[int]:
+		f = self.fit(key)
+		if f is None or target_bytes <= 0:
+			return None
+		mx, my, slope = f
+		return int(round(mx + (math.log(target_bytes) - my) / slope))
+
+	def observe(self, key: str, points) -> None:
+		with self._lock:
+			hist = self._obs.setdefault(key, [])
+			hist.extend((int(q), int(b)) for q, b in points)
+			del hist[:-_HISTORY]
+			if self.path is None:
+				return
+			try:
+				self.path.parent.mkdir(parents=True, exist_ok=True)
+				tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+				tmp.write_text(json.dumps(self._obs))
+				os.replace(tmp, self.path)
+			except OSError as e:
+				log.warning("[ENC] size model not saved: %r", e)
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def default_model() -> Optional[SizeModel]:
+	"""The daemon's persisted model (camera.encode.size_model); None if disabled."""
+	global _model
+	with _model_lock:
+		if _model is None:
+			from bm_daemon.common.config import get_encode_settings
+			from bm_daemon.common.paths import data_file
+			name = get_encode_settings()["size_model"]
+			_model = SizeModel(Path(data_file(name))) if name else False
+		return _model or None
+
+
+def _search(img: Image.Image, target: int, encode: Callable, q_lo: int, q_hi: int,
+			seed: Optional[int], slope: float, max_iter: int):
+	"""
+	Max quality in [q_lo, q_hi] fitting `target`: a safeguarded secant search
+	on ln(bytes) vs quality. Each probe predicts the crossing from the last
+	encode, with the slope through the last two encodes (the model's slope
+	for the first step), clamped inside the bracket. Once both a fitting and
+	a too-big quality are known, a step that did not halve the bracket is
+	followed by a bisection, bounding the worst case near a binary search.
+	Returns (best (q, data) or None, {q: bytes} tried, smallest (q, data)).
+	"""
+	tried: Dict[int, int] = {}
+	lo, hi = q_lo, q_hi
+	best = smallest = prev = None
+	bracketed, prev_width = False, None
+	ln_t = math.log(max(1, target))
+	q = min(max(int(seed), lo), hi) if seed is not None else (lo + hi + 1) // 2
+	while len(tried) < max_iter:
+		data = encode(img, q)
+		tried[q] = len(data)
+		if smallest is None or len(data) < len(smallest[1]):
+			smallest = (q, data)
+		ln_b = math.log(max(1, len(data)))
+		if len(data) <= target:
+			best, lo = (q, data), q + 1
+		else:
+			hi = q - 1
+		if lo > hi:
+			break
+		bracketed = bracketed or (best is not None and hi < q_hi)
+		if prev is not None and prev[0] != q:
+			local = (ln_b - prev[1]) / (q - prev[0])
+			if local > 0:
+				slope = min(max(local, _SLOPE_MIN), _SLOPE_MAX)
+		prev = (q, ln_b)
+		width = hi - lo + 1
+		if bracketed and prev_width is not None and width > prev_width // 2:
+			q = (lo + hi + 1) // 2
+		else:
+			q = min(max(math.floor(q + (ln_t - ln_b) / slope), lo), hi)
+		prev_width = width if bracketed else None
+	return best, tried, smallest
+
+
+def encode_to_budget(img: Image.Image, target_bytes: int, encode: Callable[[Image.Image, int], bytes], *,
+					 q_min: int = Q_MIN, q_max: int = Q_MAX, max_iter: int = MAX_ITER,
+					 min_scale: float = MIN_SCALE, model: Optional[SizeModel] = None,
+					 model_key: Optional[str] = None) -> BudgetResult:
+	"""
+	Encode `img` with `encode(img, quality) -> bytes` at the highest quality
+	in [q_min, q_max] whose output is at most `target_bytes`, downscaling
+	(never below `min_scale`) when q_min alone does not fit. `fits` is False
+	only if nothing fit; `data` is then the smallest encode produced.
+	"""
+	target = int(target_bytes)
+	q_min, q_max = int(q_min), max(int(q_min), int(q_max))
+	w0, h0 = img.size
+	scale, iterations = 1.0, 0
+	while True:
+		frame = img if scale == 1.0 else img.resize(
+			(max(1, round(w0 * scale)), max(1, round(h0 * scale))), Image.BILINEAR)
+		key = f"{model_key}:{frame.size[0]}x{frame.size[1]}" if model_key else None
+		fit = model.fit(key) if (model is not None and key) else None
+		seed = model.predict(key, target) if fit else None
+		slope = fit[2] if fit else _DEFAULT_SLOPE
+		best, tried, smallest = _search(frame, target, encode, q_min, q_max, seed, slope, max_iter)
+		iterations += len(tried)
+		if model is not None and key:
+			model.observe(key, tried.items())
+		if best is not None:
+			q, data = best
+			return BudgetResult(data, q, scale, frame.size, iterations, True)
+		if scale <= min_scale:
+			q, data = smallest
+			return BudgetResult(data, q, scale, frame.size, iterations, False)
+		# bytes ~ area: shrink toward the budget (at least 10%, at most 2x per side per step)
+		size_at_min = tried.get(q_min) or len(smallest[1])
+		step = min(0.9, max(0.5, math.sqrt(target / size_at_min) * 0.95))
+		scale = max(min_scale, scale * step)
@@ -0,0 +1,93 @@
+# bm_camera/encode/burst.py
+"""
+Three-stage burst pipeline: capture -> encode -> finish (transmit/status).
+
+  capture : the calling thread, one frame at a time (the camera is serial)
+  encode  : an executor (the process pool in bm_camera.encode.pool)
+  finish  : one consumer thread, strictly in capture order
+
+So frame i+1 is being captured while frame i encodes on another core and
+frame i-1 is queued/transmitted, but the finish callbacks (and therefore
+status messages and TX order) are exactly those of a serial loop. At most
+`max_inflight` captured frames wait for encode/finish; capture blocks
+beyond that, which bounds memory at high resolutions.
+
+The first failure (capture, encode or finish) is reported once via
+`on_error`, in order after the frames before it; capture stops and later
+frames are dropped, as the serial loop would have aborted there.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional, Tuple
+
+log = logging.getLogger("BURST")
+
+# capture(i) -> (fn, args, meta): fn(*args) runs in the executor; fn=None means
+# args is already the result (e.g. a hardware encode done during capture)
+CaptureFn = Callable[[int], Tuple[Optional[Callable], tuple, Any]]
+FinishFn = Callable[[int, Any, Any], None]
+ErrorFn = Callable[[int, Any, BaseException], None]
+
+_DONE = object()
+
+
+def _done_future(result) -> Future:
+	f = Future()
+	f.set_result(result)
+	return f
+
+
+class BurstPipeline:
+	def __init__(self, executor, *, max_inflight: int = 4):
+		self.executor = executor
+		self.max_inflight = max(1, int(max_inflight))
+		self.completed = 0
+		self.failed = False
+
+	def _consume(self, q: "queue.Queue", finish: FinishFn, on_error: ErrorFn, stop: threading.Event):
+		while True:
+			item = q.get()
+			if item is _DONE:
+				return
+			i, fut, meta, exc = item
+			if stop.is_set():
+				if fut is not None:
+					fut.cancel()
+				continue
+			try:
+				if exc is not None:
+					raise exc
+				finish(i, meta, fut.result())
+				self.completed += 1
+			except BaseException as e:
+				self.failed = True
+				stop.set()
+				on_error(i, meta, e)
+
+	def run(self, n: int, capture: CaptureFn, finish: FinishFn, on_error: ErrorFn,
+			*, interval_s: float = 0.0) -> int:
+		"""Run an n-frame burst; returns the number of frames finished."""
+		q = queue.Queue(maxsize=self.max_inflight)
+		stop = threading.Event()
+		consumer = threading.Thread(target=self._consume, args=(q, finish, on_error, stop),
+									name="burst-finish", daemon=True)
+		consumer.start()
+		try:
+			for i in range(n):
+				if stop.is_set():
+					break
+				try:
+					fn, args, meta = capture(i)
+				except BaseException as e:
+					q.put((i, None, None, e))
+					break
+				fut = _done_future(args) if fn is None else self.executor.submit(fn, *args)
+				q.put((i, fut, meta, None))   # blocks while max_inflight frames are pending
+				if i + 1 < n and interval_s > 0 and stop.wait(interval_s):
+					break
+		finally:
+			q.put(_DONE)
+			consumer.join()
+		return self.completed
@@ -0,0 +1,145 @@
+# bm_camera/encode/change.py
+"""
+Change detection between captures, so a static scene isn't encoded and
+sent again at full size.
+
+Each frame is reduced to a small luma grid (grid x grid cell means) from a
+fixed-size strided sample, so the cost does not grow with the resolution
+(no full-frame pass, no resize). The grid is compared with the one of the
+last frame kept:
+  diff : mean |difference| in luma levels (0..255); with normalize the
+         grids' means are removed first, so an exposure/AWB step alone
+         does not count as change
+  hash : percentage of differing bits of an average hash (cell above the
+         grid median); robust to brightness and gain, coarser
+and the score picks skip (< skip_below), thumb (< thumb_below) or full.
+Skipped frames do not move the reference, so slow drift adds up until it
+crosses a threshold.
+"""
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from bm_daemon.common.config import get_change_settings
+
+log = logging.getLogger("IMG")
+
+SKIP, THUMB, FULL = "skip", "thumb", "full"
+
+# (skip_below, thumb_below) per method: luma levels for diff, % of bits for hash
+THRESHOLDS = {"diff": (2.0, 8.0), "hash": (3.0, 6.0)}
+
+_SAMPLE = 4   # sampled pixels per grid cell, per axis
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)   # RGB-ordered frames (Picamera2 BGR888)
+
+
+def luma_grid(frame: np.ndarray, grid: int = 32) -> np.ndarray:
+	"""grid x grid mean luma (float32) of an HxWx3 RGB or HxW frame."""
+	h, w = frame.shape[:2]
+	n = grid * _SAMPLE
+	rows = np.arange(n) * h // n
+	cols = np.arange(n) * w // n
+	s = frame[np.ix_(rows, cols)]   # n x n (x3) copy, whatever the frame size
+	s = s.astype(np.float32) @ _LUMA if s.ndim == 3 else s.astype(np.float32)
+	return s.reshape(grid, _SAMPLE, grid, _SAMPLE).mean(axis=(1, 3))
+
+
+def luma_grid_file(path: Path, grid: int = 32) -> np.ndarray:
+	"""luma_grid of an image file; JPEGs are decoded at reduced scale (draft)."""
+	with Image.open(path) as img:
+		img.draft("L", (grid * _SAMPLE, grid * _SAMPLE))
+		small = img.convert("L").resize((grid, grid), Image.BOX)
+	return np.asarray(small, dtype=np.float32)
+
+
+def thumbnail(frame: np.ndarray, max_px: int) -> np.ndarray:
+	"""Frame scaled down to fit max_px x max_px (aspect kept)."""
+	img = Image.fromarray(frame)
+	img.thumbnail((max_px, max_px), Image.BILINEAR, reducing_gap=2.0)
+	return np.asarray(img)
+
+
+def thumbnail_file(path: Path, max_px: int) -> np.ndarray:
+	with Image.open(path) as img:
+		img.draft("RGB", (max_px, max_px))
+		img = img.convert("RGB")
+		img.thumbnail((max_px, max_px), Image.BILINEAR)
+		return np.asarray(img)
+
+
+class ChangeDetector:
+	def __init__(self, method: str = "diff", grid: int = 32, skip_below: Optional[float] = None,
+				 thumb_below: Optional[float] = None, normalize: bool = True):
+		if method not in THRESHOLDS:
+			raise ValueError(f"change method must be diff or hash, not {method!r}")
+		self.method = method
+		self.grid = int(grid)
+		skip_d, thumb_d = THRESHOLDS[method]
+		self.skip_below = float(skip_d if skip_below is None else skip_below)
+		self.thumb_below = float(thumb_d if thumb_below is None else thumb_below)
+		self.normalize = bool(normalize)
+		self._ref = None
+		self._lock = threading.Lock()
+		self.stats = {SKIP: 0, THUMB: 0, FULL: 0}
+
+	@classmethod
+	def from_settings(cls, c: dict) -> "ChangeDetector":
+		return cls(c["method"], c["grid"], c["skip_below"], c["thumb_below"], c["normalize"])
+
+	def signature(self, grid: np.ndarray) -> np.ndarray:
+		if self.method == "hash":
+			return (grid > np.median(grid)).ravel()
+		return grid - grid.mean() if self.normalize else grid
+
+	def score(self, sig: np.ndarray, ref: np.ndarray) -> float:
+		if self.method == "hash":
+			return 100.0 * float(np.count_nonzero(sig != ref)) / sig.size
+		return float(np.abs(sig - ref).mean())
+
+	def decide(self, grid: np.ndarray, force: bool = False) -> Tuple[str, Optional[float]]:
+		"""(decision, score) for a luma grid; score is None for the first frame. force: always full."""
+		sig = self.signature(grid)
+		with self._lock:
+			if self._ref is None:
+				decision, score = FULL, None
+			else:
+				score = self.score(sig, self._ref)
+				decision = SKIP if score < self.skip_below else THUMB if score < self.thumb_below else FULL
+				if force:
+					decision = FULL
+			if decision != SKIP:
+				self._ref = sig   # compare against the last frame kept/sent
+			self.stats[decision] += 1
+		return decision, score
+
+	def check(self, frame: np.ndarray, force: bool = False) -> Tuple[str, Optional[float]]:
+		return self.decide(luma_grid(frame, self.grid), force)
+
+	def check_file(self, path: Path, force: bool = False) -> Tuple[str, Optional[float]]:
+		return self.decide(luma_grid_file(path, self.grid), force)
+
+	def reset(self) -> None:
+		with self._lock:
+			self._ref = None
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector() -> Optional[ChangeDetector]:
+	"""Process-wide detector (its reference outlives one trigger), or None when camera.change is off."""
+	global _detector
+	c = get_change_settings()
+	if not c["enabled"]:
+		return None
+	with _detector_lock:
+		if _detector is None:
+			_detector = d = ChangeDetector.from_settings(c)
+			log.info("[CAM/IMG] change detection: %s grid=%d skip<%.1f thumb<%.1f",
+					 d.method, d.grid, d.skip_below, d.thumb_below)
+		return _detector
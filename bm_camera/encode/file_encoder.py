@@ -1,8 +1,17 @@
 # bm_daemon/encode/file_encoder.py
+import io
+import json
+import logging
+import os
+import threading
 from pathlib import Path
-from typing import Literal, Callable
+from typing import Literal, Callable, Dict, List, Optional
 from PIL import Image
 
+from bm_camera.encode.budget import BudgetResult, default_model, encode_to_budget
+
+log = logging.getLogger("ENC")
+
 # HEIF support; gracefully degrade to JPEG if pillow_heif missing
 _HEIF_OK = False
 try:
@@ -12,57 +21,429 @@ try:
 except Exception:
 	_HEIF_OK = False
 
+# libjpeg-turbo (NEON SIMD) via simplejpeg, the encoder behind Picamera2's JpegEncoder
+_SIMPLEJPEG_OK = False
+try:
+	import numpy as np  # type: ignore
+	import simplejpeg  # type: ignore
+	_SIMPLEJPEG_OK = True
+except Exception:
+	_SIMPLEJPEG_OK = False
+
+# V4L2 hardware codecs (bcm2835-codec on Pi 4 and earlier) through Picamera2
+_V4L2_OK = False
+try:
+	from picamera2.encoders import H264Encoder, MJPEGEncoder, Quality  # type: ignore
+	from picamera2.outputs import Output  # type: ignore
+	_V4L2_OK = True
+except Exception:
+	Output = object
+	_V4L2_OK = False
+
+_V4L2_ENCODE_NODE = "/dev/video11"   # absent on Pi 5 (no hardware encoders)
+_HW_FRAME_TIMEOUT_S = 5.0
+
 
 def _out_path(src: Path, *, new_ext: str, suffix: str) -> Path:
 	# src: /path/foo.jpg  -> /path/foo-c.jpg (or .heic)
 	return src.with_name(src.stem + suffix + new_ext)
 
 
-def compress_to_jpeg(src: Path, *, quality: int = 75, suffix: str = "-c") -> Path:
+def _save_jpeg(img: Image.Image, dst: Path, quality: int) -> Path:
+	if img.mode not in ("RGB", "L"):
+		img = img.convert("RGB")
+	dst.parent.mkdir(parents=True, exist_ok=True)
+	img.save(dst, format="JPEG", quality=int(quality), optimize=True)
+	return dst
+
+
+def _save_heif(img: Image.Image, dst: Path, quality: int) -> Path:
+	if img.mode not in ("RGB", "L"):
+		img = img.convert("RGB")
+	dst.parent.mkdir(parents=True, exist_ok=True)
+	# pillow-heif uses same 1..100-ish quality scale
+	img.save(dst, format="HEIF", quality=int(quality))
+	return dst
+
+
+def compress_to_jpeg(src: Path, *, quality: int = 75, suffix: str = "-c",
+					 target_bytes: Optional[int] = None) -> Path:
 	"""
 	Re-encode to JPEG with given quality. Keeps it simple (RGB, no metadata).
+	With `target_bytes`, `quality` is the ceiling and the highest quality
+	(or mildest downscale) that fits the budget is used (see budget.py).
 	Returns the new file path.
 	"""
+	if target_bytes:
+		return get_encoder("jpeg")(src, quality=quality, suffix=suffix, target_bytes=target_bytes)
 	src = Path(src)
 	dst = _out_path(src, new_ext=".jpg", suffix=suffix)
 	with Image.open(src) as img:
-		if img.mode not in ("RGB", "L"):
-			img = img.convert("RGB")
-		dst.parent.mkdir(parents=True, exist_ok=True)
-		img.save(dst, format="JPEG", quality=int(quality), optimize=True)
-	return dst
+		return _save_jpeg(img, dst, quality)
 
 
-def compress_to_heif(src: Path, *, quality: int = 50, suffix: str = "-c") -> Path:
+def compress_to_heif(src: Path, *, quality: int = 50, suffix: str = "-c",
+					 target_bytes: Optional[int] = None) -> Path:
 	"""
 	Encode to HEIF/HEIC if available; otherwise falls back to JPEG.
+	`target_bytes` works as for compress_to_jpeg().
 	Returns the new file path.
 	"""
 	if not _HEIF_OK:
 		# fallback to jpeg if HEIF support is unavailable
-		return compress_to_jpeg(src, quality=quality, suffix=suffix)
+		return compress_to_jpeg(src, quality=quality, suffix=suffix, target_bytes=target_bytes)
+	if target_bytes:
+		return get_encoder("heif")(src, quality=quality, suffix=suffix, target_bytes=target_bytes)
 
 	src = Path(src)
 	dst = _out_path(src, new_ext=".heic", suffix=suffix)
 	with Image.open(src) as img:
+		return _save_heif(img, dst, quality)
+
+
+# ---- in-memory variants: encode a captured frame without a JPEG round trip ----
+# `frame` is an HxWx3 RGB-ordered array (Picamera2 BGR888); `src` is the
+# nominal capture path used only to derive the output name, as above.
+
+def array_to_jpeg(frame, src: Path, *, quality: int = 75, suffix: str = "-c") -> Path:
+	dst = _out_path(Path(src), new_ext=".jpg", suffix=suffix)
+	return _save_jpeg(Image.fromarray(frame), dst, quality)
+
+
+def array_to_heif(frame, src: Path, *, quality: int = 50, suffix: str = "-c") -> Path:
+	if not _HEIF_OK:
+		return array_to_jpeg(frame, src, quality=quality, suffix=suffix)
+	dst = _out_path(Path(src), new_ext=".heic", suffix=suffix)
+	return _save_heif(Image.fromarray(frame), dst, quality)
+
+
+def _pillow_bytes(fmt: str, **opts):
+	# in-memory encode (used by the size-targeted search, see budget.py)
+	def _encode(img: Image.Image, quality: int) -> bytes:
 		if img.mode not in ("RGB", "L"):
 			img = img.convert("RGB")
-		dst.parent.mkdir(parents=True, exist_ok=True)
-		# pillow-heif uses same 1..100-ish quality scale
-		img.save(dst, format="HEIF", quality=int(quality))
+		buf = io.BytesIO()
+		img.save(buf, format=fmt, quality=int(quality), **opts)
+		return buf.getvalue()
+	return _encode
+
+
+def _pillow_file(save):
+	def _encode(src: Path, dst: Path, quality: int) -> Path:
+		with Image.open(src) as img:
+			return save(img, dst, quality)
+	return _encode
+
+
+# ---- simplejpeg (software, SIMD) ----
+
+def _simplejpeg_array(frame, dst: Path, quality: int) -> Path:
+	if not frame.flags.c_contiguous:
+		frame = np.ascontiguousarray(frame)
+	data = simplejpeg.encode_jpeg(frame, quality=int(quality), colorspace="RGB", colorsubsampling="420")
+	dst.parent.mkdir(parents=True, exist_ok=True)
+	dst.write_bytes(data)
+	return dst
+
+
+def _simplejpeg_bytes(img: Image.Image, quality: int) -> bytes:
+	return simplejpeg.encode_jpeg(np.ascontiguousarray(np.asarray(img.convert("RGB"))),
+								  quality=int(quality), colorspace="RGB", colorsubsampling="420")
+
+
+def _simplejpeg_file(src: Path, dst: Path, quality: int) -> Path:
+	with Image.open(src) as img:
+		return _simplejpeg_array(np.asarray(img.convert("RGB")), dst, quality)
+
+
+# ---- V4L2 hardware (single frame from the running camera) ----
+
+class _OneFrame(Output):
+	"""Picamera2 encoder output that keeps the first complete (key)frame."""
+
+	def __init__(self):
+		super().__init__()
+		self.data = None
+		self.done = threading.Event()
+
+	def outputframe(self, frame, keyframe=True, *args, **kwargs):
+		if self.data is None and keyframe:
+			self.data = bytes(frame)
+			self.done.set()
+
+
+def _hw_quality(quality: int):
+	# the V4L2 codecs are rate-controlled; map 1..100 onto Picamera2's buckets
+	q = int(quality)
+	if q < 20:
+		return Quality.VERY_LOW
+	if q < 40:
+		return Quality.LOW
+	if q < 60:
+		return Quality.MEDIUM
+	if q < 80:
+		return Quality.HIGH
+	return Quality.VERY_HIGH
+
+
+def _v4l2_frame(picam2, dst: Path, quality: int, encoder) -> Path:
+	out = _OneFrame()
+	picam2.start_encoder(encoder, out, quality=_hw_quality(quality))
+	try:
+		if not out.done.wait(_HW_FRAME_TIMEOUT_S):
+			raise TimeoutError("hardware encoder produced no frame")
+	finally:
+		picam2.stop_encoder()
+	dst.parent.mkdir(parents=True, exist_ok=True)
+	dst.write_bytes(out.data)
 	return dst
 
 
-Format = Literal["jpeg", "heif"]
+def _v4l2_mjpeg(picam2, dst: Path, quality: int) -> Path:
+	return _v4l2_frame(picam2, dst, quality, MJPEGEncoder())
+
+
+def _v4l2_h264(picam2, dst: Path, quality: int) -> Path:
+	# iperiod=1 + repeat: the first frame is an IDR with SPS/PPS, decodable alone
+	return _v4l2_frame(picam2, dst, quality, H264Encoder(iperiod=1, repeat=True))
+
+
+def _v4l2_present() -> bool:
+	if not (_V4L2_OK and os.path.exists(_V4L2_ENCODE_NODE)):
+		return False
+	# the synthetic camera (camera.backend: fake) can't feed the codec
+	from bm_daemon.common.config import get_camera_backend_settings
+	return get_camera_backend_settings()["backend"] != "fake"
+
+
+# ---- backend registry ----
+
+Format = Literal["jpeg", "heif", "h264"]
+
+_ALIASES = {
+	"jpeg": "jpeg", "jpg": "jpeg", "image/jpeg": "jpeg", "mjpeg": "jpeg",
+	"heif": "heif", "heic": "heif", "image/heif": "heif", "image/heic": "heif",
+	"h264": "h264", "avc": "h264", "video/h264": "h264",
+}
+
+
+class Backend:
+	"""
+	One way to produce `fmt`. Software backends take a frame array and/or an
+	image file; hardware backends (`hw`) encode a frame of the running camera
+	on the V4L2 codec, so they need the live Picamera2 (`camera`).
+	`rank` orders backends when no benchmark results are available.
+	"""
+
+	def __init__(self, name: str, fmt: str, ext: str, *, probe: Callable[[], bool],
+				 array=None, file=None, camera=None, image=None, hw: bool = False,
+				 max_pixels: Optional[int] = None, rank: int = 0):
+		self.name = name
+		self.fmt = fmt
+		self.ext = ext
+		self.probe = probe
+		self.array = array        # (frame, dst, quality) -> Path
+		self.file = file          # (src, dst, quality) -> Path
+		self.camera = camera      # (picam2, dst, quality) -> Path
+		self.image = image        # (PIL image, quality) -> bytes, for in-memory search
+		self.hw = hw
+		self.max_pixels = max_pixels
+		self.rank = rank
+		self.failed = False       # set after a runtime failure; skipped from then on
+
+	def available(self) -> bool:
+		return not self.failed and bool(self.probe())
+
+	def fits(self, size) -> bool:
+		return self.max_pixels is None or size is None or size[0] * size[1] <= self.max_pixels
+
+	def __repr__(self) -> str:
+		return f"Backend({self.name!r}, fmt={self.fmt}, hw={self.hw})"
+
+
+_BACKENDS: Dict[str, Backend] = {}
+
+
+def register_backend(backend: Backend) -> None:
+	_BACKENDS[backend.name] = backend
+
+
+register_backend(Backend("pillow-jpeg", "jpeg", ".jpg", probe=lambda: True, rank=0,
+						 array=lambda f, d, q: _save_jpeg(Image.fromarray(f), d, q),
+						 file=_pillow_file(_save_jpeg), image=_pillow_bytes("JPEG", optimize=True)))
+register_backend(Backend("simplejpeg", "jpeg", ".jpg", probe=lambda: _SIMPLEJPEG_OK, rank=10,
+						 array=_simplejpeg_array, file=_simplejpeg_file, image=_simplejpeg_bytes))
+register_backend(Backend("pillow-heif", "heif", ".heic", probe=lambda: _HEIF_OK, rank=0,
+						 array=lambda f, d, q: _save_heif(Image.fromarray(f), d, q),
+						 file=_pillow_file(_save_heif), image=_pillow_bytes("HEIF")))
+register_backend(Backend("v4l2-mjpeg", "jpeg", ".jpg", probe=_v4l2_present, rank=20,
+						 camera=_v4l2_mjpeg, hw=True))
+# the H.264 block is limited to 1080p-class frames
+register_backend(Backend("v4l2-h264", "h264", ".h264", probe=_v4l2_present, rank=20,
+						 camera=_v4l2_h264, hw=True, max_pixels=1920 * 1088))
+
+
+def canonical_format(fmt: str) -> str:
+	return _ALIASES.get(str(fmt).lower().strip(), "")
+
+
+def backends(fmt: Optional[str] = None, available_only: bool = True) -> List[Backend]:
+	f = canonical_format(fmt) if fmt else None
+	return [b for b in _BACKENDS.values()
+			if (f is None or b.fmt == f) and (not available_only or b.available())]
+
+
+# ---- benchmark results (written by benchmarks/bench_encoders.py --save) ----
+
+_bench = {"path": None, "mtime": None, "results": {}}
+
+
+def bench_results_path() -> Path:
+	from bm_daemon.common.config import get_encode_settings
+	from bm_daemon.common.paths import data_file
+	return Path(data_file(get_encode_settings()["bench_results"]))
+
+
+def load_bench_results() -> Dict[str, dict]:
+	"""{backend name: {"ms_per_mp": float, ...}}; re-read when the file changes."""
+	path = bench_results_path()
+	try:
+		mtime = path.stat().st_mtime_ns
+	except OSError:
+		return {}
+	if _bench["path"] != path or _bench["mtime"] != mtime:
+		try:
+			_bench["results"] = json.loads(path.read_text()).get("backends", {})
+		except (OSError, ValueError) as e:
+			log.warning("[ENC] ignoring bench results %s: %r", path, e)
+			_bench["results"] = {}
+		_bench["path"], _bench["mtime"] = path, mtime
+	return _bench["results"]
+
+
+def save_bench_results(results: Dict[str, dict], path: Optional[Path] = None) -> Path:
+	path = Path(path) if path else bench_results_path()
+	path.parent.mkdir(parents=True, exist_ok=True)
+	tmp = path.with_suffix(path.suffix + ".tmp")
+	tmp.write_text(json.dumps({"backends": results}, indent=2, sort_keys=True))
+	os.replace(tmp, path)
+	return path
+
+
+def select_backend(fmt: str, *, size=None, camera: bool = False) -> Optional[Backend]:
+	"""
+	Backend for `fmt`: the YAML choice (camera.encode.backends.<fmt>) when set
+	and usable, else the fastest available one by benchmark results (ms per
+	megapixel), else by rank (hardware > SIMD > Pillow). `camera=True` also
+	considers backends that encode on the live camera. None if nothing can
+	produce `fmt` here.
+	"""
+	from bm_daemon.common.config import get_encode_settings
+	f = canonical_format(fmt)
+	usable = [b for b in backends(f) if b.fits(size) and (b.array or b.file or camera)]
+	if not usable:
+		return None
+
+	want = get_encode_settings()["backends"].get(f, "auto")
+	if want != "auto":
+		for b in usable:
+			if b.name == want:
+				return b
+		log.warning("[ENC] backend %r for %s unavailable; choosing automatically", want, f)
+
+	results = load_bench_results()
+	measured = [b for b in usable if b.name in results]
+	if measured:
+		return min(measured, key=lambda b: results[b.name].get("ms_per_mp", float("inf")))
+	return max(usable, key=lambda b: b.rank)
+
+
+def _fallback(fmt: str, *, size=None, camera: bool = False) -> Backend:
+	# heif without pillow_heif, h264 without the V4L2 codec, ...: fall back to JPEG
+	b = select_backend(fmt, size=size, camera=camera)
+	if b is None and canonical_format(fmt) != "jpeg":
+		b = select_backend("jpeg", size=size, camera=camera)
+	return b or _BACKENDS["pillow-jpeg"]
+
+
+def _budget_backend(b: Backend) -> Backend:
+	# the search needs in-memory encodes; hardware-only formats fall back to JPEG
+	if b.image is not None:
+		return b
+	return next((c for c in backends(b.fmt) if c.image is not None), _BACKENDS["pillow-jpeg"])
+
+
+def _encode_budget(b: Backend, img: Image.Image, dst: Path, quality: int, target_bytes: int) -> Path:
+	r: BudgetResult = encode_to_budget(img, target_bytes, b.image, q_max=quality,
+									   model=default_model(), model_key=b.fmt)
+	dst.parent.mkdir(parents=True, exist_ok=True)
+	dst.write_bytes(r.data)
+	log.info("[ENC] budget %s: %d/%d bytes q=%d scale=%.2f (%dx%d) iter=%d%s",
+			 dst.name, len(r.data), target_bytes, r.quality, r.scale, r.size[0], r.size[1],
+			 r.iterations, "" if r.fits else " OVER BUDGET")
+	return dst
+
 
 def get_encoder(fmt: Format) -> Callable[..., Path]:
 	"""
-	Map a format string to an encoder function.
+	Map a format string to an encoder function:
+	(src, *, quality, suffix, target_bytes=None) -> Path. With `target_bytes`,
+	`quality` is the ceiling of a size-targeted search (see budget.py).
+	"""
+	f = canonical_format(fmt) or ("heif" if _HEIF_OK else "jpeg")   # default sensible choice
+	b = _fallback(f)
+	if b.file is None:
+		b = _BACKENDS["pillow-jpeg"]
+
+	def _encode(src: Path, *, quality: int = 75, suffix: str = "-c",
+				target_bytes: Optional[int] = None) -> Path:
+		src = Path(src)
+		if target_bytes:
+			bb = _budget_backend(b)
+			with Image.open(src) as img:
+				return _encode_budget(bb, img, _out_path(src, new_ext=bb.ext, suffix=suffix),
+									  quality, target_bytes)
+		return b.file(src, _out_path(src, new_ext=b.ext, suffix=suffix), quality)
+	_encode.backend = b
+	return _encode
+
+
+def get_array_encoder(fmt: Format) -> Callable[..., Path]:
+	"""
+	Same mapping as get_encoder(), for frames already in memory.
 	"""
-	f = fmt.lower().strip()
-	if f in ("jpeg", "jpg", "image/jpeg"):
-		return compress_to_jpeg
-	if f in ("heif", "heic", "image/heif", "image/heic"):
-		return compress_to_heif
-	# default sensible choice
-	return compress_to_heif if _HEIF_OK else compress_to_jpeg
+	f = canonical_format(fmt) or ("heif" if _HEIF_OK else "jpeg")
+	b = _fallback(f)
+	if b.array is None:
+		b = _BACKENDS["pillow-jpeg"]
+
+	def _encode(frame, src: Path, *, quality: int = 75, suffix: str = "-c",
+				target_bytes: Optional[int] = None) -> Path:
+		if target_bytes:
+			bb = _budget_backend(b)
+			return _encode_budget(bb, Image.fromarray(frame),
+								  _out_path(Path(src), new_ext=bb.ext, suffix=suffix), quality, target_bytes)
+		return b.array(frame, _out_path(Path(src), new_ext=b.ext, suffix=suffix), quality)
+	_encode.backend = b
+	return _encode
+
+
+def get_camera_encoder(fmt: Format, size=None) -> Optional[Callable[..., Path]]:
+	"""
+	Hardware encoder for `fmt` at `size` if one is selected, as
+	(picam2, src, *, quality, suffix) -> Path; None means use the array path.
+	A backend that fails at runtime is disabled and the caller falls back.
+	"""
+	b = select_backend(canonical_format(fmt) or "jpeg", size=size, camera=True)
+	if b is None or b.camera is None:
+		return None
+
+	def _encode(picam2, src: Path, *, quality: int = 75, suffix: str = "-c") -> Path:
+		try:
+			return b.camera(picam2, _out_path(Path(src), new_ext=b.ext, suffix=suffix), quality)
+		except Exception as e:
+			b.failed = True
+			log.warning("[ENC] %s failed (%r); disabled, using software encoders", b.name, e)
+			raise
+	_encode.backend = b
+	return _encode
@@ -0,0 +1,48 @@
+# bm_camera/encode/layers.py
+"""
+Preview layers for progressive delivery over Spotter.
+
+build_layers() turns an encoded image into a few smaller, standalone JPEGs
+(smallest first), each fitting a camera.resolutions box. They are sent
+ahead of the full image, so the first recognisable picture reaches shore
+within a few chunks and a transfer cut short still leaves the best layer
+that completed. With progressive JPEG a partly received layer decodes
+too, at reduced detail.
+"""
+import logging
+from pathlib import Path
+from typing import List
+
+from PIL import Image
+
+import bm_camera.encode.file_encoder  # noqa: F401  (registers the HEIF opener when available)
+from bm_daemon.common.config import resolve_resolution
+
+log = logging.getLogger("ENC")
+
+
+def build_layers(src: Path, specs: List[dict], *, progressive: bool = True) -> List[Path]:
+	"""
+	One JPEG per spec ({"res": key, "q": quality}) next to `src`, named
+	<stem>-L<k>.jpg, smallest first. Specs at or above the size of `src`
+	are left out (the full image is the last layer anyway).
+	"""
+	src = Path(src)
+	boxes = sorted(((tuple(resolve_resolution(s["res"])), int(s.get("q", 30))) for s in specs),
+				   key=lambda b: b[0][0] * b[0][1])
+	out = []
+	with Image.open(src) as img:
+		full = img.size
+		boxes = [b for b in boxes if b[0][0] < full[0] or b[0][1] < full[1]]
+		if not boxes:
+			return out
+		# JPEG sources decode straight at a reduced scale, just above the largest layer
+		img.draft("RGB", boxes[-1][0])
+		base = img.convert("RGB")
+		for k, (box, quality) in enumerate(boxes):
+			layer = base.copy()
+			layer.thumbnail(box, Image.LANCZOS)
+			dst = src.with_name(f"{src.stem}-L{k}.jpg")
+			layer.save(dst, format="JPEG", quality=quality, optimize=True, progressive=progressive)
+			out.append(dst)
+	return out
@@ -0,0 +1,86 @@
+# bm_camera/encode/pool.py
+"""
+Process pool for software encodes, so burst frames use every core.
+
+Jobs are plain module-level functions taking picklable arguments (the
+frame array, paths as str, format/quality/budget) and returning
+(encoded path, encode seconds). The pool is created on first use, sized
+from camera.burst.workers (0 = one process per core), and kept for the
+life of the daemon. Workers start from a fork server rather than a fork
+of the threaded agent.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+
+log = logging.getLogger("ENC")
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def encode_array_job(frame, src: str, fmt: str, quality: int, suffix: str,
+					 target_bytes: Optional[int] = None) -> Tuple[str, float]:
+	from bm_camera.encode.file_encoder import get_array_encoder
+	t0 = time.monotonic()
+	out = get_array_encoder(fmt)(frame, Path(src), quality=quality, suffix=suffix, target_bytes=target_bytes)
+	return str(out), time.monotonic() - t0
+
+
+def encode_file_job(src: str, fmt: str, quality: int, suffix: str,
+					target_bytes: Optional[int] = None) -> Tuple[str, float]:
+	from bm_camera.encode.file_encoder import get_encoder
+	t0 = time.monotonic()
+	out = get_encoder(fmt)(Path(src), quality=quality, suffix=suffix, target_bytes=target_bytes)
+	return str(out), time.monotonic() - t0
+
+
+def _warm():
+	# import the encoders once per worker so the first burst frame doesn't pay for it
+	import bm_camera.encode.file_encoder  # noqa: F401
+	return os.getpid()
+
+
+def pool_size(workers: int = 0) -> int:
+	return int(workers) if int(workers) > 0 else (os.cpu_count() or 1)
+
+
+def get_pool(workers: int = 0) -> ProcessPoolExecutor:
+	"""The shared encode pool (created, or re-created at a new size, on demand)."""
+	global _pool, _pool_workers
+	n = pool_size(workers)
+	with _pool_lock:
+		if _pool is not None and _pool_workers != n:
+			_pool.shutdown(wait=True)
+			_pool = None
+		if _pool is None:
+			method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+			_pool = ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context(method))
+			_pool_workers = n
+			log.info("[ENC] encode pool: %d process(es) (%s)", n, method)
+		return _pool
+
+
+def warm_pool(workers: int = 0) -> None:
+	"""Start all workers now (e.g. at daemon start) instead of on the first burst."""
+	pool = get_pool(workers)
+	for f in [pool.submit(_warm) for _ in range(pool_size(workers))]:
+		f.result()
+
+
+def shutdown_pool() -> None:
+	global _pool
+	with _pool_lock:
+		if _pool is not None:
+			_pool.shutdown(wait=True, cancel_futures=True)
+			_pool = None
+
+
+atexit.register(shutdown_pool)
@@ -158,12 +158,23 @@ import os
 import time
 from pathlib import Path
 
-from bm_daemon.common.config import load_config, get_camera_defaults
+from bm_daemon.common.config import (
+    load_config, get_camera_defaults, get_burst_settings, get_change_settings, get_progressive_settings,
+)
+from bm_daemon.agent.command import Field, Schema, parse, parse_bool, parse_count
 from bm_camera.utils.camera_lock import CameraLock
-from bm_camera.capture.image_capture import capture_image
-from bm_camera.encode.file_encoder import get_encoder
+from bm_camera.capture.image_capture import capture_image, capture_image_array, capture_image_hw
+from bm_camera.encode.burst import BurstPipeline
+from bm_camera.encode.file_encoder import array_to_jpeg
+from bm_camera.encode.budget import Q_MAX
+from bm_camera.encode.change import SKIP, THUMB, get_detector, thumbnail, thumbnail_file
+from bm_camera.encode.layers import build_layers
+from bm_camera.encode.pool import encode_array_job, encode_file_job, get_pool, pool_size
+from bm_daemon.transport.pacing import make_pacer
 from bm_daemon.transport.spotter import (
-    build_base64_chunks,
+    build_chunks,
+    chunk_budget_bytes,
+    chunk_count,
     mirror_chunks_to_buffer,
     send_chunks_to_spotter,
     get_spotter_tx_settings,
@@ -175,59 +186,79 @@ log = logging.getLogger("IMG")
 # discover topic from YAML with a sane fallback
 _cfg = load_config()
 topics = [_cfg.get("topics", {}).get("camera_capture_image", "camera/capture/image")]
+# camera jobs share one worker so captures never contend for the sensor
+worker_pool = "camera"
 
-def _payload_to_str(data: bytes) -> str:
-    if not data:
-        return ""
-    body = data[1:] if data and data[0] < 0x20 else data
-    s = body.decode("utf-8", "ignore").strip()
-    if len(s) >= 2 and s[0] == s[-1] and s[0] in ("'", '"'):
-        s = s[1:-1]
-    return s
-
-def _parse_tokens(s: str) -> dict:
-    if s in ("", "1", "go", "trigger"):
-        return {}
-    if "=" not in s and "," not in s:
-        return {"res": s}
-    out = {}
-    for tok in s.split(","):
-        if not tok:
-            continue
-        if "=" in tok:
-            k, v = tok.split("=", 1)
-            out[k.strip()] = v.strip()
-    return out
+# arguments of camera/capture/image; a bare word is the resolution ("1080p")
+command_schema = Schema({
+    "res":   Field("str"),
+    "burst": Field("int"),
+    "int":   Field("secs", lo=0),
+    "fmt":   Field("lower"),
+    "q":     Field("int", lo=1, hi=100),
+    "pipe":  Field("lower", choices=("file", "memory")),
+    "raw":   Field("bool"),
+    "send":  Field("bool"),
+    # change=0: send in full whatever the change score
+    "change": Field("bool"),
+    # prog=1: preview layers before the full image (camera.progressive)
+    "prog":  Field("bool"),
+    # byte budget instead of a fixed quality: q= becomes the ceiling
+    "target_bytes": Field("count", lo=1),
+    "chunks":       Field("int", lo=1),
+}, positional="res")
 
-def _parse_ms(val: str) -> float:
-    v = val.lower()
-    if v.endswith("ms"):
-        return float(v[:-2]) / 1000.0
-    if v.endswith("s"):
-        return float(v[:-1])
-    return float(v)
+def _budget_bytes(cmd, defaults):
+    """Byte budget from the command, else the YAML defaults; None for fixed quality."""
+    for src in (cmd.values, defaults):
+        if src.get("chunks"):
+            return chunk_budget_bytes(int(src["chunks"]), get_spotter_tx_settings())
+        if src.get("target_bytes"):
+            return parse_count(str(src["target_bytes"]))   # YAML may say "40k"
+    return None
 
-def _parse_bool(val) -> bool:
-    if isinstance(val, bool):
-        return val
-    v = str(val).strip().lower()
-    return v in ("1","true","yes","on","y")
+def _change_fields(change):
+    """Status fields for a change decision (none when detection is off)."""
+    if change is None:
+        return {}
+    decision, score = change
+    return {"change": decision, "score": "-" if score is None else f"{score:.1f}"}
 
 def handle(msg, *, ctx):
-    """msg: {'node': ..., 'topic': str, 'data': bytes} ; ctx: dict"""
-    data = msg.get("data") or b""
-    p = _parse_tokens(_payload_to_str(data))
+    """msg: {'node': ..., 'topic': str, 'data': memoryview, 'cmd': Command} ; ctx: dict"""
+    cmd = msg.get("cmd") or parse(msg.get("topic", topics[0]), msg.get("data"), command_schema)
+    if cmd.errors:
+        log.warning("[CAM/IMG] bad args: %s", "; ".join(cmd.errors))
+        send_status(ctx, "ERR", op="image", reason="BadArgs")
+        return
     defaults = get_camera_defaults("image")
 
     # YAML-driven image capture defaults
-    res       = p.get("res", defaults.get("res", "1080p"))
-    burst     = max(1, int(p.get("burst", defaults.get("burst", 1))))
-    interval  = _parse_ms(p["int"]) if "int" in p else float(defaults.get("interval_s", 0.0))
-    enc_fmt   = p.get("fmt", defaults.get("encode_format", "heif")).lower()
-    quality   = int(p.get("q",   defaults.get("quality", 25)))
+    res       = cmd.get("res", defaults.get("res", "1080p"))
+    burst     = max(1, cmd.get("burst", int(defaults.get("burst", 1))))
+    interval  = cmd.get("int", float(defaults.get("interval_s", 0.0)))
+    enc_fmt   = cmd.get("fmt", str(defaults.get("encode_format", "heif")).lower())
+    quality   = cmd.get("q", int(defaults.get("quality", 25)))
+    # "memory": encode the captured frame directly; "file": capture JPEG, re-open, re-encode
+    pipeline  = cmd.get("pipe", str(defaults.get("pipeline", "file")).lower())
+    keep_raw  = cmd.get("raw", parse_bool(defaults.get("keep_raw", False)))
 
     # transport gate (default false unless explicitly enabled)
-    send_flag = _parse_bool(p.get("send", defaults.get("send_via_spotter", False)))
+    send_flag = cmd.get("send", parse_bool(defaults.get("send_via_spotter", False)))
+
+    # progressive delivery: small standalone previews first, the full image last
+    prog_cfg = get_progressive_settings()
+    progressive = send_flag and cmd.get("prog", prog_cfg["enabled"])
+
+    # size budget: chunks= (Spotter chunks under the current framing) or target_bytes=
+    target = _budget_bytes(cmd, defaults)
+    if target and "q" not in cmd:
+        quality = Q_MAX   # search from the top unless q= caps it
+
+    # change detection against the last frame kept (camera.change)
+    detector = get_detector()
+    force_full = not cmd.get("change", True)
+    thumb_px = get_change_settings()["thumb_px"]
 
     bm = ctx.get("bm")
 
@@ -237,49 +268,131 @@ def handle(msg, *, ctx):
     except Exception:
         log.debug("status ACK failed (non-fatal)", exc_info=True)
 
-    try:
-        with CameraLock(timeout_s=8.0):
-            for i in range(burst):
-                # 1) capture
-                src_path = Path(capture_image(resolution_key=res))
-                size_raw = os.path.getsize(src_path) if src_path.exists() else -1
-                log.info("[CAM/IMG] CAPTURED %s (%d bytes) res=%s burst=%d/%d",
-                         src_path, size_raw, res, i+1, burst)
+    def capture_one(i):
+        """Capture frame i -> (encode job or None if already encoded, job args, meta)."""
+        t0 = time.monotonic()
+        # hardware codec (when selected for fmt/res): the ISP output is encoded on the V4L2 block
+        hw = None
+        if pipeline == "memory" and not keep_raw and not target and detector is None:
+            hw = capture_image_hw(resolution_key=res, fmt=enc_fmt, quality=quality, suffix="-c")
+        if hw is not None:
+            enc_path, src_path = hw
+            log.info("[CAM/IMG] CAPTURED+ENCODED %s on hardware res=%s burst=%d/%d",
+                     enc_path.name, res, i+1, burst)
+            return None, (str(enc_path), 0.0), (src_path, 0.0, None)
+        if pipeline == "memory":
+            # frame stays in RAM; only the encoded artifact (and optional raw) is written
+            frame, src_path = capture_image_array(resolution_key=res)
+            log.info("[CAM/IMG] CAPTURED %s in memory (%d bytes) res=%s burst=%d/%d",
+                     src_path.name, frame.nbytes, res, i+1, burst)
+            change = detector.check(frame, force_full) if detector is not None else None
+            if change is not None and change[0] == SKIP:
+                return None, None, (src_path, time.monotonic() - t0, change)
+            if keep_raw:
+                array_to_jpeg(frame, src_path, quality=95, suffix="")
+            if change is not None and change[0] == THUMB:
+                return (encode_array_job, (thumbnail(frame, thumb_px), str(src_path), enc_fmt, quality, "-t", target),
+                        (src_path, time.monotonic() - t0, change))
+            return (encode_array_job, (frame, str(src_path), enc_fmt, quality, "-c", target),
+                    (src_path, time.monotonic() - t0, change))
+        src_path = Path(capture_image(resolution_key=res))
+        size_raw = os.path.getsize(src_path) if src_path.exists() else -1
+        log.info("[CAM/IMG] CAPTURED %s (%d bytes) res=%s burst=%d/%d",
+                 src_path, size_raw, res, i+1, burst)
+        change = detector.check_file(src_path, force_full) if detector is not None else None
+        if change is not None and change[0] == SKIP:
+            src_path.unlink(missing_ok=True)   # nothing of a skipped frame is kept
+            return None, None, (src_path, time.monotonic() - t0, change)
+        if change is not None and change[0] == THUMB:
+            return (encode_array_job, (thumbnail_file(src_path, thumb_px), str(src_path), enc_fmt, quality, "-t", target),
+                    (src_path, time.monotonic() - t0, change))
+        return (encode_file_job, (str(src_path), enc_fmt, quality, "-c", target),
+                (src_path, time.monotonic() - t0, change))
+
+    def finish_one(i, meta, result):
+        """Log, transmit (or queue) and report encoded frame i."""
+        src_path, t_cap, change = meta
+        if result is None:
+            log.info("[CAM/IMG] SKIP %s: no change (%s score=%.1f < %.1f)", src_path.name,
+                     detector.method, change[1], detector.skip_below)
+            send_status(ctx, "OK", op="image", res=res, idx=i+1, burst=burst, tx="no",
+                        **_change_fields(change))
+            return
+        enc_path, t_enc = Path(result[0]), result[1]
+        size_enc = os.path.getsize(enc_path) if enc_path.exists() else -1
+        sd_write = max(size_enc, 0) + (os.path.getsize(src_path) if src_path.exists() else 0)
+        log.info("[ENC] %s -> %s (%d bytes) fmt=%s q=%d pipe=%s capture=%.2fs encode=%.2fs sd_write=%d",
+                 src_path.name, enc_path.name, size_enc, enc_fmt, quality,
+                 pipeline, t_cap, t_enc, sd_write)
+
+        # preview layers go out first, each a standalone JPEG; the full image is the last layer
+        parts = [enc_path]
+        if progressive:
+            try:
+                parts = build_layers(enc_path, prog_cfg["layers"], progressive=prog_cfg["progressive_jpeg"]) + parts
+            except Exception as e:   # e.g. an H.264 frame PIL can't open: send it plain
+                log.warning("[CAM/IMG] no preview layers for %s: %r", enc_path.name, e)
+        n_parts = len(parts)
+
+        def layer(k):
+            return (k + 1, n_parts) if n_parts > 1 else None
 
-                # 2) encode
-                encoder  = get_encoder(enc_fmt)
-                enc_path = encoder(src_path, quality=quality, suffix="-c")
-                size_enc = os.path.getsize(enc_path) if enc_path.exists() else -1
-                log.info("[ENC] %s -> %s (%d bytes) fmt=%s q=%d",
-                         src_path.name, enc_path.name, size_enc, enc_fmt, quality)
+        # 3) optional transport
+        tx_cfg = get_spotter_tx_settings()
+        txq = ctx.get("tx_queue")
+        if send_flag and txq is not None:
+            # journaled; the TX queue thread sends (and resumes) it, previews ahead of full images
+            for k, part in enumerate(parts):
+                txq.enqueue(part, tx_cfg, kind="IMG", layer=layer(k))
+            tx = "queued"
+        elif send_flag:
+            for k, part in enumerate(parts):
+                basename, chunks, raw_len = build_chunks(part, tx_cfg)
+                mirror_chunks_to_buffer(chunks, clear_first=True)
+                log.info("[TX] START %s chunks=%d", basename, len(chunks))
+                send_chunks_to_spotter(
+                    bm,
+                    file_label=basename,
+                    chunks=chunks,
+                    delay_s=tx_cfg["delay_s"],
+                    kind="IMG",
+                    pacer=make_pacer(tx_cfg),
+                    layer=layer(k),
+                )
+                log.info("[TX] END %s", basename)
+            tx = "yes"
+        else:
+            tx = "no"
+            log.info("[TX] skipped (send flag false)")
 
-                # 3) optional transport
-                if send_flag:
-                    tx_cfg = get_spotter_tx_settings()
-                    basename, chunks, raw_len = build_base64_chunks(
-                        enc_path, chunk_size=tx_cfg["chunk_size"]
-                    )
-                    mirror_chunks_to_buffer(chunks, clear_first=True)
-                    log.info("[TX] START %s chunks=%d", basename, len(chunks))
-                    send_chunks_to_spotter(
-                        bm,
-                        file_label=basename,
-                        chunks=chunks,
-                        delay_s=tx_cfg["delay_s"],
-                        kind="IMG",
-                    )
-                    log.info("[TX] END %s", basename)
-                    tx = "yes"
-                else:
-                    tx = "no"
-                    log.info("[TX] skipped (send flag false)")
+        extra = _change_fields(change)
+        if n_parts > 1:
+            # chunks per layer, smallest first: the first usable image after the first figure
+            extra["layers"] = ",".join(str(chunk_count(p.stat().st_size, tx_cfg)) for p in parts)
 
-                # status ACK (result)
-                send_status(ctx, "OK", op="image", file=os.path.basename(enc_path),
-                            res=res, idx=i+1, burst=burst, bytes=size_enc, tx=tx)
+        # status ACK (result)
+        send_status(ctx, "OK", op="image", file=os.path.basename(enc_path),
+                    res=res, idx=i+1, burst=burst, bytes=size_enc, tx=tx, **extra)
 
-                if i + 1 < burst and interval > 0:
-                    time.sleep(interval)
+    def fail(i, meta, e):
+        log.error("[CAM/IMG][ERR] frame %d/%d: %r", i+1, burst, e, exc_info=e)
+        send_status(ctx, "ERR", op="image", reason=type(e).__name__)
+
+    bcfg = get_burst_settings()
+    try:
+        with CameraLock(timeout_s=8.0):
+            if burst > 1 and bcfg["pipelined"]:
+                # capture i+1 || encode i (process pool) || transmit i-1; statuses stay in order
+                workers = pool_size(bcfg["workers"])
+                pipe = BurstPipeline(get_pool(workers),
+                                     max_inflight=bcfg["max_inflight"] or 2 * workers)
+                pipe.run(burst, capture_one, finish_one, fail, interval_s=interval)
+            else:
+                for i in range(burst):
+                    fn, args, meta = capture_one(i)
+                    finish_one(i, meta, args if fn is None else fn(*args))
+                    if i + 1 < burst and interval > 0:
+                        time.sleep(interval)
 
     except TimeoutError:
         log.warning("[CAM/IMG][BUSY] camera in use; drop trigger")
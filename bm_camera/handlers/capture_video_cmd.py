@@ -111,8 +111,9 @@
 import logging
 import os
 from bm_daemon.common.config import load_config, get_camera_defaults
+from bm_daemon.agent.command import Field, Schema, parse, parse_bool
 from bm_camera.utils.camera_lock import CameraLock
-from bm_camera.capture.video_capture import capture_video
+from bm_camera.capture.video_capture import capture_video, get_preroll, start_preroll, stop_preroll
 from .status_util import send_status
 
 log = logging.getLogger("VID")
@@ -120,71 +121,80 @@ log = logging.getLogger("VID")
 # discover topic from YAML with a sane fallback
 _cfg = load_config()
 topics = [_cfg.get("topics", {}).get("camera_capture_video", "camera/capture/video")]
+# camera jobs share one worker so captures never contend for the sensor
+worker_pool = "camera"
 
-def _payload_to_str(data: bytes) -> str:
-    if not data:
-        return ""
-    body = data[1:] if data and data[0] < 0x20 else data
-    s = body.decode("utf-8", "ignore").strip()
-    if len(s) >= 2 and s[0] == s[-1] and s[0] in ("'", '"'):
-        s = s[1:-1]
-    return s
+# arguments of camera/capture/video; a bare word is the resolution ("1080p")
+# pre=: seconds from before the trigger when the pre-roll ring is armed
+# (default: all of it; pre=0 records from now, as without the ring)
+command_schema = Schema({
+    "res":   Field("str"),
+    "dur":   Field("secs", lo=0),
+    "pre":   Field("secs", lo=0),
+    "fps":   Field("int", lo=1, hi=120),
+    "br":    Field("count", lo=1),
+    "hflip": Field("bool"),
+    "vflip": Field("bool"),
+}, positional="res")
 
-def _parse_tokens(s: str) -> dict:
-    if s in ("", "1", "go", "trigger"):
-        return {}
-    if "=" not in s and "," not in s:
-        return {"res": s}
-    out = {}
-    for tok in s.split(","):
-        if not tok:
-            continue
-        if "=" in tok:
-            k, v = tok.split("=", 1)
-            out[k.strip()] = v.strip()
-    return out
+def init(ctx):
+    """Arm the pre-roll ring (camera.preroll.enabled) so clips include the seconds before a trigger."""
+    ring = start_preroll()
+    if ring is not None:
+        ctx["preroll"] = ring
 
-def _parse_num_with_units(val: str) -> int:
-    v = val.lower()
-    if v.endswith("m"):
-        return int(float(v[:-1]) * 1_000_000)
-    if v.endswith("k"):
-        return int(float(v[:-1]) * 1_000)
-    return int(v)
-
-def _parse_seconds(val: str) -> float:
-    v = val.lower()
-    if v.endswith("ms"):
-        return float(v[:-2]) / 1000.0
-    if v.endswith("s"):
-        return float(v[:-1])
-    return float(v)
+def cleanup(ctx):
+    stop_preroll()
 
 def handle(msg, *, ctx):
-    """msg: {'node': ..., 'topic': str, 'data': bytes} ; ctx: dict"""
-    data = msg.get("data") or b""
-    p = _parse_tokens(_payload_to_str(data))
+    """msg: {'node': ..., 'topic': str, 'data': memoryview, 'cmd': Command} ; ctx: dict"""
+    cmd = msg.get("cmd") or parse(msg.get("topic", topics[0]), msg.get("data"), command_schema)
+    if cmd.errors:
+        log.warning("[CAM/VID] bad args: %s", "; ".join(cmd.errors))
+        send_status(ctx, "ERR", op="video", reason="BadArgs")
+        return
     defaults = get_camera_defaults("video")
 
-    res   = p.get("res", defaults["res"])
-    dur   = _parse_seconds(p.get("dur", f'{defaults["dur_s"]}s'))
-    fps   = int(p.get("fps", defaults["fps"]))
-    br    = _parse_num_with_units(p.get("br", str(defaults["bitrate"])))
-    hflip = str(p.get("hflip", str(defaults["hflip"]))).lower() in ("1","true","yes")
-    vflip = str(p.get("vflip", str(defaults["vflip"]))).lower() in ("1","true","yes")
+    res   = cmd.get("res", defaults["res"])
+    dur   = cmd.get("dur", float(defaults["dur_s"]))
+    fps   = cmd.get("fps", int(defaults["fps"]))
+    br    = cmd.get("br", int(defaults["bitrate"]))
+    hflip = cmd.get("hflip", parse_bool(defaults["hflip"]))
+    vflip = cmd.get("vflip", parse_bool(defaults["vflip"]))
+
+    pre   = cmd.get("pre")
+    # explicit res/fps/br the ring wasn't set up with, or another orientation: record
+    # normally (pauses the ring)
+    ring = get_preroll()
+    if ring is not None and (pre == 0 or not ring.serves(cmd.get("res"), cmd.get("fps"), cmd.get("br"),
+                                                         hflip=hflip, vflip=vflip)):
+        ring = None
 
     lock_timeout = max(10.0, float(dur) + 5.0)
     try:
         with CameraLock(timeout_s=lock_timeout):
-            path = capture_video(
-                base_name="VID",
-                duration_s=dur,
-                resolution_key=res,
-                fps=fps,
-                bitrate=br,
-                hflip=hflip,
-                vflip=vflip,
-            )
+            if ring is not None:
+                clip = ring.save(post_s=dur, pre_s=pre, base_name="VID")
+            else:
+                path = capture_video(
+                    base_name="VID",
+                    duration_s=dur,
+                    resolution_key=res,
+                    fps=fps,
+                    bitrate=br,
+                    hflip=hflip,
+                    vflip=vflip,
+                )
+        if ring is not None:
+            rs = clip["ring"]
+            log.info("[CAM/VID] SAVED %s (%d bytes) pre=%.1fs post=%.1fs res=%s fps=%d; "
+                     "ring %.1fs %.0fkB (%.0f kB/s)", clip["path"], clip["bytes"], clip["pre_s"],
+                     clip["post_s"], ring.resolution_key, ring.fps, rs["seconds"], rs["bytes"] / 1000.0,
+                     rs["kbytes_per_s"])
+            send_status(ctx, "OK", op="video", file=os.path.basename(clip["path"]),
+                        res=ring.resolution_key, pre=f"{clip['pre_s']:.1f}s", dur=f"{dur}s",
+                        fps=ring.fps, br=ring.bitrate, bytes=clip["bytes"])
+            return
         size = os.path.getsize(path) if os.path.exists(path) else -1
         log.info("[CAM/VID] SAVED %s (%d bytes) res=%s dur=%ss fps=%d br=%d",
                  path, size, res, dur, fps, br)
@@ -164,12 +164,14 @@
 # 			pass
 # 		log.info("[BUS] closed")
 # bm_daemon/agent/bus.py
+import asyncio
 import logging
 import sys
 import time
 import serial  # SerialException
 
 from bm_daemon.io.bm_serial import BristlemouthSerial
+from bm_daemon.agent.router import TopicRouter
 
 logger = logging.getLogger("BUS")
 
@@ -196,10 +198,17 @@ def _uart_safety(uart):
 		pass
 
 
-def open_bus(uart_device="/dev/serial0", baudrate=115200):
+def open_bus(uart_device="/dev/serial0", baudrate=115200, fake_cfg=None, topics_cfg=None):
 	"""
 	Open BM UART using the configured device & baudrate.
+	uart_device "fake" starts a simulated BM node (bm_daemon.io.fake_bm) on a
+	pty, configured by `fake_cfg`, and opens that instead; it is bm.peer.
 	"""
+	peer = None
+	if str(uart_device).strip().lower() == "fake":
+		from bm_daemon.io.fake_bm import FakeBmPeer
+		peer = FakeBmPeer.from_config(fake_cfg, topics_cfg).start()
+		uart_device = peer.port
 	try:
 		bm = BristlemouthSerial(port=uart_device, baudrate=baudrate, timeout=0.5)
 	except serial.SerialException as e:
@@ -213,6 +222,7 @@ def open_bus(uart_device="/dev/serial0", baudrate=115200):
 		logger.error("could not open %s @ %s: %s", uart_device, baudrate, e)
 		raise
 
+	bm.peer = peer
 	uart = getattr(bm, "uart", None)
 	if uart:
 		_uart_safety(uart)
@@ -222,42 +232,111 @@ def open_bus(uart_device="/dev/serial0", baudrate=115200):
 	return bm
 
 
-def subscribe_many(bm: BristlemouthSerial, topics, cb):
+def subscribe_frames(bm: BristlemouthSerial, topics, cb):
 	"""
-	Subscribe one callback per topic, but filter frames so only the wrapper whose
-	subscription matches the *frame topic* forwards to `cb`. This prevents the same
-	frame from being handled N times when you have N subscriptions.
+	Subscribe `cb(frame)` to each topic (exact, "a/*" or "a/**" pattern).
+	Frames are routed through one TopicRouter on the bus: the topic is decoded
+	once and `cb` runs once per matching frame (a bm_daemon.io.frame.BmFrame),
+	however many subscriptions there are.
 	"""
+	router = bm.router
+	if router is None:
+		router = bm.router = TopicRouter()
 	for t in topics:
 		sub_topic = t if isinstance(t, str) else str(t)
 		logger.info("[SUB] subscribing to '%s'", sub_topic)
+		router.add(sub_topic, cb)
+		bm.bristlemouth_sub(sub_topic)
+
 
-		def _wrapped(node_id, type_, version, topic_len, topic, data_len, data, _sub=sub_topic):
-			frame_topic = _norm_topic(topic)
-			if frame_topic != _sub:
-				# Drop frames not meant for this subscription
-				return
-			cb(node_id, type_, version, topic_len, topic, data_len, data)
+def subscribe_many(bm: BristlemouthSerial, topics, cb):
+	"""
+	subscribe_frames() for callbacks with the historical signature
+	cb(node_id, type, version, topic_len, topic, data_len, data).
+	"""
+	def _unpack(frame):
+		cb(frame.node_id, frame.type, frame.version, len(frame.topic), frame.topic,
+		   len(frame.payload), frame.payload)
 
-		bm.bristlemouth_sub(sub_topic, _wrapped)
+	subscribe_frames(bm, topics, _unpack)
 
 
-def loop(bm: BristlemouthSerial, should_stop=None):
+def loop(bm: BristlemouthSerial, should_stop=None, max_latency_s: float = 0.5, heartbeat=None):
+	"""
+	Pump the serial bus until should_stop() returns True.
+	bristlemouth_process() sleeps on the UART fd and returns as soon as a frame
+	is handled; max_latency_s bounds how long it may block, i.e. how quickly
+	should_stop() and the heartbeat are serviced on an idle bus.
+	heartbeat, if given, is called alongside the periodic [HB] log line.
+	"""
 	logger = logging.getLogger("BUS")
 	try:
-		last_hb = 0.0
+		last_hb = time.monotonic()
+		last_wakeups = bm.rx_stats.get("wakeups", 0)
 		while True:
-			bm.bristlemouth_process(0.1)
+			bm.bristlemouth_process(max_latency_s)
 			if should_stop and should_stop():
 				break
 			now = time.monotonic()
 			if now - last_hb >= 5.0:
-				logger.debug("[HB] %s alive", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+				wakeups = bm.rx_stats.get("wakeups", 0)
+				logger.debug("[HB] %s alive rx_wakeups/s=%.2f frames=%d crc_err=%d",
+							 time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+							 (wakeups - last_wakeups) / (now - last_hb),
+							 bm.rx_stats.get("frames", 0), bm.rx_stats.get("crc_errors", 0))
+				last_hb = now
+				last_wakeups = wakeups
+				if heartbeat:
+					heartbeat()
+	finally:
+		try:
+			bm.close()
+		except Exception:
+			pass
+		print("\n[BUS] closed")
+
+
+async def loop_async(bm: BristlemouthSerial, should_stop=None, max_latency_s: float = 0.5, heartbeat=None):
+	"""
+	asyncio flavour of loop(): the UART fd is registered with the event loop's
+	reader callbacks, so bytes are framed and dispatched on the loop thread as
+	soon as they arrive while handlers run elsewhere (tasks / executors).
+	max_latency_s is how often should_stop() and the heartbeat are checked.
+	"""
+	logger = logging.getLogger("BUS")
+	ev_loop = asyncio.get_running_loop()
+	uart = bm.uart
+	fd = uart.fileno()
+
+	def _on_readable():
+		try:
+			data = uart.read(max(1, uart.in_waiting))
+		except Exception as e:
+			logger.error("[BUS] read failed: %r", e)
+			ev_loop.remove_reader(fd)
+			return
+		if data:
+			bm.rx_stats["wakeups"] += 1
+			bm._feed_rx(data)
+
+	ev_loop.add_reader(fd, _on_readable)
+	try:
+		last_hb = time.monotonic()
+		while not (should_stop and should_stop()):
+			await asyncio.sleep(max_latency_s)
+			now = time.monotonic()
+			if now - last_hb >= 5.0:
+				logger.debug("[HB] %s alive frames=%d crc_err=%d tasks=%d",
+							 time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+							 bm.rx_stats.get("frames", 0), bm.rx_stats.get("crc_errors", 0),
+							 len(asyncio.all_tasks()))
 				last_hb = now
-			time.sleep(0.05)
+				if heartbeat:
+					heartbeat()
 	finally:
+		ev_loop.remove_reader(fd)
 		try:
-			bm.uart.close()
+			bm.close()
 		except Exception:
 			pass
-		print("\n[BUS] closed")
\ No newline at end of file
+		print("\n[BUS] closed")
@@ -0,0 +1,231 @@
+# bm_daemon/agent/command.py
+"""
+Command payload parsing shared by the agent and all handlers.
+
+A command payload is short text, optionally prefixed by the 1-byte BM type
+and wrapped in quotes:
+
+  "res=1080p,burst=3,int=500ms"   key=value pairs (keys are case-insensitive)
+  "1080p"                         a bare word fills the schema's positional field
+  "" / "1" / "go" / "trigger"     a plain trigger (no arguments)
+
+A topic's Schema declares its fields and their kinds; parsing yields a
+Command with the raw `tokens` and the typed, validated `values`. Plugins
+declare `command_schema = Schema(...)` next to `topics` and the plugin
+loader registers it. The agent parses a frame once on arrival and attaches
+the Command to the BmFrame. Commands are immutable and cached per
+(topic, payload), so the dedup engine and the handler share one parse.
+"""
+import functools
+import math
+from typing import Dict, Iterable, Optional, Tuple
+
+from bm_daemon.common.config import FrozenDict
+
+TRIGGERS = ("", "1", "go", "trigger")
+_TRUE = ("1", "true", "yes", "on", "y")
+_FALSE = ("0", "false", "no", "off", "n")
+_CACHE_MAX = 256
+_CACHE_PAYLOAD_MAX = 512   # longer payloads are data, not commands; parse uncached
+
+
+def payload_to_str(data) -> str:
+	"""Payload text: 1-byte BM type stripped if present, whitespace and quotes trimmed."""
+	if not data:
+		return ""
+	body = data[1:] if data and data[0] < 0x20 else data
+	s = str(body, "utf-8", "ignore").strip()
+	if len(s) >= 2 and s[0] == s[-1] and s[0] in ("'", '"'):
+		s = s[1:-1]
+	return s
+
+
+def parse_secs(token: str) -> float:
+	"""'500ms' -> 0.5, '3s' -> 3.0, '2.5' -> 2.5"""
+	v = token.strip().lower()
+	if v.endswith("ms"):
+		return float(v[:-2]) / 1000.0
+	if v.endswith("s"):
+		return float(v[:-1])
+	return float(v)
+
+
+def parse_count(token: str) -> int:
+	"""'3M' -> 3000000, '800k' -> 800000, '1200' -> 1200"""
+	v = token.strip().lower()
+	if v.endswith("m"):
+		return int(float(v[:-1]) * 1_000_000)
+	if v.endswith("k"):
+		return int(float(v[:-1]) * 1_000)
+	return int(v)
+
+
+def parse_bool(token) -> bool:
+	if isinstance(token, bool):
+		return token
+	v = str(token).strip().lower()
+	if v in _TRUE:
+		return True
+	if v in _FALSE:
+		return False
+	raise ValueError(f"not a boolean: {token!r}")
+
+
+def split_tokens(s: str, positional: Optional[str] = None) -> Dict[str, str]:
+	"""key=value pairs of command text (keys lower-cased); a bare word maps to `positional`."""
+	if s in TRIGGERS:
+		return {}
+	if positional and "=" not in s and "," not in s:
+		return {positional: s}
+	out = {}
+	for tok in s.split(","):
+		if "=" in tok:
+			k, v = tok.split("=", 1)
+			out[k.strip().lower()] = v.strip()
+	return out
+
+
+def payload_tokens(data) -> Dict[str, str]:
+	"""key=value pairs of a raw payload, without a schema."""
+	return split_tokens(payload_to_str(data))
+
+
+_KINDS = {
+	"str": str,
+	"lower": str.lower,
+	"int": int,
+	"float": float,
+	"secs": parse_secs,
+	"count": parse_count,
+	"bool": parse_bool,
+}
+
+
+class Field:
+	"""One command argument: its kind (see _KINDS) and optional choices/range."""
+	__slots__ = ("kind", "convert", "choices", "lo", "hi")
+
+	def __init__(self, kind: str = "str", choices: Optional[Iterable[str]] = None,
+				 lo: Optional[float] = None, hi: Optional[float] = None):
+		if kind not in _KINDS:
+			raise ValueError(f"unknown field kind {kind!r} (choose from {', '.join(_KINDS)})")
+		self.kind = kind
+		self.convert = _KINDS[kind]
+		self.choices = tuple(choices) if choices else None
+		self.lo = lo
+		self.hi = hi
+
+	def parse(self, raw: str):
+		val = self.convert(raw)
+		if isinstance(val, float) and not math.isfinite(val):
+			raise ValueError("not a finite number")
+		if self.choices is not None and val not in self.choices:
+			raise ValueError(f"not one of {', '.join(self.choices)}")
+		if self.lo is not None and val < self.lo:
+			raise ValueError(f"below {self.lo}")
+		if self.hi is not None and val > self.hi:
+			raise ValueError(f"above {self.hi}")
+		return val
+
+
+class Schema:
+	"""
+	Fields a topic accepts. `positional` names the field a bare-word payload
+	fills (e.g. "1080p" -> res). Unknown keys are kept in Command.tokens and
+	listed in Command.unknown; they are not errors.
+	"""
+	__slots__ = ("fields", "positional")
+
+	def __init__(self, fields: Dict[str, Field], positional: Optional[str] = None):
+		self.fields = dict(fields)
+		self.positional = positional
+
+
+class Command:
+	"""A parsed, validated command. Shared between threads; never mutate it."""
+	__slots__ = ("topic", "text", "tokens", "values", "errors", "unknown")
+
+	def __init__(self, topic: str, text: str, tokens: dict, values: dict,
+				 errors: Tuple[str, ...] = (), unknown: Tuple[str, ...] = ()):
+		self.topic = topic
+		self.text = text
+		self.tokens = FrozenDict(tokens)
+		self.values = FrozenDict(values)
+		self.errors = errors
+		self.unknown = unknown
+
+	@property
+	def is_trigger(self) -> bool:
+		return self.text in TRIGGERS
+
+	@property
+	def ok(self) -> bool:
+		return not self.errors
+
+	def get(self, name: str, default=None):
+		return self.values.get(name, default)
+
+	def __contains__(self, name: str) -> bool:
+		return name in self.values
+
+	def __getitem__(self, name: str):
+		return self.values[name]
+
+	def __repr__(self) -> str:
+		extra = f", errors={list(self.errors)}" if self.errors else ""
+		return f"Command(topic={self.topic!r}, values={dict(self.values)}{extra})"
+
+
+_schemas: Dict[str, Schema] = {}
+_GENERIC = Schema({})
+
+
+def register_schema(topic: str, schema: Schema) -> None:
+	_schemas[topic.strip().strip("/")] = schema
+	_parse_cached.cache_clear()
+
+
+def has_schema(topic: str) -> bool:
+	return topic in _schemas
+
+
+def parse(topic: str, data, schema: Optional[Schema] = None) -> Command:
+	"""Parse `data` (bytes/memoryview) for `topic`; never raises on bad input."""
+	schema = schema or _schemas.get(topic, _GENERIC)
+	text = payload_to_str(data)
+	tokens = split_tokens(text, schema.positional)
+	values, errors, unknown = {}, [], []
+	for key, raw in tokens.items():
+		field = schema.fields.get(key)
+		if field is None:
+			unknown.append(key)
+			continue
+		try:
+			values[key] = field.parse(raw)
+		except (ValueError, TypeError, OverflowError) as e:
+			errors.append(f"{key}={raw!r}: {e}")
+	return Command(topic, text, tokens, values, tuple(errors), tuple(unknown))
+
+
+@functools.lru_cache(maxsize=_CACHE_MAX)
+def _parse_cached(topic: str, raw: bytes) -> Command:
+	return parse(topic, raw)
+
+
+def parse_command(topic: str, data) -> Command:
+	"""Cached parse: repeats of a (topic, payload) return the same Command object."""
+	if data is not None and len(data) > _CACHE_PAYLOAD_MAX:
+		return parse(topic, data)
+	return _parse_cached(topic, bytes(data or b""))
+
+
+def attach_command(frame) -> Optional[Command]:
+	"""Parse a BmFrame's payload once (topics with a schema only) and set frame.command."""
+	if frame.command is None and frame.topic in _schemas:
+		frame.command = parse_command(frame.topic, frame.payload)
+	return frame.command
+
+
+def command_stats() -> dict:
+	info = _parse_cached.cache_info()
+	return {"hits": info.hits, "misses": info.misses, "size": info.currsize}
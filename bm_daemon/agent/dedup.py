@@ -0,0 +1,156 @@
+# bm_daemon/agent/dedup.py
+"""
+Duplicate-frame suppression for the agent.
+
+The BM bus can deliver the same command more than once (retries, multiple
+bridges). A frame is a duplicate if its key was seen less than `window_s`
+ago; every sighting, duplicate or not, moves the watermark so a stream of
+repeats stays suppressed. Keys are either
+
+  by_topic   : (node, topic)           - any repeat, ideal for triggers
+  by_payload : (node, topic, hash)     - only an exact repeat
+
+Entries live in a dict and expire through a min-heap of deadlines (lazy
+deletion), so insert/lookup are O(1) and expiry is O(log n) per evicted
+entry instead of a periodic scan of the whole table. Rules come from YAML:
+
+  dedup:
+    default: {window_s: 0.10, mode: by_payload}
+    max_entries: 4096
+    topics:
+      camera/capture/video:
+        window_s: 0.10
+        mode: by_topic
+        extend_by: dur           # window = max(window_s, dur + extend_margin_s)
+        extend_default_s: 3.0    # dur when the payload has none
+        extend_margin_s: 5.0
+"""
+import hashlib
+import heapq
+import logging
+import time
+from typing import Optional
+
+from bm_daemon.agent.command import payload_to_str, parse_secs, payload_tokens
+
+logger = logging.getLogger("AGENT")
+
+MODES = ("by_topic", "by_payload")
+
+DEFAULT_RULE = {"window_s": 0.10, "mode": "by_payload"}
+# Used when the YAML has no dedup.topics section (the historical rules)
+DEFAULT_TOPIC_RULES = {
+	"camera/capture/video": {"window_s": 0.10, "mode": "by_topic",
+							 "extend_by": "dur", "extend_default_s": 3.0, "extend_margin_s": 5.0},
+	"camera/capture/image": {"window_s": 0.10, "mode": "by_topic"},
+}
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class Rule:
+	__slots__ = ("window_s", "mode", "extend_by", "extend_default_s", "extend_margin_s")
+
+	def __init__(self, window_s=0.10, mode="by_payload", extend_by=None,
+				 extend_default_s=0.0, extend_margin_s=0.0):
+		if mode not in MODES:
+			raise ValueError(f"unknown dedup mode {mode!r} (choose from {', '.join(MODES)})")
+		self.window_s = float(window_s)
+		self.mode = mode
+		self.extend_by = str(extend_by).lower() if extend_by else None
+		self.extend_default_s = float(extend_default_s)
+		self.extend_margin_s = float(extend_margin_s)
+
+	def window(self, data, tokens: Optional[dict]) -> float:
+		if not self.extend_by:
+			return self.window_s
+		if tokens is None:
+			tokens = payload_tokens(data)
+		dur = self.extend_default_s
+		if self.extend_by in tokens:
+			try:
+				dur = parse_secs(tokens[self.extend_by])
+			except ValueError:
+				pass
+		return max(self.window_s, dur + self.extend_margin_s)
+
+
+class Dedup:
+	def __init__(self, topic_rules: Optional[dict] = None, default_rule: Optional[dict] = None,
+				 max_entries: int = DEFAULT_MAX_ENTRIES, clock=time.monotonic):
+		self.default = Rule(**{**DEFAULT_RULE, **(default_rule or {})})
+		self.rules = {t: Rule(**{**DEFAULT_RULE, **(r or {})}) for t, r in (topic_rules or {}).items()}
+		self.max_entries = max(1, int(max_entries))
+		self._clock = clock
+		self._seen = {}     # key -> (last_seen, window, expires_at)
+		self._heap = []     # (expires_at, seq, key); stale when _seen[key] moved on
+		self._seq = 0
+		self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+	@classmethod
+	def from_config(cls, cfg: dict) -> "Dedup":
+		dc = cfg.get("dedup") or {}
+		topics = dc.get("topics")
+		return cls(topic_rules=DEFAULT_TOPIC_RULES if topics is None else topics,
+				   default_rule=dc.get("default"),
+				   max_entries=dc.get("max_entries", DEFAULT_MAX_ENTRIES))
+
+	def _key(self, rule: Rule, node_id: int, topic: str, data):
+		if rule.mode == "by_topic":
+			return (node_id, topic)
+		digest = hashlib.blake2b(data, digest_size=8).digest() if data else b""
+		return (node_id, topic, digest)
+
+	def _expire(self, now: float) -> None:
+		heap, seen = self._heap, self._seen
+		while heap and heap[0][0] <= now:
+			expires, _seq, key = heapq.heappop(heap)
+			entry = seen.get(key)
+			if entry is not None and entry[2] == expires:
+				del seen[key]
+				self.stats["expired"] += 1
+		while len(seen) > self.max_entries and heap:
+			expires, _seq, key = heapq.heappop(heap)
+			entry = seen.get(key)
+			if entry is not None and entry[2] == expires:
+				del seen[key]
+				self.stats["evicted"] += 1
+		# repeats leave stale heap entries behind; rebuild when they dominate
+		if len(heap) > 2 * len(seen) + 64:
+			self._heap = [(e[2], i, k) for i, (k, e) in enumerate(seen.items())]
+			heapq.heapify(self._heap)
+			self._seq = len(self._heap)
+
+	def is_dup(self, node_id: int, topic: str, data, tokens: Optional[dict] = None) -> bool:
+		"""
+		True if this frame repeats one inside its window. `tokens` are the
+		payload's parsed key=value pairs if the caller already has them.
+		"""
+		now = self._clock()
+		self._expire(now)
+		rule = self.rules.get(topic, self.default)
+		win = rule.window(data, tokens)
+		key = self._key(rule, node_id, topic, data)
+
+		prev = self._seen.get(key)
+		hit = prev is not None and (now - prev[0]) < prev[1]
+
+		# Always update the watermark so a stream of repeats stays suppressed
+		expires = now + win
+		self._seen[key] = (now, win, expires)
+		self._seq += 1
+		heapq.heappush(self._heap, (expires, self._seq, key))
+
+		if hit:
+			self.stats["hits"] += 1
+			delta = now - prev[0]
+			if topic == "camera/capture/image":
+				logger.warning("DEDUP drop topic='%s' window=%.1fs Δ=%.2fs payload='%s'",
+							   topic, win, delta, payload_to_str(data))
+			else:
+				logger.warning("DEDUP drop topic='%s' window=%.1fs", topic, win)
+			return True
+		self.stats["misses"] += 1
+		return False
+
+	def snapshot(self) -> dict:
+		return {**self.stats, "size": len(self._seen), "heap": len(self._heap)}
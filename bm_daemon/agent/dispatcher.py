@@ -73,6 +73,8 @@
 
 # bm_daemon/agent/dispatcher.py
 from typing import Callable, Dict, Iterable, Any, Optional
+import asyncio
+import inspect
 import logging
 
 logger = logging.getLogger("DISPATCH")
@@ -117,11 +119,37 @@ def build_dispatch(cfg: dict) -> Dispatch:
 	else:
 		logger.warning("RTC topic '%s' present but no core handler was imported", rtc_topic)
 
+	# Receiver feedback for Spotter transfers: NACKs (selective re-send), done, ACK credits
+	nack_topic = topics_cfg.get("tx_nack")
+	if nack_topic:
+		from bm_daemon.agent.command import register_schema
+		from bm_daemon.agent.handlers import tx_feedback
+		register_schema(str(nack_topic), tx_feedback.command_schema)
+		dispatch[str(nack_topic)] = tx_feedback.handle
+		logger.info("Registered core topic: %s -> tx_feedback.handle", nack_topic)
+
 	# Add other core topics here if you have them in the future
 	# e.g. status, ping, etc.
 
 	return dispatch
 
+def is_async_handler(handler: Callable) -> bool:
+	"""True for `async def` handlers (run on the event loop instead of an executor)."""
+	return inspect.iscoroutinefunction(handler)
+
+async def run_handler_async(handler: Callable, node_id: int, topic_str: str, data: bytes,
+							ctx: dict, executor=None) -> None:
+	"""
+	Run one handler under the asyncio runtime. Coroutine handlers are awaited on
+	the loop; plain (blocking) handlers such as camera capture/encode/transmit are
+	pushed to `executor` so the bus keeps draining while they work.
+	"""
+	if is_async_handler(handler):
+		await handler(node_id, topic_str, data, ctx)
+	else:
+		loop = asyncio.get_running_loop()
+		await loop.run_in_executor(executor, handler, node_id, topic_str, data, ctx)
+
 # Lifecycle hooks for core handlers (no-op safe defaults).
 def init_handlers(handlers: Optional[Iterable[Any]] = None) -> Optional[dict]:
 	"""
@@ -3,17 +3,9 @@
 #!/usr/bin/env python3
 import logging
 
-logger = logging.getLogger("HELLO")
+from bm_daemon.agent.command import payload_to_str
 
-def _payload_to_str(data: bytes) -> str:
-    """Decode BM payload to a clean string (strip 1B type if present, trim quotes)."""
-    if not data:
-        return ""
-    body = data[1:] if data and data[0] < 0x20 else data  # BM sometimes prefixes a type byte
-    s = body.decode("utf-8", "ignore").strip()
-    if len(s) >= 2 and s[0] == s[-1] and s[0] in ("'", '"'):
-        s = s[1:-1]
-    return s
+logger = logging.getLogger("HELLO")
 
 def _ack_topic(ctx: dict, topic_in: str) -> str:
     """Ack topic from YAML if defined (topics.hello_ack), else '<topic>/ack'."""
@@ -61,7 +53,7 @@ def handle(node_id: int, topic_str: str, data: bytes, ctx: dict) -> None:
     """
     Receive 'demo/hello', print an ACK line to the Bridge console, and publish an ACK frame.
     """
-    txt = _payload_to_str(data)
+    txt = payload_to_str(data)
     logger.info("HELLO rx node=%s topic=%s payload=%r", hex(node_id), topic_str, txt)
 
     # Show something immediately on the Bridge console (non-BM side)
@@ -0,0 +1,93 @@
+# bm_daemon/agent/handlers/tx_feedback.py
+"""
+Transfer feedback from the shore-side receiver on topics.tx_nack (e.g.
+camera/tx/nack), one command per message:
+
+  file=<name>,missing=7;19;30-35   re-send just those chunks of a file
+  id=0x1a2b,missing=...            same, by binary-framing file id
+  file=<name>,done=1               the file arrived complete
+  ack=<n>                          credit n chunks to the pacer (acks: true profiles)
+
+Files are looked up in the TX queue journal (transport.spotter.queue), whose
+finished jobs keep their chunks; the re-send is queued behind the transfer
+in progress. spotter_rx.Reassembler.nack() builds the missing= payload.
+Replies go to the status topic:
+
+  OK op=nack file=<name> resend=<n> nacks=<k>
+  OK op=nack file=<name> done=1
+  ERR op=nack reason=<...>
+"""
+import logging
+from typing import Optional
+
+from bm_daemon.agent.command import Field, Schema, parse
+from bm_daemon.common.config import get_status_topic
+from bm_daemon.transport import pacing
+from bm_daemon.transport.spotter import parse_indices
+
+log = logging.getLogger("TXQ")
+
+command_schema = Schema({
+	"file": Field("str"),
+	"id": Field("str"),
+	"missing": Field("str"),
+	"done": Field("bool"),
+	"ack": Field("int", lo=1),
+})
+
+
+def _reply(ctx: dict, kind: str, **fields) -> None:
+	line = " ".join([kind, "op=nack"] + [f"{k}={v}" for k, v in fields.items()])
+	log.info("[TXQ] %s", line)
+	bm = (ctx or {}).get("bm")
+	if bm is None:
+		return
+	try:
+		from bm_daemon.agent.publish import pub_text
+		pub_text(bm, get_status_topic(), line)
+	except Exception as e:
+		log.warning("[TXQ] status publish failed: %r", e)
+
+
+def _file_id(text: Optional[str]) -> Optional[int]:
+	return None if text is None else int(text, 0) & 0xFFFF
+
+
+def handle(node_id: int, topic_str: str, data: bytes, ctx: dict) -> None:
+	cmd = parse(topic_str, data, command_schema)
+	if cmd.errors:
+		return _reply(ctx, "ERR", reason="bad args")
+
+	if "ack" in cmd:
+		credited = pacing.notify_ack(cmd["ack"])
+		log.debug("[TXQ] ACK x%d from %s (%s)", cmd["ack"], hex(node_id),
+				  "credited" if credited else "no transfer in progress")
+		if "file" not in cmd and "id" not in cmd:
+			return   # plain credits are frequent; no reply
+
+	if "file" not in cmd and "id" not in cmd:
+		return _reply(ctx, "ERR", reason="no file")
+	txq = (ctx or {}).get("tx_queue")
+	if txq is None:
+		return _reply(ctx, "ERR", reason="no tx queue")
+	try:
+		file_id = _file_id(cmd.get("id"))
+	except ValueError:
+		return _reply(ctx, "ERR", reason="bad id")
+	job = txq.find(label=cmd.get("file"), file_id=file_id)
+	if job is None:
+		return _reply(ctx, "ERR", reason="unknown file", file=cmd.get("file") or cmd.get("id"))
+
+	if cmd.get("done"):
+		txq.confirm(job["id"])
+		return _reply(ctx, "OK", file=job["label"], done=1)
+	if "missing" not in cmd:
+		return _reply(ctx, "ERR", reason="nothing to do", file=job["label"])
+	try:
+		indices = parse_indices(cmd["missing"], limit=job["total"])
+	except ValueError:
+		return _reply(ctx, "ERR", reason="bad missing", file=job["label"])
+	if not job["spooled"]:
+		return _reply(ctx, "ERR", reason="chunks released", file=job["label"])
+	n = txq.resend(job["id"], indices)
+	_reply(ctx, "OK", file=job["label"], resend=n, nacks=job["nacks"] + (1 if n else 0))
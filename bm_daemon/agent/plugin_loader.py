@@ -49,21 +49,48 @@
 # 			obj = import_module(spec)
 # 		dispatch.update(_as_callable_table(obj))
 # 	return dispatch
+import inspect
+import logging
 from importlib import import_module
 from typing import Dict, Callable, Any
 
-def _wrap_handle(handle):
+from bm_daemon.agent.command import parse_command, register_schema
+
+# plugin objects in load order, for their optional init(ctx)/cleanup(ctx) hooks
+_loaded: list = []
+
+def _msg(node, topic_str, data, with_cmd):
+	msg = {"node": node, "topic": topic_str, "data": data}
+	if with_cmd:
+		# cache hit: the agent parsed this payload when the frame arrived
+		msg["cmd"] = parse_command(topic_str, data)
+	return msg
+
+def _wrap_handle(handle, worker_pool=None, with_cmd=False):
+	# Keep coroutine handlers awaitable so the asyncio runtime can run them on the loop
+	if inspect.iscoroutinefunction(handle):
+		async def _afn(node, topic_str, data, ctx):
+			await handle(_msg(node, topic_str, data, with_cmd), ctx=ctx)
+		_afn.worker_pool = worker_pool
+		return _afn
+
 	def _fn(node, topic_str, data, ctx):
-		handle({"node": node, "topic": topic_str, "data": data}, ctx=ctx)
+		handle(_msg(node, topic_str, data, with_cmd), ctx=ctx)
+	_fn.worker_pool = worker_pool  # optional plugin attribute, see workqueue.WorkDispatcher
 	return _fn
 
 def _as_callable_table(obj: Any) -> Dict[str, Callable]:
 	table: Dict[str, Callable] = {}
 	topics = getattr(obj, "topics", None)
 	handle = getattr(obj, "handle", None)
+	# optional `command_schema`: msg["cmd"] then carries the parsed Command
+	schema = getattr(obj, "command_schema", None)
 	if topics and callable(handle):
 		for t in topics:
-			table[str(t)] = _wrap_handle(handle)
+			if schema is not None:
+				register_schema(str(t), schema)
+			table[str(t)] = _wrap_handle(handle, getattr(obj, "worker_pool", None),
+										 with_cmd=schema is not None)
 	return table
 
 def load_plugin_dispatch_from_config(cfg: dict) -> Dict[str, Callable]:
@@ -78,4 +105,25 @@ def load_plugin_dispatch_from_config(cfg: dict) -> Dict[str, Callable]:
 		else:
 			obj = import_module(spec)  # module exposes topics + handle
 		dispatch.update(_as_callable_table(obj))
+		_loaded.append(obj)
 	return dispatch
+
+def init_plugins(ctx: dict) -> None:
+	"""Call each loaded plugin's optional init(ctx) once the bus is open."""
+	for obj in _loaded:
+		fn = getattr(obj, "init", None)
+		if callable(fn):
+			try:
+				fn(ctx)
+			except Exception:
+				logging.getLogger("AGENT").exception("plugin init failed: %r", obj)
+
+def cleanup_plugins(ctx: dict) -> None:
+	"""Call each loaded plugin's optional cleanup(ctx), in reverse load order."""
+	for obj in reversed(_loaded):
+		fn = getattr(obj, "cleanup", None)
+		if callable(fn):
+			try:
+				fn(ctx)
+			except Exception:
+				logging.getLogger("AGENT").exception("plugin cleanup failed: %r", obj)
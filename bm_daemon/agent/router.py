@@ -0,0 +1,100 @@
+# bm_daemon/agent/router.py
+"""
+Topic -> handler routing with exact, wildcard and prefix patterns.
+
+  camera/capture/image : exact topic (dict lookup)
+  camera/*             : exactly one more level ("camera/status", not "camera/a/b")
+  camera/**            : any depth below camera/ (prefix subscription)
+
+Exact patterns live in a dict; wildcard patterns in a segment trie. A topic's
+resolved handler chain is memoized, so a steady stream of frames costs one
+dict lookup each regardless of how many patterns are registered.
+"""
+import logging
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger("ROUTER")
+
+_ONE = "*"
+_ANY = "**"
+_CACHE_MAX = 1024
+
+
+def is_pattern(topic: str) -> bool:
+	return any(seg in (_ONE, _ANY) for seg in topic.split("/"))
+
+
+class _Node:
+	__slots__ = ("children", "handlers")
+
+	def __init__(self):
+		self.children: Dict[str, "_Node"] = {}
+		self.handlers: List[Tuple[int, int, Callable]] = []   # (-specificity, seq, handler)
+
+
+class TopicRouter:
+	def __init__(self):
+		self._exact: Dict[str, List[Callable]] = {}
+		self._root = _Node()
+		self._wildcards = 0
+		self._cache: Dict[str, Tuple[Callable, ...]] = {}
+		self.patterns: List[str] = []
+
+	def add(self, pattern: str, handler: Callable) -> None:
+		pattern = pattern.strip().strip("/")
+		segs = pattern.split("/")
+		if _ANY in segs[:-1]:
+			raise ValueError(f"'{_ANY}' is only allowed as the last level: {pattern!r}")
+		self.patterns.append(pattern)
+		if not is_pattern(pattern):
+			self._exact.setdefault(pattern, []).append(handler)
+		else:
+			node = self._root
+			for seg in segs:
+				node = node.children.setdefault(seg, _Node())
+			# more literal levels = more specific; ties keep registration order
+			specificity = sum(1 for s in segs if s not in (_ONE, _ANY))
+			node.handlers.append((-specificity, len(self.patterns), handler))
+			self._wildcards += 1
+		self._cache.clear()
+
+	def _walk(self, node: _Node, segs: List[str], i: int, out: list) -> None:
+		if _ANY in node.children and i < len(segs):
+			out.extend(node.children[_ANY].handlers)
+		if i == len(segs):
+			out.extend(node.handlers)
+			return
+		child = node.children.get(segs[i])
+		if child is not None:
+			self._walk(child, segs, i + 1, out)
+		child = node.children.get(_ONE)
+		if child is not None:
+			self._walk(child, segs, i + 1, out)
+
+	def _resolve(self, topic: str) -> Tuple[Callable, ...]:
+		chain = list(self._exact.get(topic, ()))
+		if self._wildcards:
+			found = []
+			self._walk(self._root, topic.split("/"), 0, found)
+			found.sort(key=lambda e: e[:2])
+			chain.extend(h for _s, _seq, h in found)
+		# one call per handler even if several patterns map to it
+		seen, out = set(), []
+		for h in chain:
+			if id(h) not in seen:
+				seen.add(id(h))
+				out.append(h)
+		return tuple(out)
+
+	def match(self, topic: str) -> Tuple[Callable, ...]:
+		"""Handlers for `topic`, most specific first (exact, then wildcards)."""
+		chain = self._cache.get(topic)
+		if chain is None:
+			chain = self._resolve(topic)
+			if len(self._cache) >= _CACHE_MAX:
+				self._cache.clear()
+			self._cache[topic] = chain
+		return chain
+
+	def __len__(self) -> int:
+		return len(self.patterns)
@@ -180,13 +180,22 @@
 # if __name__ == "__main__":
 # 	sys.exit(main())
 #!/usr/bin/env python3
+import asyncio
 import logging
-import signal, sys, time, hashlib
+import signal, sys
+from concurrent.futures import ThreadPoolExecutor
 from bm_daemon.common.logging_config import setup_logging
-from bm_daemon.common.config import load_config
-from bm_daemon.agent.bus import open_bus, subscribe_many, loop
-from bm_daemon.agent.dispatcher import build_dispatch, init_handlers, cleanup_handlers
-from bm_daemon.agent.plugin_loader import load_plugin_dispatch_from_config
+from bm_daemon.common.config import load_config, config_stats, invalidate as invalidate_config
+from bm_daemon.agent.bus import open_bus, subscribe_frames, loop, loop_async
+from bm_daemon.agent.dispatcher import (
+	build_dispatch, init_handlers, cleanup_handlers, is_async_handler, run_handler_async,
+)
+from bm_daemon.agent.command import attach_command, command_stats
+from bm_daemon.agent.dedup import Dedup
+from bm_daemon.agent.router import TopicRouter
+from bm_daemon.agent.workqueue import WorkDispatcher
+from bm_daemon.agent.plugin_loader import load_plugin_dispatch_from_config, init_plugins, cleanup_plugins
+from bm_daemon.transport.tx_queue import open_tx_queue
 
 # --------- graceful shutdown ---------
 _running = True
@@ -195,19 +204,9 @@ def _term(*_):
 	_running = False
 signal.signal(signal.SIGTERM, _term)
 signal.signal(signal.SIGINT, _term)
-
-# --------- de-dupe config ---------
-DEDUP_DEFAULT_WINDOW_S = 0.10
-# mode:
-#   - "by_payload": drop only exact repeat of same node/topic/payload
-#   - "by_topic":   drop any repeat of same node/topic regardless of payload (ideal for triggers)
-DEDUP_RULES = {
-	"camera/capture/video": {"window": 0.10,  "mode": "by_topic"},
-	"camera/capture/image": {"window": 0.10,  "mode": "by_topic"},  # give TX time to finish
-}
-
-_recent = {}                # key -> (last_seen_monotonic, ttl)
-_RECENT_SOFT_MAX = 4096     # prune threshold
+# SIGHUP: re-read config.yaml on next access (the snapshot is otherwise cached)
+if hasattr(signal, "SIGHUP"):
+	signal.signal(signal.SIGHUP, lambda *_: invalidate_config())
 
 # --------- utils ---------
 def _norm_topic(x):
@@ -222,91 +221,67 @@ def _norm_topic(x):
 		return s[2:-1]
 	return s
 
-def _payload_hash(data: bytes) -> bytes:
-	return hashlib.blake2b(data, digest_size=8).digest() if data else b""
-
-def _dedupe_key(node_id: int, topic_str: str, data: bytes, mode: str):
-	if mode == "by_topic":
-		return ("topic", node_id, topic_str)
-	return ("payload", node_id, topic_str, _payload_hash(data))
-
-def _rule_for(topic_str: str):
-	return DEDUP_RULES.get(topic_str, {"window": DEDUP_DEFAULT_WINDOW_S, "mode": "by_payload"})
-
-def _payload_to_str(data: bytes) -> str:
-	if not data:
-		return ""
-	body = data[1:] if data and data[0] < 0x20 else data  # strip 1B BM type if present
-	s = body.decode("utf-8", "ignore").strip()
-	if len(s) >= 2 and s[0] == s[-1] and s[0] in ("'", '"'):
-		s = s[1:-1]
-	return s
-
-def _parse_secs(token: str) -> float:
-	v = token.lower()
-	if v.endswith("ms"):
-		return float(v[:-2]) / 1000.0
-	if v.endswith("s"):
-		return float(v[:-1])
-	return float(v)
-
-def _dynamic_window(topic_str: str, data: bytes, base_window: float) -> float:
-	# Expand the de-dupe window based on payload for certain topics.
-	if topic_str == "camera/capture/video":
-		s = _payload_to_str(data)
-		dur = None
-		if s and s not in ("1", "go", "trigger"):
-			for tok in s.split(","):
-				if "=" in tok:
-					k, v = tok.split("=", 1)
-					if k.strip().lower() == "dur":
-						try:
-							dur = _parse_secs(v.strip())
-						except Exception:
-							pass
-		if dur is None:
-			dur = 3.0  # default video duration in your handler
-		return max(base_window, float(dur) + 5.0)  # safety margin after recording ends
-	return base_window
-
-def _prune_recent(now: float):
-	if len(_recent) <= _RECENT_SOFT_MAX:
-		return
-	for k, (seen, ttl) in list(_recent.items()):
-		if now - seen >= ttl:
-			_recent.pop(k, None)
+# --------- load config (no-arg loader) ---------
+def _load_cfg():
+	return load_config()
 
-def _is_dup(node_id, topic_str, data: bytes) -> bool:
-	now = time.monotonic()
-	rule = _rule_for(topic_str)
-	base_win = float(rule.get("window", DEDUP_DEFAULT_WINDOW_S))
-	mode = rule.get("mode", "by_payload")
+def _runtime(cfg) -> str:
+	"""agent.runtime: 'sync' (default, single thread) or 'asyncio'."""
+	return str((cfg.get("agent") or {}).get("runtime", "sync")).strip().lower()
 
-	win = _dynamic_window(topic_str, data, base_win)
-	key = _dedupe_key(node_id, topic_str, data, mode)
+def _invoke_handler(handler, node_id, topic_str, data, ctx):
+	try:
+		handler(node_id, topic_str, data, ctx)
+	except Exception as e:
+		logging.getLogger("AGENT").exception("HANDLER error: %r", e)
 
-	prev = _recent.get(key)
-	hit = (prev is not None) and ((now - prev[0]) < prev[1])
+def _submit(work, handler, node_id, topic_str, data, ctx):
+	"""Queue a blocking handler on the worker stage (keyed for coalescing by node+topic)."""
+	work.submit(topic_str, (node_id, topic_str), _invoke_handler,
+				handler, node_id, topic_str, data, ctx,
+				pool_hint=getattr(handler, "worker_pool", None))
 
-	# Always update the watermark so a stream of repeats stays suppressed
-	_recent[key] = (now, win)
+# --------- asyncio runtime ---------
+async def _amain(bm, topics, accept, ctx, cfg, max_latency_s: float, work=None, heartbeat=None):
+	"""
+	Event-loop runtime: the bus is drained on the loop thread, async handlers
+	run as tasks and blocking handlers (camera, encode, Spotter TX) run in a
+	thread pool, so long captures/transmits no longer stall the UART.
+	With the worker stage enabled, blocking handlers go to its queues instead.
+	"""
+	log = logging.getLogger("AGENT")
+	agent_cfg = cfg.get("agent") or {}
+	ev_loop = asyncio.get_running_loop()
+	workers = int(agent_cfg.get("executor_workers", 4))
+	executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bm-handler")
+	ctx["loop"] = ev_loop
+	ctx["executor"] = executor
+	tasks = set()
 
-	if hit:
-		lg = logging.getLogger("AGENT")
-		delta = now - prev[0]
-		if topic_str == "camera/capture/image":
-			lg.warning("DEDUP drop topic='%s' window=%.1fs Δ=%.2fs payload='%s'",
-					   topic_str, win, delta, _payload_to_str(data))
-		else:
-			lg.warning("DEDUP drop topic='%s' window=%.1fs", topic_str, win)
-		return True
+	async def _run(handler, node_id, topic_str, data):
+		try:
+			await run_handler_async(handler, node_id, topic_str, data, ctx, executor)
+		except Exception as e:
+			log.exception("HANDLER error: %r", e)
 
-	_prune_recent(now)
-	return False
+	def cb(frame):
+		for handler in accept(frame):
+			if work is not None and not is_async_handler(handler):
+				_submit(work, handler, frame.node_id, frame.topic, frame.payload, ctx)
+			else:
+				task = ev_loop.create_task(_run(handler, frame.node_id, frame.topic, frame.payload))
+				tasks.add(task)
+				task.add_done_callback(tasks.discard)
 
-# --------- load config (no-arg loader) ---------
-def _load_cfg():
-	return load_config()
+	subscribe_frames(bm, topics, cb)
+	try:
+		log.info("RUN bm-agent running (asyncio, workers=%d)…", workers)
+		await loop_async(bm, lambda: not _running, max_latency_s=max_latency_s,
+						 heartbeat=heartbeat)
+	finally:
+		for task in tasks:
+			task.cancel()
+		executor.shutdown(wait=False, cancel_futures=True)
 
 def main():
 	cfg = _load_cfg()
@@ -334,41 +309,100 @@ def main():
 
 	# ensure unique topics before subscribe
 	topics = sorted(set(_norm_topic(k) for k in raw_dispatch.keys()))
-	dispatch = {t: raw_dispatch[t] for t in topics if t in raw_dispatch}
+	# exact topics and "camera/*" / "camera/**" patterns; chains are memoized per topic
+	handlers = TopicRouter()
+	for k, handler in raw_dispatch.items():
+		handlers.add(_norm_topic(k), handler)
 
 	log.info("CONFIG loaded")
 	log.info("DISPATCH topics=%s", topics)
 
-	def cb(node_id, type_, version, topic_len, topic, data_len, data: bytes):
-		topic_str = _norm_topic(topic)
+	# Duplicate suppression; per-topic rules from the YAML `dedup:` section
+	dedup = Dedup.from_config(cfg)
+	ctx["dedup"] = dedup
 
+	def _accept(frame):
+		"""Dedup + log one BmFrame; return its handler chain (empty to drop it)."""
+		# Parse the command once (schema topics only); dedup and handlers share it
+		cmd = attach_command(frame)
 		# Drop duplicates BEFORE logging/handling
-		if _is_dup(node_id, topic_str, data):
-			return
+		if dedup.is_dup(frame.node_id, frame.topic, frame.payload,
+						tokens=cmd.tokens if cmd is not None else None):
+			return ()
+		if cmd is not None and cmd.errors:
+			log.warning("CMD topic='%s' bad args: %s", frame.topic, "; ".join(cmd.errors))
 
 		log.info("PUB node=%s type=%s ver=%s topic='%s' len=%s",
-				 hex(node_id), type_, version, topic_str, data_len)
+				 hex(frame.node_id), frame.type, frame.version, frame.topic, len(frame.payload))
 
-		handler = dispatch.get(topic_str)
-		if handler:
-			try:
-				handler(node_id, topic_str, data, ctx)
-			except Exception as e:
-				log.exception("HANDLER error: %r", e)
-		else:
-			log.warning("No handler for topic '%s' (known=%s)", topic_str, list(dispatch.keys()))
+		chain = handlers.match(frame.topic)
+		if not chain:
+			log.warning("No handler for topic '%s' (known=%s)", frame.topic, handlers.patterns)
+		return chain
+
+	# Optional worker stage: per-topic bounded queues + pools (workers: in YAML)
+	work = None
+	workers_cfg = cfg.get("workers") or {}
+	if workers_cfg.get("enabled", False):
+		work = WorkDispatcher(workers_cfg)
+		work.start()
+		ctx["work"] = work
+
+	def cb(frame):
+		# frame.topic is decoded + interned and frame.payload is a memoryview:
+		# dedup, routing and handlers all share them without copies
+		for handler in _accept(frame):
+			if work is not None:
+				_submit(work, handler, frame.node_id, frame.topic, frame.payload, ctx)
+			else:
+				_invoke_handler(handler, frame.node_id, frame.topic, frame.payload, ctx)
 
 	# Open bus and stash in ctx
-	bm = open_bus(cfg["uart_device"], cfg["baudrate"])
+	bm = open_bus(cfg["uart_device"], cfg["baudrate"],
+				  fake_cfg=cfg.get("fake_bm"), topics_cfg=cfg.get("topics"))
 	ctx["bm"] = bm
 
-	# Subscribe and enter the loop
-	subscribe_many(bm, topics, cb)
+	# Durable Spotter TX queue: resumes unfinished transfers from paths.buffer
+	tx_queue = open_tx_queue(cfg)
+	if tx_queue is not None:
+		tx_queue.start(bm)
+		ctx["tx_queue"] = tx_queue
+	# plugin start-up hooks (e.g. arming the camera's pre-roll ring)
+	init_plugins(ctx)
+	bus_cfg = cfg.get("bus") or {}
+	max_latency_s = float(bus_cfg.get("max_latency_s", 0.5))
+
+	def _heartbeat():
+		if work is not None:
+			work.log_stats()
+		if log.isEnabledFor(logging.DEBUG):
+			cs = config_stats()
+			log.debug("[CFG] parses=%d hits=%d parse=%.3fs avoided=%.3fs",
+					  cs["parses"], cs["hits"], cs["parse_s"], cs["avoided_s"])
+			ds = dedup.snapshot()
+			log.debug("[DEDUP] hits=%d misses=%d expired=%d evicted=%d size=%d",
+					  ds["hits"], ds["misses"], ds["expired"], ds["evicted"], ds["size"])
+			ms = command_stats()
+			log.debug("[CMD] parses=%d hits=%d cached=%d", ms["misses"], ms["hits"], ms["size"])
+
 	try:
-		log.info("RUN bm-agent running…")
-		loop(bm, lambda: not _running)
+		if _runtime(cfg) == "asyncio":
+			asyncio.run(_amain(bm, topics, _accept, ctx, cfg, max_latency_s, work, _heartbeat))
+		else:
+			# Subscribe and enter the loop
+			subscribe_frames(bm, topics, cb)
+			log.info("RUN bm-agent running…")
+			loop(bm, lambda: not _running, max_latency_s=max_latency_s,
+				 heartbeat=_heartbeat)
 	finally:
+		if work is not None:
+			work.stop()
+		if tx_queue is not None:
+			tx_queue.stop()
+		cleanup_plugins(ctx)
 		cleanup_handlers(ctx)
+		if getattr(bm, "peer", None) is not None:
+			bm.peer.stop()
 
 if __name__ == "__main__":
 	sys.exit(main())
@@ -0,0 +1,208 @@
+# bm_daemon/agent/workqueue.py
+"""
+Dispatcher stage between the serial callback and the handlers.
+
+Each topic gets a bounded queue; each queue is served by a named worker pool
+(e.g. "camera" with 1 worker, "default" shared by clock/hello/test). The bus
+thread only enqueues, so a 30 s video job never holds up an RTC frame.
+
+Backpressure policy per topic when its queue is full:
+  drop_oldest : evict the oldest pending job, keep the new one
+  drop_newest : reject the new job
+  coalesce    : replace a pending job with the same key (node, topic) in place;
+                if none is pending and the queue is full, behave like drop_oldest
+"""
+import collections
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("QUEUE")
+
+POLICIES = ("drop_oldest", "drop_newest", "coalesce")
+
+DEFAULT_POOL = "default"
+DEFAULT_MAXSIZE = 8
+DEFAULT_POLICY = "drop_oldest"
+
+
+class TopicQueue:
+	"""Bounded FIFO of pending jobs for one topic, plus its counters."""
+
+	def __init__(self, topic: str, maxsize: int, policy: str):
+		if policy not in POLICIES:
+			raise ValueError(f"unknown queue policy {policy!r} for '{topic}' (choose from {', '.join(POLICIES)})")
+		self.topic = topic
+		self.maxsize = max(1, int(maxsize))
+		self.policy = policy
+		self.items = collections.deque()   # (key, job, enqueued_monotonic)
+		self.stats = {"enqueued": 0, "done": 0, "dropped": 0, "coalesced": 0,
+					  "max_depth": 0, "max_wait_s": 0.0}
+
+	def snapshot(self) -> dict:
+		return {"depth": len(self.items), "maxsize": self.maxsize, "policy": self.policy, **self.stats}
+
+
+class WorkerPool:
+	"""N worker threads serving a set of TopicQueues round-robin."""
+
+	def __init__(self, name: str, workers: int):
+		self.name = name
+		self.workers = max(1, int(workers))
+		self._cond = threading.Condition()
+		self._queues = []
+		self._rr = 0
+		self._threads = []
+		self._stopping = False
+
+	def add_queue(self, q: TopicQueue) -> None:
+		with self._cond:
+			self._queues.append(q)
+
+	def offer(self, q: TopicQueue, key, job: Callable[[], Any]) -> bool:
+		"""Enqueue `job` on `q` honoring its policy. Returns False if it was dropped."""
+		now = time.monotonic()
+		with self._cond:
+			if q.policy == "coalesce":
+				for i, (k, _job, t_enq) in enumerate(q.items):
+					if k == key:
+						q.items[i] = (key, job, t_enq)
+						q.stats["coalesced"] += 1
+						return True
+			if len(q.items) >= q.maxsize:
+				q.stats["dropped"] += 1
+				if q.policy == "drop_newest":
+					return False
+				q.items.popleft()
+			q.items.append((key, job, now))
+			q.stats["enqueued"] += 1
+			q.stats["max_depth"] = max(q.stats["max_depth"], len(q.items))
+			self._cond.notify()
+			return True
+
+	def _next_locked(self):
+		n = len(self._queues)
+		for i in range(n):
+			q = self._queues[(self._rr + i) % n]
+			if q.items:
+				self._rr = (self._rr + i + 1) % n
+				_key, job, t_enq = q.items.popleft()
+				q.stats["max_wait_s"] = max(q.stats["max_wait_s"], time.monotonic() - t_enq)
+				return q, job
+		return None, None
+
+	def _worker(self):
+		while True:
+			with self._cond:
+				q, job = self._next_locked()
+				while job is None and not self._stopping:
+					self._cond.wait()
+					q, job = self._next_locked()
+				if job is None:
+					return
+			try:
+				job()
+			except Exception as e:
+				logger.exception("[%s] job for '%s' failed: %r", self.name, q.topic, e)
+			finally:
+				with self._cond:
+					q.stats["done"] += 1
+
+	def start(self) -> None:
+		for i in range(self.workers):
+			th = threading.Thread(target=self._worker, name=f"bm-{self.name}-{i}", daemon=True)
+			th.start()
+			self._threads.append(th)
+
+	def stop(self, timeout_s: float = 2.0) -> None:
+		with self._cond:
+			self._stopping = True
+			self._cond.notify_all()
+		deadline = time.monotonic() + timeout_s
+		for th in self._threads:
+			th.join(max(0.0, deadline - time.monotonic()))
+
+
+class WorkDispatcher:
+	"""
+	Route jobs to per-topic queues and their pools, built from the YAML
+	`workers:` section:
+
+	  workers:
+	    pools:  {camera: {workers: 1}, default: {workers: 2}}
+	    topics: {camera/capture/video: {pool: camera, maxsize: 1, policy: drop_newest}}
+
+	Topics not listed use `pool_hint` (a handler's `worker_pool` attribute) or
+	the default pool, with DEFAULT_MAXSIZE / DEFAULT_POLICY.
+	"""
+
+	def __init__(self, workers_cfg: Optional[dict] = None):
+		wc = workers_cfg or {}
+		self._pool_cfg = wc.get("pools") or {}
+		self._topic_cfg = wc.get("topics") or {}
+		self._defaults = {
+			"maxsize": int(wc.get("default_maxsize", DEFAULT_MAXSIZE)),
+			"policy": str(wc.get("default_policy", DEFAULT_POLICY)),
+		}
+		self.pools: Dict[str, WorkerPool] = {}
+		self.queues: Dict[str, TopicQueue] = {}
+		self._lock = threading.Lock()
+		self._started = False
+
+	def _pool(self, name: str) -> WorkerPool:
+		pool = self.pools.get(name)
+		if pool is None:
+			n = int((self._pool_cfg.get(name) or {}).get("workers", 1))
+			pool = self.pools[name] = WorkerPool(name, n)
+			if self._started:
+				pool.start()
+		return pool
+
+	def _queue(self, topic: str, pool_hint: Optional[str]):
+		q = self.queues.get(topic)
+		if q is not None:
+			return q
+		with self._lock:
+			q = self.queues.get(topic)
+			if q is None:
+				tc = self._topic_cfg.get(topic) or {}
+				pool = self._pool(str(tc.get("pool") or pool_hint or DEFAULT_POOL))
+				q = TopicQueue(topic,
+							   tc.get("maxsize", self._defaults["maxsize"]),
+							   str(tc.get("policy", self._defaults["policy"])))
+				q.pool = pool
+				pool.add_queue(q)
+				self.queues[topic] = q
+				logger.info("[QUEUE] '%s' -> pool=%s maxsize=%d policy=%s",
+							topic, pool.name, q.maxsize, q.policy)
+		return q
+
+	def submit(self, topic: str, key, fn: Callable, *args, pool_hint: Optional[str] = None) -> bool:
+		"""Queue fn(*args) for `topic`. Returns False if backpressure dropped it."""
+		q = self._queue(topic, pool_hint)
+		ok = q.pool.offer(q, key, lambda: fn(*args))
+		if not ok:
+			logger.warning("[QUEUE] drop '%s' (full: depth=%d policy=%s)", topic, len(q.items), q.policy)
+		return ok
+
+	def stats(self) -> Dict[str, dict]:
+		return {t: q.snapshot() for t, q in self.queues.items()}
+
+	def log_stats(self) -> None:
+		for t, s in self.stats().items():
+			logger.debug("[QUEUE] '%s' depth=%d/%d enq=%d done=%d drop=%d coal=%d max_wait=%.2fs",
+						 t, s["depth"], s["maxsize"], s["enqueued"], s["done"],
+						 s["dropped"], s["coalesced"], s["max_wait_s"])
+
+	def start(self) -> None:
+		self._started = True
+		for name in self._pool_cfg:
+			self._pool(name)
+		for pool in self.pools.values():
+			if not pool._threads:
+				pool.start()
+
+	def stop(self, timeout_s: float = 2.0) -> None:
+		for pool in self.pools.values():
+			pool.stop(timeout_s)
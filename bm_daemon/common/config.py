@@ -1,5 +1,5 @@
 from pathlib import Path
-import os, yaml
+import os, threading, time, yaml
 from typing import Dict, Any
 
 # repository root is two levels up from this file
@@ -11,12 +11,113 @@ CANDIDATES = [
     ROOT / "bm_daemon" / "agent" / "config.yaml",   # old location (fallback)
 ]
 
-def load_config() -> Dict[str, Any]:
+# ---- cached snapshot ---------------------------------------------------------
+# load_config() parses the YAML once and hands every caller the same frozen
+# snapshot. The file is re-stat'ed at most every CHECK_INTERVAL_S; a changed
+# mtime/size (or invalidate(), wired to SIGHUP by the agent) triggers a
+# re-parse, and the new snapshot replaces the old one in a single assignment.
+# Settings consumed at startup (UART, topics, logging) still need a restart.
+CHECK_INTERVAL_S = 1.0
+
+
+class FrozenDict(dict):
+    """dict that refuses mutation, so a shared snapshot can't be edited in place."""
+
+    def _readonly(self, *_a, **_kw):
+        raise TypeError("config snapshot is read-only; copy it (dict(cfg)) to modify")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        # copy/deepcopy/pickle rebuild through the constructor, not __setitem__
+        return (type(self), (dict(self),))
+
+
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return tuple(_freeze(v) for v in obj)
+    return obj
+
+
+_EMPTY = FrozenDict()
+_lock = threading.Lock()
+# (source path, (mtime_ns, size), snapshot, monotonic time of last stat)
+_cache = (None, None, _EMPTY, float("-inf"))
+_stats = {"parses": 0, "hits": 0, "parse_s": 0.0, "avoided_s": 0.0}
+
+
+def _locate():
     for p in CANDIDATES:
         if p and p.exists():
-            with open(p, "r") as f:
-                return yaml.safe_load(f) or {}
-    return {}
+            return p
+    return None
+
+
+def _signature(p):
+    st = p.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+def invalidate() -> None:
+    """Force the next load_config() to re-check (and, if changed, re-parse) the file."""
+    global _cache
+    with _lock:
+        path, sig, snap, _checked = _cache
+        _cache = (path, None, snap, float("-inf"))
+
+
+def load_config() -> Dict[str, Any]:
+    """Current config snapshot (read-only dict; lists become tuples)."""
+    global _cache
+    path, sig, snap, checked = _cache
+    now = time.monotonic()
+    if path is not None and sig is not None and now - checked < CHECK_INTERVAL_S:
+        _stats["hits"] += 1
+        _stats["avoided_s"] += _stats["parse_s"] / max(1, _stats["parses"])
+        return snap
+    with _lock:
+        p = _locate()
+        try:
+            new_sig = _signature(p) if p else None
+        except OSError:
+            new_sig = None
+        path, sig, snap, _checked = _cache
+        if p is not None and p == path and new_sig is not None and new_sig == sig:
+            _cache = (path, sig, snap, now)
+            _stats["hits"] += 1
+            _stats["avoided_s"] += _stats["parse_s"] / max(1, _stats["parses"])
+            return snap
+        if p is None or new_sig is None:
+            _cache = (None, None, _EMPTY, now)
+            return _EMPTY
+        t0 = time.perf_counter()
+        with open(p, "r") as f:
+            snap = _freeze(yaml.safe_load(f) or {})
+        _stats["parses"] += 1
+        _stats["parse_s"] += time.perf_counter() - t0
+        _cache = (p, new_sig, snap, now)
+        return snap
+
+
+def config_stats() -> dict:
+    """Parse counters: parses, cache hits, total parse time and estimated parse time avoided."""
+    return dict(_stats)
+
+
+def get_value(path: str, default=None, type_=None):
+    """
+    Typed dotted-path lookup, e.g. get_value("bus.max_latency_s", 0.5, float).
+    Missing keys and null values return `default`.
+    """
+    node = load_config()
+    for key in path.split("."):
+        if not isinstance(node, dict) or node.get(key) is None:
+            return default
+        node = node[key]
+    return type_(node) if type_ is not None else node
 
 def get_resolutions():
     cfg = load_config()
@@ -51,6 +152,102 @@ def get_camera_defaults(mode: str):
     merged = {**base, **common, **mode_d}
     return merged
 
+def get_camera_session_settings() -> dict:
+    cfg = load_config()
+    cam = cfg.get("camera", {})
+    s = cam.get("session", {}) or {}
+    return {
+        "enabled": bool(s.get("enabled", False)),
+        "idle_timeout_s": float(s.get("idle_timeout_s", 30.0)),
+        "settle_s": float(s.get("settle_s", 0.5)),
+    }
+
+def get_camera_backend_settings() -> dict:
+    cfg = load_config()
+    cam = cfg.get("camera", {}) or {}
+    f = cam.get("fake", {}) or {}
+    # the environment wins, so CI can run any config file without a camera
+    backend = os.environ.get("BM_CAMERA_BACKEND") or cam.get("backend", "picamera2")
+    return {
+        "backend": str(backend).strip().lower(),
+        "fake": {
+            "source": str(f.get("source", "scene")),
+            "fps": float(f.get("fps", 10.0)),
+            "startup_s": float(f.get("startup_s", 0.0)),
+            "motion_px": int(f.get("motion_px", 2)),
+            "noise": float(f.get("noise", 4.0)),
+            "seed": int(f.get("seed", 0)),
+        },
+    }
+
+def get_encode_settings() -> dict:
+    cfg = load_config()
+    e = (cfg.get("camera", {}) or {}).get("encode", {}) or {}
+    return {
+        # per format: a backend name or "auto" (see bm_camera.encode.file_encoder)
+        "backends": {str(k).lower(): str(v) for k, v in (e.get("backends") or {}).items()},
+        "bench_results": str(e.get("bench_results", "encoder_bench.json")),
+        # learned (quality, bytes) per resolution that seeds target_bytes searches; "" disables
+        "size_model": str(e.get("size_model", "encode_model.json") or ""),
+    }
+
+def get_burst_settings() -> dict:
+    cfg = load_config()
+    b = (cfg.get("camera", {}) or {}).get("burst", {}) or {}
+    workers = max(0, int(b.get("workers", 0)))   # 0 = one encode process per core
+    return {
+        "pipelined": bool(b.get("pipelined", True)),
+        "workers": workers,
+        # captured frames waiting for encode/TX before capture blocks; 0 = 2 per worker
+        "max_inflight": max(0, int(b.get("max_inflight", 0))),
+    }
+
+def get_preroll_settings() -> dict:
+    cfg = load_config()
+    p = (cfg.get("camera", {}) or {}).get("preroll", {}) or {}
+    seconds = max(0.0, float(p.get("seconds", 5.0)))
+    kbytes_per_s = max(1.0, float(p.get("kbytes_per_s", 375.0)))
+    return {
+        "enabled": bool(p.get("enabled", False)),
+        "res": str(p.get("res", "720p")),
+        "fps": max(1, int(p.get("fps", 30))),
+        "seconds": seconds,
+        # RAM per second of pre-roll; the encoder bitrate is set from it
+        "kbytes_per_s": kbytes_per_s,
+        # hard cap on the ring (oldest GOPs dropped first); 0 = 1.5 x seconds x kbytes_per_s
+        "max_bytes": max(0, int(float(p.get("max_mb", 0)) * 1_000_000)),
+        "keyframe_s": max(0.1, float(p.get("keyframe_s", 1.0))),
+        "hflip": bool(p.get("hflip", False)),
+        "vflip": bool(p.get("vflip", False)),
+    }
+
+def get_change_settings() -> dict:
+    cfg = load_config()
+    c = (cfg.get("camera", {}) or {}).get("change", {}) or {}
+    # thresholds are in the method's units; None = the method's default
+    skip_below, thumb_below = c.get("skip_below"), c.get("thumb_below")
+    return {
+        "enabled": bool(c.get("enabled", False)),
+        "method": str(c.get("method", "diff")).strip().lower(),
+        "grid": max(4, int(c.get("grid", 32))),
+        "skip_below": None if skip_below is None else float(skip_below),
+        "thumb_below": None if thumb_below is None else float(thumb_below),
+        "normalize": bool(c.get("normalize", True)),
+        "thumb_px": max(16, int(c.get("thumb_px", 320))),
+    }
+
+def get_progressive_settings() -> dict:
+    cfg = load_config()
+    p = (cfg.get("camera", {}) or {}).get("progressive", {}) or {}
+    layers = p.get("layers")
+    if layers is None:
+        layers = [{"res": "160x160", "q": 30}, {"res": "480p", "q": 25}]
+    return {
+        "enabled": bool(p.get("enabled", False)),
+        "layers": [{"res": str(l["res"]), "q": int(l.get("q", 30))} for l in layers],
+        "progressive_jpeg": bool(p.get("progressive_jpeg", True)),
+    }
+
 def get_status_topic() -> str:
     cfg = load_config()
     cam = cfg.get("camera", {})
@@ -88,3 +88,8 @@ def buffer_dir() -> str:
 	cfg = load_config() or {}
 	sub = (cfg.get("paths") or {}).get("buffer", "buffer")
 	return str(_ensure(_data_root() / sub))
+
+def data_file(name: str) -> str:
+	"""A file under the data root (absolute `name` is returned unchanged)."""
+	p = Path(name).expanduser()
+	return str(p if p.is_absolute() else _ensure(_data_root()) / p)
@@ -1,9 +1,14 @@
 import serial
 import struct
 import fcntl
+import selectors
+import threading
 import time
 from enum import Enum
 
+from bm_daemon.io import codec
+from bm_daemon.io.frame import BmFrame
+
 
 class BristlemouthSerial:
 
@@ -40,11 +45,24 @@ class BristlemouthSerial:
 		BM_SERIAL_NODE_ID_REPLY = 0x61
 		BM_SERIAL_BAUD_RATE_REQ = 0x70
 		BM_SERIAL_BAUD_RATE_REPLY = 0x71
+
+	# Upper bound on buffered, still-undelimited RX bytes before we resync
+	RX_BUF_MAX = 8192
+
 	# Added to fix port issue with ttyAMA0 vs serial0 naming
 	def __init__(self, uart=None, node_id: int = 0xC0FFEEEEF0CACC1A,
 				port="/dev/serial0", baudrate=115200, timeout=0.5) -> None:
 		self.node_id = node_id
 		self.sub_cbs = []
+		# Optional topic router (bm_daemon.agent.router.TopicRouter or anything
+		# with match(topic_str) -> callbacks); frames are routed by decoded topic
+		self.router = None
+		# Receive-side framer state: bytes after the last 0x00 delimiter wait here
+		self._rx_buf = bytearray()
+		self.rx_stats = {"frames": 0, "crc_errors": 0, "decode_errors": 0, "overflows": 0, "wakeups": 0}
+		self._selector = None
+		# fcntl.lockf only excludes other processes; handler threads need this too
+		self._tx_lock = threading.Lock()
 		if uart is None:
 			# use provided port/baudrate, don’t hardcode AMA0
 			self.uart = serial.Serial(port=port, baudrate=baudrate, timeout=timeout)
@@ -78,46 +96,130 @@ class BristlemouthSerial:
 
 		return bytes(data)
 
-	def _process_publish_message(self, payload) -> None:
-		format = "<QBBH"
-
+	def _process_publish_message(self, payload, offset: int = 0) -> None:
+		"""
+		Parse the PUB body at payload[offset:] into a BmFrame (no copies) and
+		hand it to the router's matching callbacks. Legacy sub_cbs still get
+		the historical (…, str(bytes) topic, data_len, bytes data) arguments.
+		"""
 		try:
-			pub_header = struct.unpack(format, payload[:12])
-			node_id = pub_header[0]
-			type = pub_header[1]
-			version = pub_header[2]
-			topic_len = pub_header[3]
-			topic = str(payload[12 : 12 + topic_len])
-			data_len = len(payload[12 + topic_len :])
-			data = payload[12 + topic_len :]
-			for sub_cb in self.sub_cbs:
-				sub_cb(node_id, type, version, topic_len, topic, data_len, data)
+			frame = BmFrame.parse(payload, offset)
+			if self.router is not None:
+				for cb in self.router.match(frame.topic):
+					cb(frame)
+			if self.sub_cbs:
+				raw_topic = frame.topic.encode("utf-8")
+				topic = str(raw_topic)
+				data = bytes(frame.payload)
+				for sub_cb in self.sub_cbs:
+					sub_cb(frame.node_id, frame.type, frame.version, len(raw_topic),
+						   topic, len(data), data)
 
 		except Exception:
 			print("Error unpacking publish message")
 
-	def bristlemouth_process(self, timeout_s: float = 0.5) -> None:
-		format = "<BBH"
-		data = self._read_until_idle(timeout_s)
+	def _process_frame(self, encoded: bytes) -> None:
+		"""
+		COBS-decode one delimited frame, verify its CRC and route it by type.
+		The CRC is computed over the packet with its own checksum field zeroed,
+		mirroring finalize_packet().
+		"""
+		try:
+			packet = self.cobs_decode(encoded)
+			type, _flags, checksum = struct.unpack_from("<BBH", packet)
+		except (ValueError, struct.error):
+			self.rx_stats["decode_errors"] += 1
+			return
+
+		calc = self.crc(self.crc(self.crc(0, packet[:2]), b"\x00\x00"), packet[4:])
+		if calc != checksum:
+			self.rx_stats["crc_errors"] += 1
+			return
+
+		self.rx_stats["frames"] += 1
+		if type == self.BmSerialTxMessage.BM_SERIAL_PUB.value:
+			self._process_publish_message(packet, 4)
 
-		if len(data) != 0:
+	def _feed_rx(self, data: bytes) -> int:
+		"""
+		Append raw UART bytes to the rolling buffer and handle every complete
+		(0x00-delimited) frame in it. A trailing partial frame is kept for the
+		next call. Returns the number of frames handed to _process_frame().
+		"""
+		buf = self._rx_buf
+		buf += data
+		handled = 0
+		start = 0
+		while True:
+			end = buf.find(0, start)
+			if end < 0:
+				break
+			if end > start:
+				self._process_frame(bytes(buf[start:end]))
+				handled += 1
+			start = end + 1
+		if start:
+			del buf[:start]
+		if len(buf) > self.RX_BUF_MAX:
+			# No delimiter in sight: drop and resync on the next 0x00
+			self.rx_stats["overflows"] += 1
+			buf.clear()
+		return handled
+
+	def _rx_selector(self):
+		"""Lazily register the UART fd with select/epoll; None if the port has no fd."""
+		if self._selector is None:
 			try:
-				serial_packet = struct.unpack(format, data[:4])
-				payload = data[4:]
-				type = serial_packet[0]
-				if type == self.BmSerialTxMessage.BM_SERIAL_PUB.value:
-					self._process_publish_message(payload)
+				fd = self.uart.fileno()
 			except Exception:
-				print("Error unpacking data from read output")
+				self._selector = False
+			else:
+				self._selector = selectors.DefaultSelector()
+				self._selector.register(fd, selectors.EVENT_READ)
+		return self._selector or None
 
-	def bristlemouth_sub(self, topic: str, fn):
+	def bristlemouth_process(self, timeout_s: float = 0.5) -> int:
+		"""
+		Block until UART bytes arrive (or timeout_s passes), then feed everything
+		buffered to the framer. Sleeps in select/epoll on the UART fd, so an idle
+		bus costs one wakeup per timeout_s and a frame is handled as soon as its
+		delimiter lands. Ports without a fileno() fall back to polling.
+		Returns the number of frames handled.
+		"""
+		sel = self._rx_selector()
+		if sel is None:
+			data = self._read_until_idle(timeout_s)
+			return self._feed_rx(data) if data else 0
+
+		if not sel.select(timeout_s):
+			return 0
+		self.rx_stats["wakeups"] += 1
+		# Readable with nothing waiting means hangup; read(1) surfaces the error
+		data = self.uart.read(max(1, self.uart.in_waiting))
+		return self._feed_rx(data) if data else 0
+
+	def close(self) -> None:
+		if self._selector:
+			try:
+				self._selector.close()
+			except Exception:
+				pass
+		self._selector = None
+		self.uart.close()
+
+	def bristlemouth_sub(self, topic: str, fn=None):
+		"""
+		Ask the BM node to forward `topic`. `fn` is called for every PUB frame
+		(legacy, unfiltered); pass None when frames are routed via self.router.
+		"""
 		packet = (
 			bytearray.fromhex("03000000")
 			+ len(topic).to_bytes(2, "little")
 			+ bytearray(topic.encode("utf-8"))
 		)
 		cobs = self.finalize_packet(packet)
-		self.sub_cbs.append(fn)
+		if fn is not None:
+			self.sub_cbs.append(fn)
 		return self.lock_uart_and_write_bytes(cobs)
 
 	def spotter_tx(self, data: bytes):
@@ -165,9 +267,10 @@ class BristlemouthSerial:
 		return self.lock_uart_and_write_bytes(cobs)
 	
 	def lock_uart_and_write_bytes(self, bytes):
-		fcntl.lockf(self.uart, fcntl.LOCK_EX)
-		self.uart.write(bytes)
-		fcntl.lockf(self.uart, fcntl.LOCK_UN)
+		with self._tx_lock:
+			fcntl.lockf(self.uart, fcntl.LOCK_EX)
+			self.uart.write(bytes)
+			fcntl.lockf(self.uart, fcntl.LOCK_UN)
 
 	def finalize_packet(self, packet: bytearray):
 		checksum = self.crc(0, packet)
@@ -183,34 +286,14 @@ class BristlemouthSerial:
 			+ bytearray.fromhex("0101")
 		)
 
-	# Adapted from https://github.com/cmcqueen/cobs-python
+	# Codec work lives in bm_daemon.io.codec (table CRC, slice-based COBS,
+	# optional C paths); these wrappers keep the historical method API.
 	def cobs_encode(self, in_bytes: bytes):
-		final_zero = True
-		out_bytes = bytearray()
-		idx = 0
-		search_start_idx = 0
-		for in_char in in_bytes:
-			if in_char == 0:
-				final_zero = True
-				out_bytes.append(idx - search_start_idx + 1)
-				out_bytes += in_bytes[search_start_idx:idx]
-				search_start_idx = idx + 1
-			else:
-				if idx - search_start_idx == 0xFD:
-					final_zero = False
-					out_bytes.append(0xFF)
-					out_bytes += in_bytes[search_start_idx : idx + 1]
-					search_start_idx = idx + 1
-			idx += 1
-		if idx != search_start_idx or final_zero:
-			out_bytes.append(idx - search_start_idx + 1)
-			out_bytes += in_bytes[search_start_idx:idx]
-		return bytes(out_bytes)
+		return codec.cobs_encode(in_bytes)
+
+	def cobs_decode(self, in_bytes: bytes):
+		"""Inverse of cobs_encode(); input must not contain the 0x00 delimiter."""
+		return codec.cobs_decode(in_bytes)
 
 	def crc(self, seed: int, src: bytes):
-		e, f = 0, 0
-		for i in src:
-			e = (seed ^ i) & 0xFF
-			f = e ^ ((e << 4) & 0xFF)
-			seed = (seed >> 8) ^ (((f << 8) & 0xFFFF) ^ ((f << 3) & 0xFFFF)) ^ (f >> 4)
-		return seed
+		return codec.crc16(seed, src)
@@ -0,0 +1,121 @@
+# bm_daemon/io/codec.py
+"""
+CRC-16 and COBS codecs for Bristlemouth serial framing.
+
+The CRC is the reflected CCITT polynomial (CRC-16/KERMIT, seed 0) that
+BristlemouthSerial.crc() has always computed, driven by a 256-entry table.
+COBS works a zero-run at a time with bytes.find()/memoryview slices instead
+of one Python iteration per byte.
+
+Optional C paths (both are drop-in and output-identical):
+  - crcmod  : CRC via crcmod's C extension
+  - cobs    : cobs-python's C encoder/decoder
+Set BM_CODEC_PURE=1 to force the pure-Python implementations.
+"""
+import os
+
+# ----------------------------- CRC-16 -----------------------------
+
+def _make_crc_table():
+	table = []
+	for i in range(256):
+		f = i ^ ((i << 4) & 0xFF)
+		table.append((((f << 8) & 0xFFFF) ^ ((f << 3) & 0xFFFF)) ^ (f >> 4))
+	return tuple(table)
+
+CRC_TABLE = _make_crc_table()
+
+
+def crc16_py(seed: int, src) -> int:
+	"""Table-driven CRC-16; same result as the old bit-twiddling loop."""
+	table = CRC_TABLE
+	crc = seed & 0xFFFF
+	for b in src:
+		crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+	return crc
+
+# ------------------------------ COBS ------------------------------
+
+def cobs_encode_py(in_bytes) -> bytes:
+	"""
+	COBS-encode `in_bytes` (no trailing delimiter). Byte-for-byte identical to
+	the encoder previously inlined in BristlemouthSerial.
+	"""
+	data = in_bytes if isinstance(in_bytes, (bytes, bytearray)) else bytes(in_bytes)
+	mv = memoryview(data)
+	n = len(data)
+	out = bytearray()
+	pos = 0
+	while True:
+		zero = data.find(0, pos)
+		end = n if zero < 0 else zero
+		seg_len = end - pos
+		# Full 254-byte runs get an 0xFF code and no implied zero
+		while end - pos >= 0xFE:
+			out.append(0xFF)
+			out += mv[pos : pos + 0xFE]
+			pos += 0xFE
+		if zero < 0:
+			if end != pos or seg_len == 0:
+				out.append(end - pos + 1)
+				out += mv[pos:end]
+			return bytes(out)
+		out.append(end - pos + 1)
+		out += mv[pos:end]
+		pos = end + 1
+
+
+def cobs_decode_py(in_bytes) -> bytes:
+	"""Inverse of cobs_encode(); input must not contain the 0x00 delimiter."""
+	mv = memoryview(in_bytes).cast("B")
+	n = len(mv)
+	out = bytearray()
+	idx = 0
+	while idx < n:
+		code = mv[idx]
+		if code == 0:
+			raise ValueError("unexpected zero byte in COBS frame")
+		end = idx + code
+		if end > n:
+			raise ValueError("COBS block overruns frame")
+		out += mv[idx + 1 : end]
+		idx = end
+		if code != 0xFF and idx < n:
+			out.append(0)
+	return bytes(out)
+
+# ------------------------ optional C paths ------------------------
+
+crc16 = crc16_py
+cobs_encode = cobs_encode_py
+cobs_decode = cobs_decode_py
+ACCEL = {"crc": None, "cobs": None}
+
+if not os.environ.get("BM_CODEC_PURE"):
+	try:
+		import crcmod  # type: ignore
+		import crcmod._crcfunext  # type: ignore  # only worth it with the C extension
+		_crc_c = crcmod.mkCrcFun(0x11021, initCrc=0, rev=True, xorOut=0)
+
+		def crc16(seed: int, src) -> int:
+			return _crc_c(bytes(src), seed & 0xFFFF)
+
+		ACCEL["crc"] = "crcmod"
+	except Exception:
+		pass
+
+	try:
+		from cobs import cobs as _cobs_c  # type: ignore
+
+		def cobs_encode(in_bytes) -> bytes:
+			return _cobs_c.encode(bytes(in_bytes))
+
+		def cobs_decode(in_bytes) -> bytes:
+			try:
+				return _cobs_c.decode(bytes(in_bytes))
+			except _cobs_c.DecodeError as e:
+				raise ValueError(str(e)) from None
+
+		ACCEL["cobs"] = "cobs"
+	except Exception:
+		pass
@@ -0,0 +1,299 @@
+# bm_daemon/io/fake_bm.py
+"""
+A simulated Bristlemouth node on the far side of a pseudo-terminal, for
+running the agent (and benchmarks) with no /dev/serial0.
+
+The peer owns the pty master; the agent opens the slave (FakeBmPeer.port)
+as an ordinary serial port, so BristlemouthSerial, the selector-driven RX
+path and lockf'd writes are exercised unchanged. The peer speaks the BM
+serial protocol, COBS and CRC included:
+  - SUB/UNSUB from the agent update its subscription set;
+  - PUBs from the agent (camera/status, spotter/transmit-data, printf, ...)
+    are recorded and handed to listeners;
+  - publish() sends a PUB to the agent, as the bus would forward it;
+  - optionally it publishes spotter/utc-time every rtc_interval_s and
+    replays a schedule of (topic, payload, every_s) publications.
+
+In-process: set uart_device: fake (open_bus() starts a peer from the
+fake_bm: section). Standalone: python -m bm_daemon.io.fake_bm prints the
+pty path to put in uart_device, then publishes "topic payload" lines
+typed on stdin.
+"""
+import collections
+import logging
+import os
+import selectors
+import struct
+import threading
+import time
+import tty
+from typing import Callable, Optional
+
+from bm_daemon.io import codec
+from bm_daemon.io.frame import BmFrame
+
+logger = logging.getLogger("FAKEBM")
+
+MSG_PUB = 0x02
+MSG_SUB = 0x03
+MSG_UNSUB = 0x04
+TYPE_TEXT = 0x00
+
+DEFAULT_NODE_ID = 0x00000000FA4EB0DE
+
+
+def _matches(pattern: str, topic: str) -> bool:
+	if pattern == topic:
+		return True
+	if pattern.endswith("/**"):
+		return topic.startswith(pattern[:-2])
+	if pattern.endswith("/*"):
+		head = pattern[:-1]
+		return topic.startswith(head) and "/" not in topic[len(head):]
+	return False
+
+
+def encode_frame(packet: bytearray) -> bytes:
+	"""CRC (over the packet with a zeroed checksum field), COBS and delimiter."""
+	packet[2] = packet[3] = 0
+	crc = codec.crc16(0, packet)
+	packet[2] = crc & 0xFF
+	packet[3] = (crc >> 8) & 0xFF
+	return codec.cobs_encode(bytes(packet)) + b"\x00"
+
+
+def pub_packet(topic: str, data: bytes, node_id: int = DEFAULT_NODE_ID,
+			   msg_type: int = 1, version: int = 1) -> bytes:
+	t = topic.encode("utf-8")
+	packet = bytearray(struct.pack("<BBHQBBH", MSG_PUB, 0, 0, node_id, msg_type, version, len(t)))
+	packet += t
+	packet += data
+	return encode_frame(packet)
+
+
+class FakeBmPeer:
+	def __init__(self, node_id: int = DEFAULT_NODE_ID, *, rtc_topic: str = "spotter/utc-time",
+				 rtc_interval_s: float = 0.0, require_sub: bool = True, history: int = 1000):
+		self.node_id = int(node_id)
+		self.rtc_topic = rtc_topic
+		self.rtc_interval_s = float(rtc_interval_s)
+		# a real node only forwards topics someone subscribed to
+		self.require_sub = bool(require_sub)
+		self.subscriptions = set()
+		self.received = collections.deque(maxlen=history)   # (monotonic, topic, payload) from the agent
+		self.stats = {"rx_frames": 0, "rx_bytes": 0, "crc_errors": 0, "decode_errors": 0,
+					  "pubs_in": 0, "subs": 0, "pubs_out": 0, "tx_bytes": 0, "unsubscribed_drops": 0}
+		self._listeners = []
+		self._schedule = []
+		self._subscribed = threading.Condition()
+		self._write_lock = threading.Lock()
+		self._stop = threading.Event()
+		self._thread = None
+		self._rx_buf = bytearray()
+
+		self._master, self._slave = os.openpty()
+		tty.setraw(self._slave)
+		# the peer keeps a slave fd open so the master never sees EIO between agent opens
+		self.port = os.ttyname(self._slave)
+		os.set_blocking(self._master, False)
+
+	@classmethod
+	def from_config(cls, fcfg: Optional[dict] = None, topics_cfg: Optional[dict] = None) -> "FakeBmPeer":
+		f = dict(fcfg or {})
+		peer = cls(int(f.get("node_id", DEFAULT_NODE_ID)),
+				   rtc_topic=str((topics_cfg or {}).get("rtc", "spotter/utc-time")),
+				   rtc_interval_s=float(f.get("rtc_interval_s", 0.0)),
+				   require_sub=bool(f.get("require_sub", True)))
+		for item in f.get("schedule") or ():
+			peer.every(str(item["topic"]), str(item.get("payload", "")).encode("utf-8"),
+					   float(item.get("every_s", 0.0)), start_s=float(item.get("start_s", 0.0)),
+					   count=int(item.get("count", 0)))
+		return peer
+
+	# ---- wiring ----
+	def add_listener(self, fn: Callable[[str, bytes], None]) -> None:
+		"""fn(topic, payload) for every PUB the agent sends."""
+		self._listeners.append(fn)
+
+	def every(self, topic: str, payload: bytes, every_s: float, *, start_s: float = 0.0,
+			  count: int = 0, text: bool = True) -> None:
+		"""Publish `payload` on `topic` every `every_s` (count=0: forever; every_s=0: once)."""
+		self._schedule.append({"topic": topic, "data": payload, "text": text, "every_s": float(every_s),
+							   "due": float(start_s), "left": int(count) if count else (0 if every_s > 0 else 1)})
+
+	def start(self) -> "FakeBmPeer":
+		self._thread = threading.Thread(target=self._run, name="fake-bm", daemon=True)
+		self._thread.start()
+		logger.info("[FAKEBM] node 0x%016x on %s", self.node_id, self.port)
+		return self
+
+	def stop(self) -> None:
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join(timeout=2.0)
+			self._thread = None
+		for fd in (self._master, self._slave):
+			try:
+				os.close(fd)
+			except OSError:
+				pass
+
+	close = stop
+
+	def wait_subscribed(self, topic: str, timeout_s: float = 5.0) -> bool:
+		"""Block until the agent has subscribed to `topic` (so publish() is forwarded)."""
+		deadline = time.monotonic() + timeout_s
+		with self._subscribed:
+			while not self._is_subscribed(topic):
+				left = deadline - time.monotonic()
+				if left <= 0:
+					return False
+				self._subscribed.wait(left)
+		return True
+
+	def _is_subscribed(self, topic: str) -> bool:
+		return any(_matches(p, topic) for p in self.subscriptions)
+
+	# ---- to the agent ----
+	def publish(self, topic: str, data: bytes = b"", *, text: bool = True,
+				node_id: Optional[int] = None) -> bool:
+		"""
+		Forward a PUB to the agent. text=True prefixes the 0x00 text type
+		byte, as Spotter/CLI publications carry. Returns False (and sends
+		nothing) for an unsubscribed topic when require_sub is set.
+		"""
+		if self.require_sub and not self._is_subscribed(topic):
+			self.stats["unsubscribed_drops"] += 1
+			return False
+		payload = (bytes([TYPE_TEXT]) + data) if text else data
+		self.write(pub_packet(topic, payload, self.node_id if node_id is None else node_id))
+		self.stats["pubs_out"] += 1
+		return True
+
+	def publish_time(self, t: Optional[float] = None) -> bool:
+		us = int((time.time() if t is None else t) * 1e6)
+		return self.publish(self.rtc_topic, struct.pack("<Q", us), text=False)
+
+	def write(self, raw: bytes) -> None:
+		"""Raw bytes to the agent (e.g. deliberately corrupted frames)."""
+		view = memoryview(raw)
+		with self._write_lock:
+			while view:
+				try:
+					n = os.write(self._master, view)
+				except BlockingIOError:
+					time.sleep(0.001)   # agent not draining: the tty buffer is full
+					continue
+				view = view[n:]
+		self.stats["tx_bytes"] += len(raw)
+
+	# ---- from the agent ----
+	def _handle(self, encoded: bytes) -> None:
+		try:
+			packet = codec.cobs_decode(encoded)
+			msg, _flags, crc = struct.unpack_from("<BBH", packet)
+		except (ValueError, struct.error):
+			self.stats["decode_errors"] += 1
+			return
+		if codec.crc16(codec.crc16(codec.crc16(0, packet[:2]), b"\x00\x00"), packet[4:]) != crc:
+			self.stats["crc_errors"] += 1
+			return
+		self.stats["rx_frames"] += 1
+		if msg in (MSG_SUB, MSG_UNSUB):
+			(n,) = struct.unpack_from("<H", packet, 4)
+			topic = bytes(packet[6:6 + n]).decode("utf-8", "replace")
+			with self._subscribed:
+				if msg == MSG_SUB:
+					self.subscriptions.add(topic)
+					self.stats["subs"] += 1
+				else:
+					self.subscriptions.discard(topic)
+				self._subscribed.notify_all()
+		elif msg == MSG_PUB:
+			try:
+				frame = BmFrame.parse(packet, 4)
+			except Exception:
+				self.stats["decode_errors"] += 1
+				return
+			payload = bytes(frame.payload)
+			self.stats["pubs_in"] += 1
+			self.received.append((time.monotonic(), frame.topic, payload))
+			for fn in self._listeners:
+				try:
+					fn(frame.topic, payload)
+				except Exception:
+					logger.exception("[FAKEBM] listener failed")
+
+	def _feed(self, data: bytes) -> None:
+		buf = self._rx_buf
+		buf += data
+		start = 0
+		while True:
+			end = buf.find(0, start)
+			if end < 0:
+				break
+			if end > start:
+				self._handle(bytes(buf[start:end]))
+			start = end + 1
+		if start:
+			del buf[:start]
+
+	def _tick(self, now: float, t0: float, next_rtc: float) -> float:
+		if self.rtc_interval_s > 0 and now >= next_rtc and self.subscriptions:
+			self.publish_time()
+			next_rtc = now + self.rtc_interval_s
+		for item in self._schedule:
+			# left: publications remaining, 0 = unlimited; None once a bounded item is spent
+			if item["left"] is None or now - t0 < item["due"] or not self._is_subscribed(item["topic"]):
+				continue
+			self.publish(item["topic"], item["data"], text=item["text"])
+			item["due"] = (now - t0) + item["every_s"]
+			if item["left"]:
+				item["left"] = (item["left"] - 1) or None
+		return next_rtc
+
+	def _run(self) -> None:
+		sel = selectors.DefaultSelector()
+		sel.register(self._master, selectors.EVENT_READ)
+		t0 = next_rtc = time.monotonic()
+		try:
+			while not self._stop.is_set():
+				for _key, _ev in sel.select(0.05):
+					try:
+						data = os.read(self._master, 65536)
+					except (BlockingIOError, InterruptedError):
+						continue
+					except OSError:
+						return   # pty closed
+					self.stats["rx_bytes"] += len(data)
+					self._feed(data)
+				next_rtc = self._tick(time.monotonic(), t0, next_rtc)
+		finally:
+			sel.close()
+
+
+def main():
+	import argparse
+	import sys
+	ap = argparse.ArgumentParser(description="Fake BM node on a pty (prints the device to use as uart_device)")
+	ap.add_argument("--rtc", type=float, default=0.0, help="publish spotter/utc-time every N seconds")
+	ap.add_argument("--any-topic", action="store_true", help="forward publications without a SUB")
+	args = ap.parse_args()
+	logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(message)s")
+	peer = FakeBmPeer(rtc_interval_s=args.rtc, require_sub=not args.any_topic)
+	peer.add_listener(lambda topic, data: print("<-", topic, data[1:] if data[:1] == b"\x00" else data, flush=True))
+	peer.start()
+	print(peer.port, flush=True)
+	try:
+		for line in sys.stdin:
+			topic, _, payload = line.strip().partition(" ")
+			if topic and not peer.publish(topic, payload.encode("utf-8")):
+				print(f"(not subscribed: {topic})", flush=True)
+	except KeyboardInterrupt:
+		pass
+	finally:
+		peer.stop()
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,54 @@
+# bm_daemon/io/frame.py
+"""
+One decoded Bristlemouth PUB message.
+
+Built once per frame from the COBS-decoded packet: the header is read with
+struct.unpack_from, the topic is decoded once and interned (so router and
+dedup dict lookups hit identical str objects), and the payload is a
+memoryview into the packet, not a copy. Handlers get `payload` as their
+`data`; it supports len(), indexing, slicing, struct.unpack and .hex(), and
+bytes(data) gives a real copy when one is needed (or str(data, "utf-8")).
+For topics with a command schema the agent also attaches the parsed
+Command (see bm_daemon.agent.command).
+"""
+import struct
+import sys
+
+PUB_HEADER = struct.Struct("<QBBH")   # node_id, type, version, topic_len
+
+# raw topic bytes -> interned str; a bus carries a small, fixed set of topics
+_topics = {}
+_TOPICS_MAX = 1024
+
+
+class BmFrame:
+	__slots__ = ("node_id", "type", "version", "topic", "payload", "command")
+
+	def __init__(self, node_id: int, type: int, version: int, topic: str, payload: memoryview,
+				 command=None):
+		self.node_id = node_id
+		self.type = type
+		self.version = version
+		self.topic = topic
+		self.payload = payload
+		self.command = command   # agent.command.Command, attached once by the agent
+
+	@classmethod
+	def parse(cls, buf, offset: int = 0) -> "BmFrame":
+		"""Parse a PUB body starting at `offset` in `buf`; raises struct.error if short."""
+		node_id, type_, version, topic_len = PUB_HEADER.unpack_from(buf, offset)
+		start = offset + PUB_HEADER.size
+		end = start + topic_len
+		if end > len(buf):
+			raise struct.error(f"topic_len {topic_len} past end of frame")
+		raw = bytes(buf[start:end])   # topic bytes only (a few dozen)
+		topic = _topics.get(raw)
+		if topic is None:
+			topic = sys.intern(str(raw, "utf-8", "ignore").rstrip("\x00"))
+			if len(_topics) < _TOPICS_MAX:
+				_topics[raw] = topic
+		return cls(node_id, type_, version, topic, memoryview(buf)[end:])
+
+	def __repr__(self) -> str:
+		return (f"BmFrame(node=0x{self.node_id:016x}, type={self.type}, ver={self.version}, "
+				f"topic={self.topic!r}, len={len(self.payload)})")
@@ -2,4 +2,7 @@ from typing import Protocol, Iterable, Dict, Any
 
 class Handler(Protocol):
     topics: Iterable[str]
+    # optional: `worker_pool = "camera"` picks the agent worker pool for these topics
+    # msg = {"node": int, "topic": str, "data": memoryview}; use bytes(data) or
+    # str(data, "utf-8") where bytes methods are needed
     def handle(self, msg: Dict[str, Any], *, ctx: dict) -> None: ...
@@ -0,0 +1,223 @@
+# bm_daemon/transport/pacing.py
+"""
+Pacing for spotter_tx transfers.
+
+Two pacers share one interface (start_gap / before_send / on_sent / on_error):
+
+  FixedPacer : the historical behaviour, sleep `delay_s` between sends.
+  RatePacer  : token bucket in bytes/s with an optional ACK/credit window.
+               The rate grows additively while sends succeed (or ACKs come
+               back) and is halved, with exponential backoff, on errors.
+
+Profiles live under transport.spotter.profiles and are picked with
+transport.spotter.profile; "fixed" keeps the legacy delay_s pacing.
+Clock and sleep are injectable so benchmarks can run on a simulated link.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger("TX")
+
+PROFILE_DEFAULTS = {
+	"bytes_per_s": 1000.0,     # starting rate
+	"burst_bytes": 600,        # bucket depth
+	"min_bytes_per_s": 50.0,
+	"max_bytes_per_s": 4000.0,
+	"increase_bytes_per_s": 50.0,   # additive increase per ACK / clean send
+	"acks": False,             # grow a window from peer ACKs/credits
+	"window": 4,               # initial chunks in flight (acks only)
+	"max_window": 32,
+	"ack_timeout_s": 30.0,     # no ACK for this long -> treat as an error
+	"backoff_s": 2.0,
+	"backoff_max_s": 60.0,
+	"max_retries": 3,          # per send, before the transfer is abandoned
+	"start_gap_s": 1.0,        # let START reach the queue before I0
+}
+
+_ACK_POLL_S = 0.05
+
+# The transfer in progress, so an ACK/credit handler can reach its pacer
+_active = None
+_active_lock = threading.Lock()
+
+
+class TokenBucket:
+	"""Bytes/s bucket; take() blocks until `n` tokens are available."""
+
+	def __init__(self, rate: float, burst: float, *, clock=time.monotonic, sleep=time.sleep):
+		self.rate = float(rate)
+		self.burst = float(burst)
+		self._clock = clock
+		self._sleep = sleep
+		self._tokens = self.burst
+		self._t = clock()
+
+	def _refill(self):
+		now = self._clock()
+		self._tokens = min(self.burst, self._tokens + (now - self._t) * self.rate)
+		self._t = now
+
+	def take(self, n: int) -> float:
+		"""Consume n tokens (may exceed burst); returns seconds waited."""
+		self._refill()
+		waited = 0.0
+		if self._tokens < n:
+			waited = (n - self._tokens) / self.rate
+			self._sleep(waited)
+			self._refill()
+		self._tokens -= n
+		return waited
+
+
+class FixedPacer:
+	"""Legacy pacing: a fixed gap between consecutive sends."""
+
+	def __init__(self, delay_s: float, *, sleep=time.sleep):
+		self.delay_s = float(delay_s)
+		self._sleep = sleep
+		self._first = True
+		self.max_retries = 0
+
+	def start_gap(self):
+		self._sleep(max(1.0, self.delay_s))
+		self._first = True
+
+	def before_send(self, nbytes: int):
+		if not self._first:
+			self._sleep(self.delay_s)
+		self._first = False
+
+	def on_sent(self, nbytes: int):
+		pass
+
+	def on_error(self, exc):
+		self._sleep(self.delay_s)
+
+	def on_ack(self, count: int = 1):
+		pass
+
+	def snapshot(self) -> dict:
+		return {"mode": "fixed", "delay_s": self.delay_s}
+
+
+class RatePacer:
+	"""
+	Token bucket with AIMD rate control. With `acks` enabled, at most
+	`window` sends may be unacknowledged; each ACK (or credit) frees a slot
+	and widens the window, and an ACK timeout counts as an error.
+	"""
+
+	def __init__(self, profile: dict, *, clock=time.monotonic, sleep=time.sleep):
+		p = {**PROFILE_DEFAULTS, **(profile or {})}
+		self.name = str(p.get("name", "rate"))
+		self.min_rate = float(p["min_bytes_per_s"])
+		self.max_rate = float(p["max_bytes_per_s"])
+		self.increase = float(p["increase_bytes_per_s"])
+		self.acks = bool(p["acks"])
+		self.window = max(1, int(p["window"]))
+		self.max_window = max(self.window, int(p["max_window"]))
+		self.ack_timeout_s = float(p["ack_timeout_s"])
+		self.backoff_s = float(p["backoff_s"])
+		self.backoff_max_s = float(p["backoff_max_s"])
+		self.max_retries = int(p["max_retries"])
+		self.start_gap_s = float(p["start_gap_s"])
+		rate = min(self.max_rate, max(self.min_rate, float(p["bytes_per_s"])))
+		self.bucket = TokenBucket(rate, float(p["burst_bytes"]), clock=clock, sleep=sleep)
+		self._clock = clock
+		self._sleep = sleep
+		self._lock = threading.Lock()
+		self._in_flight = 0
+		self._last_ack = clock()
+		self._errors_in_row = 0
+		self.stats = {"sent": 0, "bytes": 0, "acks": 0, "errors": 0, "ack_timeouts": 0, "waited_s": 0.0}
+
+	@property
+	def rate(self) -> float:
+		return self.bucket.rate
+
+	def _set_rate(self, rate: float):
+		self.bucket.rate = min(self.max_rate, max(self.min_rate, rate))
+
+	def start_gap(self):
+		self._sleep(self.start_gap_s)
+		with self._lock:
+			self._last_ack = self._clock()
+
+	def _wait_window(self):
+		while True:
+			with self._lock:
+				if self._in_flight < self.window:
+					return
+				stalled = self._clock() - self._last_ack
+			if stalled >= self.ack_timeout_s:
+				self.stats["ack_timeouts"] += 1
+				logger.warning("[TX] no ACK for %.1fs (in_flight=%d); backing off", stalled, self._in_flight)
+				with self._lock:
+					self._in_flight = 0   # assume the window was lost
+					self._last_ack = self._clock()
+				self.on_error(None)
+				return
+			self._sleep(_ACK_POLL_S)
+
+	def before_send(self, nbytes: int):
+		if self.acks:
+			self._wait_window()
+		self.stats["waited_s"] += self.bucket.take(nbytes)
+
+	def on_sent(self, nbytes: int):
+		self.stats["sent"] += 1
+		self.stats["bytes"] += nbytes
+		self._errors_in_row = 0
+		if self.acks:
+			with self._lock:
+				self._in_flight += 1
+		else:
+			self._set_rate(self.rate + self.increase)
+
+	def on_ack(self, count: int = 1):
+		"""Peer acknowledged `count` sends (or granted `count` credits)."""
+		with self._lock:
+			self._in_flight = max(0, self._in_flight - int(count))
+			self._last_ack = self._clock()
+			self.window = min(self.max_window, self.window + 1)
+		self.stats["acks"] += count
+		self._set_rate(self.rate + self.increase * count)
+
+	def on_error(self, exc):
+		self.stats["errors"] += 1
+		self._errors_in_row += 1
+		self._set_rate(self.rate / 2)
+		with self._lock:
+			self.window = max(1, self.window // 2)
+		delay = min(self.backoff_max_s, self.backoff_s * (2 ** (self._errors_in_row - 1)))
+		logger.warning("[TX] send error %r; rate=%.0fB/s window=%d backoff=%.1fs",
+					   exc, self.rate, self.window, delay)
+		self._sleep(delay)
+
+	def snapshot(self) -> dict:
+		return {"mode": self.name, "rate_Bps": round(self.rate, 1), "window": self.window, **self.stats}
+
+
+def make_pacer(tx_cfg: dict, *, clock=time.monotonic, sleep=time.sleep):
+	"""Build the pacer for get_spotter_tx_settings() output."""
+	profile = tx_cfg.get("pacing")
+	if not profile:
+		return FixedPacer(tx_cfg.get("delay_s", 5.0), sleep=sleep)
+	return RatePacer(profile, clock=clock, sleep=sleep)
+
+
+def set_active(pacer):
+	global _active
+	with _active_lock:
+		_active = pacer
+
+
+def notify_ack(count: int = 1) -> bool:
+	"""Forward a peer ACK/credit to the transfer in progress; False if none."""
+	with _active_lock:
+		pacer = _active
+	if pacer is None:
+		return False
+	pacer.on_ack(count)
+	return True
@@ -1,10 +1,119 @@
-
 # bm_daemon/transport/spotter.py
-import base64, os, time, logging
+import base64, math, struct, time, logging
 from pathlib import Path
 
+from bm_daemon.io.codec import crc16
+from bm_daemon.transport import pacing
+from bm_daemon.transport.pacing import FixedPacer
+
 logger = logging.getLogger("TX")
 
+# ---- binary framing ----------------------------------------------------------
+# Each spotter_tx payload is one chunk: a 10-byte header followed by raw file
+# bytes (no base64, no text framing). Little-endian:
+#   magic u8 | flags u8 | file_id u16 | index u16 | total u16 | crc16(payload) u16
+# Receiver side: bm_daemon.transport.spotter_rx.Reassembler.
+BIN_MAGIC = 0xB7
+BIN_HEADER = struct.Struct("<BBHHHH")
+BIN_HEADER_LEN = BIN_HEADER.size
+BIN_MAX_CHUNKS = 0xFFFF
+
+# ---- forward error correction (binary framing) -------------------------------
+# With transport.spotter.fec each block of `block` data chunks gets
+# ceil(k * ratio) repair chunks (bm_daemon.transport.fec), spread among its
+# data chunks; any k of a block's chunks rebuild it. The chunks of `depth`
+# consecutive blocks are then sent round-robin, so a burst of losses is
+# shared between them instead of sinking one block. A repair chunk has
+# FLAG_REPAIR set, index = its block number, total = data chunks, and its
+# payload starts with
+#   byte_len u32 | row u8 | k u8 (data chunks in this block) | block u8
+# so data payloads shrink by FEC_HEADER_LEN to keep every frame within mtu.
+FLAG_REPAIR = 0x01
+FEC_HEADER = struct.Struct("<IBBB")
+FEC_HEADER_LEN = FEC_HEADER.size
+
+
+def make_file_id(basename: str) -> int:
+	"""16-bit transfer id derived from the file name (unique enough per link)."""
+	return crc16(0, basename.encode("utf-8"))
+
+
+def pack_binary_chunk(file_id: int, index: int, total: int, payload: bytes, flags: int = 0) -> bytes:
+	return BIN_HEADER.pack(BIN_MAGIC, flags, file_id, index, total, crc16(0, payload)) + payload
+
+
+def repair_count(k: int, ratio: float) -> int:
+	"""Repair chunks for a block of k data chunks (at least one)."""
+	return max(1, math.ceil(k * float(ratio) - 1e-9)) if k else 0
+
+
+def fec_repairs(total: int, fec: dict) -> int:
+	"""Repair chunks added to `total` data chunks under fec {ratio, block}."""
+	full, rest = divmod(int(total), int(fec["block"]))
+	return full * repair_count(fec["block"], fec["ratio"]) + repair_count(rest, fec["ratio"])
+
+
+def build_binary_chunks(path: Path, *, mtu=300, file_id=None, fec=None):
+	"""
+	Returns (basename, chunks, byte_len) like build_base64_chunks(), but each
+	chunk is a ready-to-send bytes frame of at most `mtu` bytes. With `fec`
+	({ratio, block, depth}, see get_spotter_tx_settings) repair chunks are
+	interleaved with the data chunks.
+	"""
+	path = Path(path)
+	raw_bytes = path.read_bytes()
+	byte_len = len(raw_bytes)
+	payload_len = int(mtu) - BIN_HEADER_LEN - (FEC_HEADER_LEN if fec else 0)
+	if payload_len <= 0:
+		raise ValueError(f"mtu={mtu} leaves no room after the {BIN_HEADER_LEN}-byte chunk header")
+	total = max(1, -(-byte_len // payload_len))
+	if total > BIN_MAX_CHUNKS:
+		raise ValueError(f"{path.name}: {total} chunks exceeds the binary framing limit of {BIN_MAX_CHUNKS}")
+	if file_id is None:
+		file_id = make_file_id(path.name)
+
+	mv = memoryview(raw_bytes)
+	payloads = [bytes(mv[i * payload_len:(i + 1) * payload_len]) for i in range(total)]
+	chunks = [pack_binary_chunk(file_id, i, total, p) for i, p in enumerate(payloads)]
+	if fec:
+		chunks = _interleave_repairs(chunks, payloads, file_id, byte_len, payload_len, fec)
+
+	if logger.isEnabledFor(logging.DEBUG):
+		logger.debug(
+			"[CHUNK] file=%s bytes=%d mtu=%d payload=%d chunks=%d (data %d) id=0x%04x",
+			path.name, byte_len, mtu, payload_len, len(chunks), total, file_id
+		)
+	return path.name, chunks, byte_len
+
+
+def _interleave_repairs(chunks, payloads, file_id, byte_len, payload_len, fec):
+	"""Data and repair frames in send order (see FEC above)."""
+	from bm_daemon.transport.fec import encode
+
+	block, total = int(fec["block"]), len(chunks)
+	seqs = []
+	for b, start in enumerate(range(0, total, block)):
+		k = min(block, total - start)
+		repairs = encode(payloads[start:start + k], payload_len, repair_count(k, fec["ratio"]))
+		m = len(repairs)
+		seq, j = [], 0
+		for n in range(k):
+			seq.append(chunks[start + n])
+			# repair j goes after data chunk ceil((j + 1) * k / m) - 1 of the block
+			while j < m and -(-(j + 1) * k // m) - 1 == n:
+				hdr = FEC_HEADER.pack(byte_len, j, k, block)
+				seq.append(pack_binary_chunk(file_id, b, total, hdr + repairs[j], FLAG_REPAIR))
+				j += 1
+		seqs.append(seq)
+
+	depth = max(1, int(fec.get("depth", 1)))
+	out = []
+	for g in range(0, len(seqs), depth):
+		group = seqs[g:g + depth]
+		for t in range(max(map(len, group))):
+			out.extend(seq[t] for seq in group if t < len(seq))
+	return out
+
 def build_base64_chunks(path: Path, *, chunk_size=300):
 	"""
 	Returns (basename, chunks, byte_len). DEBUG logs include input size,
@@ -25,19 +134,26 @@ def build_base64_chunks(path: Path, *, chunk_size=300):
 	return path.name, chunks, byte_len
 
 
-def mirror_chunks_to_buffer(chunks, clear_first=True, *, buffer_dir="/home/pi/bm_daemon/camera_software/buffer"):
+def mirror_chunks_to_buffer(chunks, clear_first=True, *, buffer_dir=None):
 	"""
 	Mirrors chunks to buffer/ for troubleshooting; DEBUG logs only.
+	Only earlier split_* mirrors are cleared: the TX queue journal lives in
+	the same directory.
 	"""
-	from pathlib import Path
-	import shutil
+	if buffer_dir is None:
+		from bm_daemon.common.paths import buffer_dir as _buffer_dir
+		buffer_dir = _buffer_dir()
 	bdir = Path(buffer_dir)
-	if clear_first and bdir.exists():
-		shutil.rmtree(bdir)
 	bdir.mkdir(parents=True, exist_ok=True)
+	if clear_first:
+		for old in bdir.glob("split_*"):
+			old.unlink(missing_ok=True)
 
 	for i, c in enumerate(chunks):
-		(bdir / f"split_{i}.txt").write_text(c)
+		if isinstance(c, (bytes, bytearray)):
+			(bdir / f"split_{i}.bin").write_bytes(c)
+		else:
+			(bdir / f"split_{i}.txt").write_text(c)
 
 	if logger.isEnabledFor(logging.DEBUG):
 		logger.debug("[CHUNK] mirrored %d chunks to %s", len(chunks), bdir)
@@ -66,29 +182,77 @@ def mirror_chunks_to_buffer(chunks, clear_first=True, *, buffer_dir="/home/pi/bm
 # 	end_msg = f"<END {kind}>\n"
 # 	bm.spotter_tx(end_msg.encode("ascii"))
 # 	logger.debug("[TX] done file=%s total_chunks=%d", file_label, total)
-def send_chunks_to_spotter(bm, *, file_label: str, chunks: list[str],
-					   delay_s: float, kind: str = "IMG"):
+def send_chunks_to_spotter(bm, *, file_label: str, chunks: list,
+					   delay_s: float, kind: str = "IMG", pacer=None,
+					   skip=(), on_chunk_sent=None, layer=None):
+	"""
+	Send START, every chunk, then END. `chunks` are base64 strings (wrapped as
+	"<I{n}>...\n") or binary frames from build_binary_chunks() (sent as-is).
+	`pacer` (see bm_daemon.transport.pacing) spaces the sends; without one,
+	`delay_s` is slept between sends as before.
+	Indices in `skip` were already delivered (resume) and are not re-sent;
+	`on_chunk_sent(i)` is called after each chunk leaves.
+	`layer` = (k, n) marks layer k (1-based) of n of one image, the last
+	being the full image (progressive delivery); START then carries
+	", layer: k/n". Binary chunks with repair frames (FEC) add ", fec: r",
+	the number of repair chunks among the n.
+	"""
+	if pacer is None:
+		pacer = FixedPacer(delay_s)
 	n = len(chunks)
-	
-	# START
-	start_line = f"<START {kind}> filename: {file_label}, chunks: {n}\n".encode("ascii")
-	bm.spotter_tx(start_line)
-	logger.info("[TX] START %s chunks=%d", file_label, n)
-	
-	# Give START a head-start on the queue so it precedes I0 downstream
-	time.sleep(max(1.0, delay_s))
-	
-	# CHUNKS (log sequence at INFO; details at DEBUG)
-	for i, b64 in enumerate(chunks):
-		bm.spotter_tx(f"<I{i}>{b64}\n".encode("ascii"))
-		logger.info("[TX] I%d/%d", i, n)  # visible at INFO & DEBUG
-		if logger.isEnabledFor(logging.DEBUG):
-			logger.debug("[TX] chunk=%d len(b64)=%d", i, len(b64))
-		time.sleep(delay_s)
-	
-	# END
-	bm.spotter_tx(f"<END {kind}>\n".encode("ascii"))
-	logger.info("[TX] END %s", file_label)
+	binary = bool(chunks) and isinstance(chunks[0], (bytes, bytearray))
+	t0 = time.monotonic()
+	pacing.set_active(pacer)
+	try:
+		# START
+		framing = ", framing: bin" if binary else ""
+		repairs = sum(1 for c in chunks if c[1] & FLAG_REPAIR) if binary else 0
+		if repairs:
+			framing += f", fec: {repairs}"
+		if layer is not None:
+			framing += f", layer: {layer[0]}/{layer[1]}"
+		start_line = f"<START {kind}> filename: {file_label}, chunks: {n}{framing}\n".encode("ascii")
+		_paced_tx(bm, pacer, start_line, first=True)
+		logger.info("[TX] START %s chunks=%d", file_label, n)
+
+		# Give START a head-start on the queue so it precedes I0 downstream
+		pacer.start_gap()
+
+		# CHUNKS (log sequence at INFO; details at DEBUG)
+		for i, part in enumerate(chunks):
+			if i in skip:
+				continue
+			_paced_tx(bm, pacer, part if binary else f"<I{i}>{part}\n".encode("ascii"))
+			if on_chunk_sent is not None:
+				on_chunk_sent(i)
+			logger.info("[TX] I%d/%d", i, n)  # visible at INFO & DEBUG
+			if logger.isEnabledFor(logging.DEBUG):
+				logger.debug("[TX] chunk=%d len(%s)=%d", i, "bin" if binary else "b64", len(part))
+
+		# END
+		_paced_tx(bm, pacer, f"<END {kind}>\n".encode("ascii"))
+	finally:
+		pacing.set_active(None)
+	logger.info("[TX] END %s in %.1fs %s", file_label, time.monotonic() - t0, pacer.snapshot())
+
+
+def _paced_tx(bm, pacer, wire: bytes, *, first: bool = False):
+	"""One spotter_tx through the pacer, retrying with backoff on write errors."""
+	attempt = 0
+	while True:
+		if not first:
+			pacer.before_send(len(wire))
+		try:
+			bm.spotter_tx(wire)
+		except OSError as e:   # SerialException is an OSError
+			attempt += 1
+			if attempt > pacer.max_retries:
+				raise
+			pacer.on_error(e)
+			first = False
+			continue
+		pacer.on_sent(len(wire))
+		return
 	
 	
 # Added Sep 9 - testing dedupes
@@ -110,7 +274,107 @@ def get_spotter_tx_settings() -> dict:
 	override     = dz_transport.get("spotter") or {}
 
 	spot = {**primary, **override}  # danger_zone overrides primary if present
+	framing = str(spot.get("framing", "base64")).strip().lower()
+	if framing not in ("base64", "binary"):
+		logger.warning("unknown transport.spotter.framing %r; using base64", framing)
+		framing = "base64"
+
+	# Forward error correction: binary framing only (repair frames need the header)
+	fec_cfg = spot.get("fec") or {}
+	fec = None
+	if fec_cfg.get("enabled"):
+		ratio = float(fec_cfg.get("ratio", 0.25))
+		block = int(fec_cfg.get("block", 64))
+		depth = max(1, int(fec_cfg.get("depth", 8)))
+		if framing != "binary":
+			logger.warning("transport.spotter.fec needs framing: binary; sending without repair chunks")
+		elif not (0.0 < ratio <= 1.0 and block >= 1 and block + repair_count(block, ratio) <= 255):
+			logger.warning("transport.spotter.fec ratio=%s block=%s out of range (0 < ratio <= 1, "
+						   "block + its repair chunks <= 255); sending without repair chunks", ratio, block)
+		else:
+			fec = {"ratio": ratio, "block": block, "depth": depth}
+
+	# Pacing profile: "fixed" (or unset) keeps the legacy delay_s sleep
+	profile_name = str(spot.get("profile", "fixed")).strip()
+	pacing_cfg = None
+	if profile_name != "fixed":
+		profiles = spot.get("profiles") or {}
+		if profile_name in profiles:
+			pacing_cfg = {**(profiles[profile_name] or {}), "name": profile_name}
+		else:
+			logger.warning("unknown transport.spotter.profile %r; using fixed delay_s pacing", profile_name)
 	return {
 		"chunk_size": int(spot.get("chunk_size", 300)),
 		"delay_s":   float(spot.get("delay_s", 5.0)),
+		"framing":   framing,
+		"mtu":       int(spot.get("mtu", spot.get("chunk_size", 300))),
+		"pacing":    pacing_cfg,
+		"fec":       fec,
 	}
+
+
+def _payload_len(tx_cfg: dict) -> int:
+	"""File bytes per binary data chunk under tx_cfg."""
+	return int(tx_cfg["mtu"]) - BIN_HEADER_LEN - (FEC_HEADER_LEN if tx_cfg.get("fec") else 0)
+
+
+def chunk_budget_bytes(chunks: int, tx_cfg: dict) -> int:
+	"""Largest file (bytes) that goes out in at most `chunks` chunks (repair chunks included) under tx_cfg."""
+	if tx_cfg.get("framing") == "binary":
+		data = max(0, int(chunks))
+		fec = tx_cfg.get("fec")
+		if fec:
+			while data and data + fec_repairs(data, fec) > chunks:
+				data -= 1
+		return max(0, data * _payload_len(tx_cfg))
+	# base64: 4 chars per 3 bytes, chunk_size chars per chunk
+	return 3 * ((int(chunks) * int(tx_cfg["chunk_size"])) // 4)
+
+
+def chunk_count(byte_len: int, tx_cfg: dict) -> int:
+	"""Chunks a file of `byte_len` bytes takes under tx_cfg (inverse of chunk_budget_bytes)."""
+	if tx_cfg.get("framing") == "binary":
+		per_chunk = _payload_len(tx_cfg)
+		if per_chunk <= 0:
+			return 0
+		data = max(1, -(-int(byte_len) // per_chunk))
+		return data + (fec_repairs(data, tx_cfg["fec"]) if tx_cfg.get("fec") else 0)
+	per_chunk = chunk_budget_bytes(1, tx_cfg)
+	return max(1, -(-int(byte_len) // per_chunk)) if per_chunk else 0
+
+
+def format_indices(indices) -> str:
+	"""Chunk indices as compact text for a NACK: [7, 19, 30, 31, 32] -> "7;19;30-32"."""
+	out, run = [], []
+	for i in sorted(set(int(i) for i in indices)):
+		if run and i == run[-1] + 1:
+			run.append(i)
+			continue
+		if run:
+			out.append(f"{run[0]}-{run[-1]}" if len(run) > 2 else ";".join(map(str, run)))
+		run = [i]
+	if run:
+		out.append(f"{run[0]}-{run[-1]}" if len(run) > 2 else ";".join(map(str, run)))
+	return ";".join(out)
+
+
+def parse_indices(text: str, limit: int = BIN_MAX_CHUNKS + 1) -> list:
+	"""Inverse of format_indices ("7;19;30-32", spaces also separate); raises ValueError."""
+	out = set()
+	for part in str(text).replace(" ", ";").split(";"):
+		part = part.strip()
+		if not part:
+			continue
+		lo, sep, hi = part.partition("-")
+		lo, hi = int(lo), int(hi) if sep else int(lo)
+		if lo < 0 or hi < lo or hi >= limit:
+			raise ValueError(f"bad chunk index range {part!r}")
+		out.update(range(lo, hi + 1))
+	return sorted(out)
+
+
+def build_chunks(path: Path, tx_cfg: dict):
+	"""Chunk `path` with the configured framing; returns (basename, chunks, byte_len)."""
+	if tx_cfg.get("framing") == "binary":
+		return build_binary_chunks(path, mtu=tx_cfg["mtu"], fec=tx_cfg.get("fec"))
+	return build_base64_chunks(path, chunk_size=tx_cfg["chunk_size"])
@@ -0,0 +1,163 @@
+# bm_daemon/transport/spotter_rx.py
+"""
+Receiver-side reference for the binary Spotter chunk framing written by
+bm_daemon.transport.spotter.build_binary_chunks(). Shore-side tooling and
+benchmarks use it to rebuild files from whatever chunks arrived, in any order.
+Repair chunks (transport.spotter.fec) fill in lost data chunks as soon as
+a block has as many chunks as it has data chunks.
+"""
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+from bm_daemon.io.codec import crc16
+from bm_daemon.transport.spotter import (
+	BIN_HEADER, BIN_HEADER_LEN, BIN_MAGIC, FEC_HEADER, FEC_HEADER_LEN, FLAG_REPAIR, format_indices,
+)
+
+logger = logging.getLogger("RX")
+
+
+class ChunkError(ValueError):
+	"""A chunk that is not a valid binary frame (bad magic, length or CRC)."""
+
+
+def parse_binary_chunk(frame: bytes):
+	"""Returns (file_id, index, total, flags, payload); raises ChunkError."""
+	if len(frame) < BIN_HEADER_LEN:
+		raise ChunkError(f"short chunk ({len(frame)} bytes)")
+	magic, flags, file_id, index, total, crc = BIN_HEADER.unpack_from(frame)
+	if magic != BIN_MAGIC:
+		raise ChunkError(f"bad magic 0x{magic:02x}")
+	payload = bytes(frame[BIN_HEADER_LEN:])
+	if crc16(0, payload) != crc:
+		raise ChunkError(f"crc mismatch file=0x{file_id:04x} idx={index}")
+	if total == 0 or index >= total:
+		raise ChunkError(f"index {index} out of range (total={total})")
+	if flags & FLAG_REPAIR and len(payload) <= FEC_HEADER_LEN:
+		raise ChunkError(f"short repair chunk file=0x{file_id:04x} block={index}")
+	return file_id, index, total, flags, payload
+
+
+class _Transfer:
+	__slots__ = ("total", "parts", "repairs", "byte_len", "block", "length")
+
+	def __init__(self, total: int):
+		self.total = total
+		self.parts: Dict[int, bytes] = {}
+		self.repairs: Dict[int, Dict[int, bytes]] = {}   # block -> {row: parity}
+		self.byte_len = 0   # the rest is learnt from the first repair chunk
+		self.block = 0
+		self.length = 0     # data payload length (= parity length)
+
+	def add_repair(self, b: int, payload: bytes) -> bool:
+		"""Store a repair chunk of block b; False if it is a duplicate."""
+		self.byte_len, row, _k, self.block = FEC_HEADER.unpack_from(payload)
+		rows = self.repairs.setdefault(b, {})
+		if row in rows:
+			return False
+		rows[row] = payload[FEC_HEADER_LEN:]
+		self.length = len(rows[row])
+		return True
+
+	def rebuild(self, b: int) -> int:
+		"""Recover the lost data chunks of block b if enough of it arrived; returns how many."""
+		from bm_daemon.transport.fec import recover
+
+		rows = self.repairs.get(b)
+		if not rows:
+			return 0
+		start = b * self.block
+		k = min(self.block, self.total - start)
+		have = {i - start: self.parts[i] for i in range(start, start + k) if i in self.parts}
+		if len(have) == k or len(have) + len(rows) < k:
+			return 0
+		for i, data in recover(k, have, rows, self.length).items():
+			self.parts[start + i] = data
+		if start + k == self.total:   # the last chunk was padded to the parity length
+			last = self.byte_len - (self.total - 1) * self.length
+			self.parts[self.total - 1] = self.parts[self.total - 1][:last]
+		del self.repairs[b]
+		return k - len(have)
+
+
+class Reassembler:
+	"""
+	Collect chunks per file id. feed() returns (file_id, data) once every
+	index of a file has arrived or was rebuilt from repair chunks, else None.
+	Duplicate and corrupt chunks are counted and ignored, as are chunks of a
+	recently completed file that arrive late (no longer needed after FEC).
+	"""
+
+	def __init__(self):
+		self._files: Dict[int, _Transfer] = {}
+		self._done = deque(maxlen=32)   # (file_id, total) of completed files
+		self.stats = {"chunks": 0, "duplicates": 0, "errors": 0, "files": 0, "repairs": 0, "recovered": 0}
+
+	def feed(self, frame: bytes) -> Optional[tuple]:
+		try:
+			file_id, index, total, flags, payload = parse_binary_chunk(frame)
+		except ChunkError as e:
+			self.stats["errors"] += 1
+			logger.debug("[RX] drop chunk: %s", e)
+			return None
+
+		tr = self._files.get(file_id)
+		if tr is None and (file_id, total) in self._done:
+			self.stats["duplicates"] += 1
+			return None
+		if tr is None or tr.total != total:
+			tr = self._files[file_id] = _Transfer(total)
+		if flags & FLAG_REPAIR:
+			# index is the block number of a repair chunk
+			if not tr.add_repair(index, payload):
+				self.stats["duplicates"] += 1
+				return None
+			self.stats["repairs"] += 1
+			block = index
+		elif index in tr.parts:
+			self.stats["duplicates"] += 1
+			return None
+		else:
+			tr.parts[index] = payload
+			self.stats["chunks"] += 1
+			block = index // tr.block if tr.block else None
+		if block is not None:
+			self.stats["recovered"] += tr.rebuild(block)
+
+		if len(tr.parts) == tr.total:
+			del self._files[file_id]
+			self._done.append((file_id, total))
+			self.stats["files"] += 1
+			return file_id, b"".join(tr.parts[i] for i in range(tr.total))
+		return None
+
+	def missing(self, file_id: int) -> list:
+		"""Indices still outstanding for an in-progress file ([] if unknown)."""
+		tr = self._files.get(file_id)
+		if tr is None:
+			return []
+		return [i for i in range(tr.total) if i not in tr.parts]
+
+	def nack(self, file_id: int) -> Optional[str]:
+		"""
+		Payload for the daemon's NACK topic (topics.tx_nack) asking for the
+		missing chunks of an in-progress file; None if there is none. With
+		FEC, a block asks only for what the repair chunks it holds can't
+		cover.
+		"""
+		missing = self.missing(file_id)
+		tr = self._files.get(file_id)
+		if missing and tr.block:
+			need, by_block = [], {}
+			for i in missing:
+				by_block.setdefault(i // tr.block, []).append(i)
+			for b, idx in by_block.items():
+				need += idx[:len(idx) - len(tr.repairs.get(b, ()))]
+			missing = need
+		return f"id=0x{file_id:04x},missing={format_indices(missing)}" if missing else None
+
+
+def ack_payload(file_id: int) -> str:
+	"""Payload for the NACK topic confirming a complete file (its spooled chunks are released)."""
+	return f"id=0x{file_id:04x},done=1"
@@ -0,0 +1,356 @@
+# bm_daemon/transport/tx_queue.py
+"""
+Durable outbound queue for Spotter transfers.
+
+Handlers enqueue an encoded file; its chunks are journaled to SQLite under
+paths.buffer and a single background thread sends jobs in FIFO order,
+marking each chunk as sent when spotter_tx returns. After a restart the
+thread picks up where it stopped: START is repeated (same filename and chunk
+count) and only the chunks not yet marked are sent, with their original
+indices, so the receiver can merge both halves.
+
+Progressive delivery journals an image as layers 1..n (previews, then the
+full image as layer n). Pending previews go out lowest layer first, before
+any full image; full images (layer n, or a plain transfer) follow in FIFO
+order. A job already being sent is always finished first.
+
+Finished jobs keep their chunks as a spool for selective retransmit: a
+receiver NACK (bm_daemon.agent.handlers.tx_feedback) clears the sent mark
+of just the chunks it lists and puts the job back in the queue, so only
+those go out again (START repeated, original indices). A receiver that
+confirms a file releases its chunks; unconfirmed ones are kept for the
+newest `keep_done` finished jobs.
+
+  transport:
+    spotter:
+      queue: {enabled: true, db: tx_queue.sqlite3, keep_done: 5}
+"""
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from bm_daemon.transport.pacing import make_pacer
+from bm_daemon.transport.spotter import (
+	BIN_HEADER, FLAG_REPAIR, build_chunks, get_spotter_tx_settings, make_file_id, send_chunks_to_spotter,
+)
+
+logger = logging.getLogger("TXQ")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+	id        INTEGER PRIMARY KEY AUTOINCREMENT,
+	label     TEXT NOT NULL,
+	kind      TEXT NOT NULL,
+	framing   TEXT NOT NULL,
+	total     INTEGER NOT NULL,
+	byte_len  INTEGER NOT NULL,
+	state     TEXT NOT NULL DEFAULT 'pending',   -- pending | sending | done | failed
+	created   REAL NOT NULL,
+	finished  REAL,
+	attempts  INTEGER NOT NULL DEFAULT 0,
+	layer     INTEGER NOT NULL DEFAULT 0,   -- 1..layers for progressive delivery, else 0
+	layers    INTEGER NOT NULL DEFAULT 0,
+	nacks     INTEGER NOT NULL DEFAULT 0,   -- retransmit requests served
+	acked     INTEGER NOT NULL DEFAULT 0    -- receiver confirmed the whole file
+);
+CREATE TABLE IF NOT EXISTS chunks (
+	job_id  INTEGER NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+	idx     INTEGER NOT NULL,
+	data    BLOB NOT NULL,
+	sent    INTEGER NOT NULL DEFAULT 0,
+	PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+def get_queue_settings(cfg: Optional[dict] = None) -> dict:
+	if cfg is None:
+		from bm_daemon.common.config import load_config
+		cfg = load_config()
+	spot = ((cfg.get("transport") or {}).get("spotter") or {})
+	q = spot.get("queue") or {}
+	return {
+		"enabled": bool(q.get("enabled", False)),
+		"db": str(q.get("db", "tx_queue.sqlite3")),
+		"keep_done": int(q.get("keep_done", 5)),
+		"max_attempts": int(q.get("max_attempts", 5)),
+		"retry_s": float(q.get("retry_s", 30.0)),
+	}
+
+
+class TxQueue:
+	"""SQLite-journaled FIFO of Spotter transfers plus its sender thread."""
+
+	def __init__(self, db_path, *, keep_done: int = 5, max_attempts: int = 5, retry_s: float = 30.0):
+		self.db_path = Path(db_path)
+		self.db_path.parent.mkdir(parents=True, exist_ok=True)
+		self.keep_done = max(0, int(keep_done))
+		self.max_attempts = max(1, int(max_attempts))
+		self.retry_s = float(retry_s)
+		self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+		self._db.execute("PRAGMA journal_mode=WAL")
+		# FULL: a commit is on disk when it returns (WAL + NORMAL may lose the last commits
+		# on power loss); one fsync per chunk is nothing at Spotter rates
+		self._db.execute("PRAGMA synchronous=FULL")
+		self._db.execute("PRAGMA foreign_keys=ON")
+		self._db.executescript(_SCHEMA)
+		self._migrate()
+		self._lock = threading.Lock()
+		self._pending_at_open = self.depth()   # left by a previous run; start() reports them
+		self._wake = threading.Event()
+		self._stop = threading.Event()
+		self._thread = None
+
+	def _migrate(self):
+		# older journals lack the layer (progressive delivery) and nacks/acked columns
+		cols = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+		for col in ("layer", "layers", "nacks", "acked"):
+			if col not in cols:
+				self._db.execute(f"ALTER TABLE jobs ADD COLUMN {col} INTEGER NOT NULL DEFAULT 0")
+
+	@contextmanager
+	def _transaction(self):
+		"""BEGIN ... COMMIT (caller holds _lock); any error rolls back, so the connection never stays mid-transaction."""
+		self._db.execute("BEGIN")
+		try:
+			yield
+		except BaseException:
+			self._db.execute("ROLLBACK")
+			raise
+		self._db.execute("COMMIT")
+
+	# ---- journal ----
+	def enqueue(self, path, tx_cfg: Optional[dict] = None, *, kind: str = "IMG",
+				layer: Optional[tuple] = None) -> int:
+		"""
+		Chunk `path` with the current TX settings and journal it; returns the
+		job id. layer=(k, n): layer k of n of one image, n being the full image.
+		"""
+		tx_cfg = tx_cfg or get_spotter_tx_settings()
+		label, chunks, byte_len = build_chunks(Path(path), tx_cfg)
+		framing = "binary" if chunks and isinstance(chunks[0], (bytes, bytearray)) else "base64"
+		rows = ((c if framing == "binary" else c.encode("ascii")) for c in chunks)
+		with self._lock, self._transaction():
+			cur = self._db.execute(
+				"INSERT INTO jobs (label, kind, framing, total, byte_len, created, layer, layers) "
+				"VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+				(label, kind, framing, len(chunks), byte_len, time.time(), *(layer or (0, 0))))
+			job_id = cur.lastrowid
+			self._db.executemany("INSERT INTO chunks (job_id, idx, data) VALUES (?, ?, ?)",
+								 ((job_id, i, sqlite3.Binary(r)) for i, r in enumerate(rows)))
+		logger.info("[TXQ] queued job=%d %s chunks=%d framing=%s depth=%d",
+					job_id, label, len(chunks), framing, self.depth())
+		self._wake.set()
+		return job_id
+
+	def depth(self) -> int:
+		with self._lock:
+			return self._db.execute(
+				"SELECT COUNT(*) FROM jobs WHERE state IN ('pending', 'sending')").fetchone()[0]
+
+	def _next_job(self):
+		with self._lock:
+			return self._db.execute(
+				"SELECT id, label, kind, framing, total, attempts, layer, layers, nacks FROM jobs "
+				"WHERE state IN ('pending', 'sending') "
+				"ORDER BY state = 'sending' DESC, CASE WHEN layer < layers THEN layer ELSE 1000000 END, id "
+				"LIMIT 1").fetchone()
+
+	def _load(self, job_id: int, framing: str):
+		with self._lock:
+			rows = self._db.execute(
+				"SELECT idx, data, sent FROM chunks WHERE job_id = ? ORDER BY idx", (job_id,)).fetchall()
+		chunks = [bytes(d) if framing == "binary" else bytes(d).decode("ascii") for _i, d, _s in rows]
+		sent = {i for i, _d, s in rows if s}
+		return chunks, sent
+
+	def _mark_sent(self, job_id: int, idx: int):
+		with self._lock:
+			self._db.execute("UPDATE chunks SET sent = 1 WHERE job_id = ? AND idx = ?", (job_id, idx))
+
+	def _finish(self, job_id: int):
+		"""
+		done, unless a NACK arrived mid-transfer for chunks already passed
+		(then again). A file the receiver confirmed meanwhile releases its
+		spooled chunks now.
+		"""
+		with self._lock:
+			unsent, acked = self._db.execute(
+				"SELECT (SELECT COUNT(*) FROM chunks WHERE job_id = ? AND sent = 0), acked FROM jobs WHERE id = ?",
+				(job_id, job_id)).fetchone()
+			if acked:
+				with self._transaction():
+					self._db.execute("DELETE FROM chunks WHERE job_id = ?", (job_id,))
+				unsent = 0
+		self._set_state(job_id, "pending" if unsent else "done")
+		return not unsent
+
+	def _set_state(self, job_id: int, state: str, *, attempt: bool = False):
+		with self._lock:
+			self._db.execute(
+				"UPDATE jobs SET state = ?, attempts = attempts + ?, finished = ? WHERE id = ?",
+				(state, 1 if attempt else 0, time.time() if state in ("done", "failed") else None, job_id))
+			if state in ("done", "failed"):
+				self._prune_locked()
+
+	def _prune_locked(self):
+		# keep chunk data for the newest `keep_done` finished jobs not yet confirmed
+		# (re-send on request), and the newest `keep_done` rows for status
+		self._db.execute(
+			"DELETE FROM jobs WHERE state IN ('done', 'failed') "
+			"AND id NOT IN (SELECT id FROM jobs WHERE state IN ('done', 'failed') AND acked = 0 "
+			"ORDER BY id DESC LIMIT ?) "
+			"AND id NOT IN (SELECT id FROM jobs WHERE state IN ('done', 'failed') ORDER BY id DESC LIMIT ?)",
+			(self.keep_done, self.keep_done))
+
+	def snapshot(self) -> dict:
+		with self._lock:
+			rows = self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+			acked = self._db.execute("SELECT COUNT(*) FROM jobs WHERE acked = 1").fetchone()[0]
+		return {**dict(rows), "acked": acked}
+
+	# ---- receiver feedback ----
+	def find(self, label: Optional[str] = None, file_id: Optional[int] = None) -> Optional[dict]:
+		"""Newest journaled job for a file name (as in START) or a binary-framing file id."""
+		with self._lock:
+			rows = self._db.execute(
+				"SELECT id, label, state, total, nacks, acked, "
+				"(SELECT COUNT(*) FROM chunks WHERE job_id = jobs.id) FROM jobs ORDER BY id DESC").fetchall()
+		for job_id, lbl, state, total, nacks, acked, spooled in rows:
+			if (label is not None and lbl == label) or (file_id is not None and make_file_id(lbl) == file_id):
+				return {"id": job_id, "label": lbl, "state": state, "total": total,
+						"nacks": nacks, "acked": bool(acked), "spooled": spooled}
+		return None
+
+	def resend(self, job_id: int, indices) -> int:
+		"""
+		Queue chunks of a journaled job for re-sending; returns how many.
+		`indices` are what the receiver sees: "<I{n}>" numbers for base64,
+		header indices for binary framing (data chunks; repair chunks of FEC
+		transfers are not re-sent). Unknown indices are ignored.
+		"""
+		wanted = set(indices)
+		with self._lock:
+			job = self._db.execute("SELECT framing FROM jobs WHERE id = ?", (job_id,)).fetchone()
+			if job is None or not wanted:
+				return 0
+			if job[0] == "binary":
+				rows = self._db.execute("SELECT idx, data FROM chunks WHERE job_id = ?", (job_id,)).fetchall()
+				pos = []
+				for idx, data in rows:
+					_m, flags, _fid, index, _t, _c = BIN_HEADER.unpack_from(data)
+					if not flags & FLAG_REPAIR and index in wanted:
+						pos.append(idx)
+			else:
+				pos = list(wanted)
+			with self._transaction():
+				n = self._db.executemany(
+					"UPDATE chunks SET sent = 0 WHERE job_id = ? AND idx = ?", ((job_id, i) for i in pos)).rowcount
+				if n:
+					# back in the queue (a job being sent notices in _finish); a failed job gets fresh attempts
+					self._db.execute(
+						"UPDATE jobs SET nacks = nacks + 1, acked = 0, finished = NULL, "
+						"attempts = CASE WHEN state = 'failed' THEN 0 ELSE attempts END, "
+						"state = CASE WHEN state = 'sending' THEN state ELSE 'pending' END WHERE id = ?", (job_id,))
+		if n:
+			logger.info("[TXQ] NACK job=%d: %d chunk(s) queued for re-send", job_id, n)
+			self._wake.set()
+		return n
+
+	def confirm(self, job_id: int) -> bool:
+		"""
+		The receiver has the whole file: a pending re-send is dropped, and so
+		are the spooled chunks (kept until the end of a transfer in progress).
+		"""
+		with self._lock, self._transaction():
+			state = self._db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+			if state is not None:
+				sending = state[0] == "sending"
+				self._db.execute(
+					"UPDATE jobs SET acked = 1, state = ?, finished = COALESCE(finished, ?) WHERE id = ?",
+					(state[0] if sending else "done", None if sending else time.time(), job_id))
+				if not sending:
+					self._db.execute("DELETE FROM chunks WHERE job_id = ?", (job_id,))
+					self._prune_locked()
+		if state is not None:
+			logger.info("[TXQ] job=%d confirmed complete by the receiver", job_id)
+		return state is not None
+
+	# ---- sender ----
+	def _send_job(self, bm, job) -> None:
+		job_id, label, kind, framing, total, attempts, layer, layers, nacks = job
+		chunks, sent = self._load(job_id, framing)
+		if nacks:
+			logger.info("[TXQ] re-send job=%d %s: %d of %d chunk(s) (NACK #%d)",
+						job_id, label, len(chunks) - len(sent), total, nacks)
+		elif sent:
+			logger.info("[TXQ] resume job=%d %s at %d/%d chunks", job_id, label, len(sent), total)
+		self._set_state(job_id, "sending", attempt=True)
+		tx_cfg = get_spotter_tx_settings()
+		send_chunks_to_spotter(
+			bm,
+			file_label=label,
+			chunks=chunks,
+			delay_s=tx_cfg["delay_s"],
+			kind=kind,
+			pacer=make_pacer(tx_cfg),
+			skip=sent,
+			on_chunk_sent=lambda i: self._mark_sent(job_id, i),
+			layer=(layer, layers) if layers else None,
+		)
+		if self._finish(job_id):
+			logger.info("[TXQ] done job=%d %s depth=%d", job_id, label, self.depth())
+
+	def _run(self, bm):
+		while not self._stop.is_set():
+			job = self._next_job()
+			if job is None:
+				self._wake.wait(5.0)
+				self._wake.clear()
+				continue
+			try:
+				self._send_job(bm, job)
+			except Exception as e:
+				job_id, label, attempts = job[0], job[1], job[5] + 1
+				if attempts >= self.max_attempts:
+					logger.error("[TXQ] job=%d %s failed after %d attempts: %r", job_id, label, attempts, e)
+					self._set_state(job_id, "failed")
+				else:
+					logger.warning("[TXQ] job=%d %s attempt %d failed: %r; retry in %.0fs",
+								   job_id, label, attempts, e, self.retry_s)
+					self._stop.wait(self.retry_s)
+
+	def start(self, bm) -> None:
+		if self._thread is not None:
+			return
+		if self._pending_at_open:
+			logger.info("[TXQ] %d job(s) pending from a previous run", self._pending_at_open)
+		self._thread = threading.Thread(target=self._run, args=(bm,), name="bm-txq", daemon=True)
+		self._thread.start()
+
+	def stop(self, timeout_s: float = 2.0) -> None:
+		# A transfer in progress is abandoned mid-pacing; the journal resumes it next start
+		self._stop.set()
+		self._wake.set()
+		if self._thread is not None:
+			self._thread.join(timeout_s)
+			if self._thread.is_alive():
+				return   # daemon thread still inside spotter_tx; the process exit ends it
+		with self._lock:
+			self._db.close()
+
+
+def open_tx_queue(cfg: Optional[dict] = None) -> Optional[TxQueue]:
+	"""TxQueue under paths.buffer, or None when transport.spotter.queue.enabled is false."""
+	settings = get_queue_settings(cfg)
+	if not settings["enabled"]:
+		return None
+	from bm_daemon.common.paths import buffer_dir
+	return TxQueue(Path(buffer_dir()) / settings["db"],
+				   keep_done=settings["keep_done"],
+				   max_attempts=settings["max_attempts"],
+				   retry_s=settings["retry_s"])